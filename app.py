@@ -1,871 +1,955 @@
+import os
+import threading
 import dash
-from dash import html, dcc, Input, Output, State, dash_table
+from dash import html, dcc, Input, Output, State, dash_table, callback, DiskcacheManager
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 from datetime import datetime, timedelta
-import pandas as pd
-from db_handler import DBHandler
-from knowledge_db_handler import KnowledgeDataHandler, Gender
-import plotly.express as px
-import plotly.graph_objects as go
-from typing import List
-from models import WBCStateRange, HemoglobinStateRange
-from patient_state_calculator import (
-    generate_patient_state_timeline,
-    generate_hemoglobin_state_timeline,
-    calculate_hemoglobin_states,
-    calculate_hematological_states,
-    calculate_recommendation,
-    calculate_grade,
-)
+from overview_scheduler import OverviewSnapshotScheduler
 
-app = dash.Dash(
-    __name__,
-    external_stylesheets=[dbc.themes.BOOTSTRAP],
-    suppress_callback_exceptions=True,
-)
-db_handler = DBHandler("project_db_with_names.csv")
-knowledge_db = KnowledgeDataHandler()
+# pandas, plotly and the data handlers are imported on first use so that the
+# server (and every background worker process) starts without loading them
 
-# Read the project database
-project_db = pd.read_csv("project_db_with_names.csv")
+PROJECT_DB_PATH = "project_db_with_names.csv"
 
-# Get unique patient names for dropdown
-patient_names = project_db[["first_name", "last_name"]].drop_duplicates()
-patient_names["full_name"] = (
-    patient_names["first_name"] + " " + patient_names["last_name"]
-)
-patient_options = [
-    {"label": name, "value": name} for name in patient_names["full_name"]
-]
+# Multi-worker deployments (e.g. gunicorn -w 4 app:server) point this at a local
+# SQLite file; workers then serialize edits through it and reload stale data
+SHARED_STORE_PATH = os.environ.get("CDS_SHARED_STORE")
 
+# LOINC name cache filled by enrichment runs (loinc_name_fetcher.py), used when present
+LOINC_CACHE_PATH = os.environ.get("CDS_LOINC_CACHE", "loinc_names.sqlite")
 
-app.layout = dbc.Container(
-    [
-        dbc.Tabs(
-            [
-                dbc.Tab(
-                    label="Patient Database",
-                    children=[
-                        dbc.Tabs(
-                            [
-                                dbc.Tab(
-                                    label="Retrieve",
-                                    children=[
-                                        html.H3("Retrieve Records"),
-                                        dbc.Row(
-                                            [
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label("First Name"),
-                                                        dbc.Input(
-                                                            id="retrieve-first-name",
-                                                            type="text",
-                                                            placeholder="Enter first name",
-                                                        ),
-                                                    ],
-                                                    width=6,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label("Last Name"),
-                                                        dbc.Input(
-                                                            id="retrieve-last-name",
-                                                            type="text",
-                                                            placeholder="Enter last name",
-                                                        ),
-                                                    ],
-                                                    width=6,
-                                                ),
-                                            ]
-                                        ),
-                                        dbc.Row(
-                                            [
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label("LOINC Number"),
-                                                        dbc.Input(
-                                                            id="retrieve-loinc",
-                                                            type="text",
-                                                            placeholder="Enter LOINC number",
-                                                        ),
-                                                    ],
-                                                    width=6,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label("Measurement Date"),
-                                                        dcc.DatePickerSingle(
-                                                            id="retrieve-measurement-date"
-                                                        ),
-                                                    ],
-                                                    width=3,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label(
-                                                            "Measurement Time (Optional)"
-                                                        ),
-                                                        dbc.Input(
-                                                            id="retrieve-measurement-time",
-                                                            type="text",
-                                                            placeholder="HH:MM (e.g., 14:30)",
-                                                            pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$",
-                                                        ),
-                                                    ],
-                                                    width=3,
-                                                ),
-                                            ]
-                                        ),
-                                        dbc.Row(
-                                            [
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label(
-                                                            "Update Date Range Start"
-                                                        ),
-                                                        dcc.DatePickerSingle(
-                                                            id="retrieve-update-start-date"
-                                                        ),
-                                                    ],
-                                                    width=3,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label(
-                                                            "Start Time (Optional)"
-                                                        ),
-                                                        dbc.Input(
-                                                            id="retrieve-update-start-time",
-                                                            type="text",
-                                                            placeholder="HH:MM (e.g., 14:30)",
-                                                            pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$",
-                                                        ),
-                                                    ],
-                                                    width=3,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label(
-                                                            "Update Date Range End"
-                                                        ),
-                                                        dcc.DatePickerSingle(
-                                                            id="retrieve-update-end-date"
-                                                        ),
-                                                    ],
-                                                    width=3,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label(
-                                                            "End Time (Optional)"
-                                                        ),
-                                                        dbc.Input(
-                                                            id="retrieve-update-end-time",
-                                                            type="text",
-                                                            placeholder="HH:MM (e.g., 14:30)",
-                                                            pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$",
-                                                        ),
-                                                    ],
-                                                    width=3,
-                                                ),
-                                            ]
-                                        ),
-                                        dbc.Button(
-                                            "Retrieve",
-                                            id="retrieve-button",
-                                            color="primary",
-                                            className="mt-3",
-                                        ),
-                                        html.Div(id="retrieve-output"),
-                                    ],
-                                ),
-                                dbc.Tab(
-                                    label="Update",
-                                    children=[
-                                        html.H3("Update Record"),
-                                        dbc.Row(
-                                            [
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label("First Name"),
-                                                        dbc.Input(
-                                                            id="update-first-name",
-                                                            type="text",
-                                                            placeholder="Enter first name",
-                                                        ),
-                                                    ],
-                                                    width=6,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label("Last Name"),
-                                                        dbc.Input(
-                                                            id="update-last-name",
-                                                            type="text",
-                                                            placeholder="Enter last name",
-                                                        ),
-                                                    ],
-                                                    width=6,
-                                                ),
-                                            ]
-                                        ),
-                                        dbc.Row(
-                                            [
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label("LOINC Number"),
-                                                        dbc.Input(
-                                                            id="update-loinc",
-                                                            type="text",
-                                                            placeholder="Enter LOINC number",
-                                                        ),
-                                                    ],
-                                                    width=6,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label("New Value"),
-                                                        dbc.Input(
-                                                            id="update-value",
-                                                            type="text",
-                                                            placeholder="Enter new value",
-                                                        ),
-                                                    ],
-                                                    width=6,
-                                                ),
-                                            ]
-                                        ),
-                                        dbc.Row(
-                                            [
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label("Update Date"),
-                                                        dcc.DatePickerSingle(
-                                                            id="update-datetime"
-                                                        ),
-                                                    ],
-                                                    width=2,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label(
-                                                            "Update Time (Optional)"
-                                                        ),
-                                                        dbc.Input(
-                                                            id="update-time",
-                                                            type="text",
-                                                            placeholder="HH:MM (e.g., 14:30)",
-                                                            pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$",
-                                                        ),
-                                                    ],
-                                                    width=2,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Button(
-                                                            "Now",
-                                                            id="update-now-button",
-                                                            color="secondary",
-                                                            size="sm",
-                                                            className="mt-4",
-                                                        ),
-                                                    ],
-                                                    width=1,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label("Measurement Date"),
-                                                        dcc.DatePickerSingle(
-                                                            id="update-measurement-datetime"
-                                                        ),
-                                                    ],
-                                                    width=2,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label(
-                                                            "Measurement Time (Optional)"
-                                                        ),
-                                                        dbc.Input(
-                                                            id="update-measurement-time",
-                                                            type="text",
-                                                            placeholder="HH:MM (e.g., 14:30)",
-                                                            pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$",
-                                                        ),
-                                                    ],
-                                                    width=2,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Button(
-                                                            "Now",
-                                                            id="update-measurement-now-button",
-                                                            color="secondary",
-                                                            size="sm",
-                                                            className="mt-4",
-                                                        ),
-                                                    ],
-                                                    width=1,
-                                                ),
-                                            ]
-                                        ),
-                                        dbc.Button(
-                                            "Update",
-                                            id="update-button",
-                                            color="primary",
-                                            className="mt-3",
-                                        ),
-                                        html.Div(id="update-output"),
-                                    ],
-                                ),
-                                dbc.Tab(
-                                    label="Delete",
-                                    children=[
-                                        html.H3("Delete Record"),
-                                        dbc.Row(
-                                            [
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label("First Name"),
-                                                        dbc.Input(
-                                                            id="delete-first-name",
-                                                            type="text",
-                                                            placeholder="Enter first name",
-                                                        ),
-                                                    ],
-                                                    width=6,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label("Last Name"),
-                                                        dbc.Input(
-                                                            id="delete-last-name",
-                                                            type="text",
-                                                            placeholder="Enter last name",
-                                                        ),
-                                                    ],
-                                                    width=6,
-                                                ),
-                                            ]
-                                        ),
-                                        dbc.Row(
-                                            [
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label("LOINC Number"),
-                                                        dbc.Input(
-                                                            id="delete-loinc",
-                                                            type="text",
-                                                            placeholder="Enter LOINC number",
-                                                        ),
-                                                    ],
-                                                    width=6,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label("Measurement Date"),
-                                                        dcc.DatePickerSingle(
-                                                            id="delete-measurement-datetime"
-                                                        ),
-                                                    ],
-                                                    width=3,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label(
-                                                            "Measurement Time (Optional)"
-                                                        ),
-                                                        dbc.Input(
-                                                            id="delete-measurement-time",
-                                                            type="text",
-                                                            placeholder="HH:MM (e.g., 14:30)",
-                                                            pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$",
-                                                        ),
-                                                    ],
-                                                    width=3,
-                                                ),
-                                            ]
-                                        ),
-                                        dbc.Row(
-                                            [
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label("Update Date"),
-                                                        dcc.DatePickerSingle(
-                                                            id="delete-update-datetime"
-                                                        ),
-                                                    ],
-                                                    width=2,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Label(
-                                                            "Update Time (Optional)"
-                                                        ),
-                                                        dbc.Input(
-                                                            id="delete-update-time",
-                                                            type="text",
-                                                            placeholder="HH:MM (e.g., 14:30)",
-                                                            pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$",
-                                                        ),
-                                                    ],
-                                                    width=2,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Button(
-                                                            "Now",
-                                                            id="delete-update-now-button",
-                                                            color="secondary",
-                                                            size="sm",
-                                                            className="mt-4",
-                                                        ),
-                                                    ],
-                                                    width=1,
-                                                ),
-                                            ]
-                                        ),
-                                        dbc.Button(
-                                            "Delete",
-                                            id="delete-button",
-                                            color="primary",
-                                            className="mt-3",
-                                        ),
-                                        html.Div(id="delete-output"),
-                                    ],
-                                ),
-                            ]
-                        ),
-                    ],
-                ),
-                dbc.Tab(
-                    label="Knowledge Database Management",
-                    children=[
-                        dbc.Tabs(
-                            [
-                                dbc.Tab(
-                                    label="Hemoglobin States",
-                                    children=[
-                                        html.Div(
-                                            [
-                                                html.H4("Hemoglobin States"),
-                                                dbc.Row(
-                                                    [
-                                                        dbc.Col(
-                                                            [
-                                                                dbc.Label(
-                                                                    "Select Gender"
-                                                                ),
-                                                                dcc.Dropdown(
-                                                                    id="hem-gender",
-                                                                    options=[
-                                                                        {
-                                                                            "label": "Female",
-                                                                            "value": Gender.FEMALE.value,
-                                                                        },
-                                                                        {
-                                                                            "label": "Male",
-                                                                            "value": Gender.MALE.value,
-                                                                        },
-                                                                    ],
-                                                                    value=Gender.FEMALE.value,
-                                                                ),
-                                                            ],
-                                                            width=4,
-                                                        )
-                                                    ],
-                                                    className="mb-3",
-                                                ),
-                                                html.Div(id="hem-table-container"),
-                                                dbc.Row(
-                                                    [
-                                                        dbc.Col(
-                                                            [
-                                                                dbc.Button(
-                                                                    "Add Row",
-                                                                    id="hem-add-row-button",
-                                                                    color="info",
-                                                                    className="me-2",
-                                                                ),
-                                                                dbc.Button(
-                                                                    "Reset",
-                                                                    id="hem-reset-button",
-                                                                    color="warning",
-                                                                    className="me-2",
-                                                                ),
-                                                                dbc.Button(
-                                                                    "Save Changes",
-                                                                    id="hem-save-button",
-                                                                    color="success",
-                                                                ),
-                                                            ]
-                                                        )
-                                                    ],
-                                                    className="mt-3",
-                                                ),
-                                                html.Div(
-                                                    id="hem-output", className="mt-3"
-                                                ),
-                                                html.Div(
-                                                    id="hem-refresh-trigger",
-                                                    style={"display": "none"},
-                                                ),
-                                            ]
-                                        )
-                                    ],
-                                ),
-                                dbc.Tab(
-                                    label="Hematological States",
-                                    children=[
-                                        html.Div(
-                                            [
-                                                html.H4("Hematological States"),
-                                                dbc.Row(
-                                                    [
-                                                        dbc.Col(
-                                                            [
-                                                                dbc.Label(
-                                                                    "Select Gender"
-                                                                ),
-                                                                dcc.Dropdown(
-                                                                    id="hemat-gender",
-                                                                    options=[
-                                                                        {
-                                                                            "label": "Female",
-                                                                            "value": Gender.FEMALE.value,
-                                                                        },
-                                                                        {
-                                                                            "label": "Male",
-                                                                            "value": Gender.MALE.value,
-                                                                        },
-                                                                    ],
-                                                                    value=Gender.FEMALE.value,
-                                                                ),
-                                                            ],
-                                                            width=4,
-                                                        )
-                                                    ],
-                                                    className="mb-3",
-                                                ),
-                                                html.Div(id="hemat-table-container"),
-                                                dbc.Row(
-                                                    [
-                                                        dbc.Col(
-                                                            [
-                                                                dbc.Button(
-                                                                    "Add Row",
-                                                                    id="hemat-add-row-button",
-                                                                    color="info",
-                                                                    className="me-2",
-                                                                ),
-                                                                dbc.Button(
-                                                                    "Reset",
-                                                                    id="hemat-reset-button",
-                                                                    color="warning",
-                                                                    className="me-2",
-                                                                ),
-                                                                dbc.Button(
-                                                                    "Save Changes",
-                                                                    id="hemat-save-button",
-                                                                    color="success",
-                                                                ),
-                                                            ]
-                                                        )
-                                                    ],
-                                                    className="mt-3",
-                                                ),
-                                                html.Div(
-                                                    id="hemat-output", className="mt-3"
-                                                ),
-                                                html.Div(
-                                                    id="hemat-refresh-trigger",
-                                                    style={"display": "none"},
-                                                ),
-                                            ]
-                                        )
-                                    ],
-                                ),
-                                dbc.Tab(
-                                    label="Systemic Table",
-                                    children=[
-                                        html.Div(
-                                            [
-                                                html.H4("Systemic Table"),
-                                                html.Div(id="sys-table-container"),
-                                                dbc.Row(
-                                                    [
-                                                        dbc.Col(
-                                                            [
-                                                                dbc.Button(
-                                                                    "Add Row",
-                                                                    id="sys-add-row-button",
-                                                                    color="info",
-                                                                    className="me-2",
-                                                                ),
-                                                                dbc.Button(
-                                                                    "Reset",
-                                                                    id="sys-reset-button",
-                                                                    color="warning",
-                                                                    className="me-2",
-                                                                ),
-                                                                dbc.Button(
-                                                                    "Save Changes",
-                                                                    id="sys-save-button",
-                                                                    color="success",
-                                                                ),
-                                                            ]
-                                                        )
-                                                    ],
-                                                    className="mt-3",
-                                                ),
-                                                html.Div(
-                                                    id="sys-output", className="mt-3"
-                                                ),
-                                                html.Div(
-                                                    id="sys-refresh-trigger",
-                                                    style={"display": "none"},
-                                                ),
-                                            ]
-                                        )
-                                    ],
-                                ),
-                                dbc.Tab(
-                                    label="Recommendations",
-                                    children=[
-                                        html.Div(
-                                            [
-                                                html.H4("Recommendations"),
-                                                dbc.Row(
-                                                    [
-                                                        dbc.Col(
-                                                            [
-                                                                dbc.Label(
-                                                                    "Select Gender"
-                                                                ),
-                                                                dcc.Dropdown(
-                                                                    id="rec-gender",
-                                                                    options=[
-                                                                        {
-                                                                            "label": "Female",
-                                                                            "value": Gender.FEMALE.value,
-                                                                        },
-                                                                        {
-                                                                            "label": "Male",
-                                                                            "value": Gender.MALE.value,
-                                                                        },
-                                                                    ],
-                                                                    value=Gender.FEMALE.value,
-                                                                ),
-                                                            ],
-                                                            width=4,
-                                                        )
-                                                    ],
-                                                    className="mb-3",
-                                                ),
-                                                html.Div(id="rec-table-container"),
-                                                dbc.Row(
-                                                    [
-                                                        dbc.Col(
-                                                            [
-                                                                dbc.Button(
-                                                                    "Add Row",
-                                                                    id="rec-add-row-button",
-                                                                    color="info",
-                                                                    className="me-2",
-                                                                ),
-                                                                dbc.Button(
-                                                                    "Reset",
-                                                                    id="rec-reset-button",
-                                                                    color="warning",
-                                                                    className="me-2",
-                                                                ),
-                                                                dbc.Button(
-                                                                    "Save Changes",
-                                                                    id="rec-save-button",
-                                                                    color="success",
-                                                                ),
-                                                            ]
-                                                        )
-                                                    ],
-                                                    className="mt-3",
-                                                ),
-                                                html.Div(
-                                                    id="rec-output", className="mt-3"
-                                                ),
-                                                html.Div(
-                                                    id="rec-refresh-trigger",
-                                                    style={"display": "none"},
-                                                ),
-                                            ]
-                                        )
-                                    ],
-                                ),
-                                dbc.Tab(
-                                    label="Test Validity",
-                                    children=[
-                                        html.Div(
-                                            [
-                                                html.H3("Test Validity Periods"),
-                                                html.Div(id="validity-table-container"),
-                                                html.Div(
-                                                    [
-                                                        dbc.Button(
-                                                            "Add Row",
-                                                            id="validity-add-row-button",
-                                                            color="info",
-                                                            className="me-2",
-                                                        ),
-                                                        dbc.Button(
-                                                            "Reset",
-                                                            id="validity-reset-button",
-                                                            n_clicks=0,
-                                                            color="warning",
-                                                            className="me-2",
-                                                        ),
-                                                        dbc.Button(
-                                                            "Save Changes",
-                                                            id="validity-save-button",
-                                                            n_clicks=0,
-                                                            color="success",
-                                                        ),
-                                                    ],
-                                                    className="mt-3",
-                                                ),
-                                                html.Div(
-                                                    id="validity-output",
-                                                    className="mt-3",
-                                                ),
-                                                html.Div(
-                                                    id="validity-refresh-trigger",
-                                                    style={"display": "none"},
-                                                ),
-                                            ]
-                                        )
-                                    ],
-                                ),
-                            ]
-                        ),
-                    ],
-                ),
-                dbc.Tab(
-                    label="DSS",
-                    children=[
-                        html.Div(
-                            [
-                                html.H3("Patient State Analysis"),
-                                html.Div(
-                                    [
-                                        # Patient selection and datetime picker in a row
-                                        dbc.Row(
-                                            [
-                                                dbc.Col(
-                                                    [
-                                                        html.Label("Select Patient:"),
-                                                        dcc.Dropdown(
-                                                            id="patient-selector",
-                                                            options=patient_options,
-                                                            placeholder="Select a patient...",
-                                                        ),
-                                                    ],
-                                                    width=6,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        html.Label(
-                                                            "Select Date and Time (Optional):"
-                                                        ),
-                                                        dcc.DatePickerSingle(
-                                                            id="date-picker",
-                                                            placeholder="Select a date...",
-                                                            clearable=True,
-                                                        ),
-                                                        dcc.Input(
-                                                            id="time-picker",
-                                                            type="text",
-                                                            placeholder="Select time...",
-                                                            style={
-                                                                "marginLeft": "10px"
-                                                            },
-                                                        ),
-                                                    ],
-                                                    width=6,
-                                                ),
-                                            ]
-                                        ),
-                                        # Recommendation display
-                                        html.Div(
-                                            id="recommendation-display",
-                                            style={
-                                                "marginTop": "20px",
-                                                "marginBottom": "20px",
-                                            },
-                                        ),
-                                        html.Hr(),
-                                        html.H4("Hemoglobin State Analysis"),
-                                        dcc.Graph(id="patient-state-graph"),
-                                        html.Hr(),
-                                        html.H4("Hematological State Analysis"),
-                                        dcc.Graph(id="hematological-state-graph"),
-                                    ]
-                                ),
-                            ]
-                        )
-                    ],
-                ),
-                dbc.Tab(
-                    label="Overview",
-                    children=[
-                        html.Div(
-                            [
-                                html.H3("Patient Overview"),
-                                html.Div(
-                                    [
-                                        # Datetime picker
-                                        dbc.Row(
-                                            [
-                                                dbc.Col(
-                                                    [
-                                                        html.Label(
-                                                            "Select Date and Time:"
-                                                        ),
-                                                        dcc.DatePickerSingle(
-                                                            id="overview-date-picker",
-                                                            placeholder="Select a date...",
-                                                            clearable=True,
-                                                        ),
-                                                        dcc.Input(
-                                                            id="overview-time-picker",
-                                                            type="text",
-                                                            placeholder="Select time (HH:MM)...",
-                                                            value="10:00",
-                                                            style={
-                                                                "marginLeft": "10px"
-                                                            },
-                                                        ),
-                                                    ],
-                                                    width=6,
-                                                ),
-                                            ],
-                                            className="mb-4",
-                                        ),
-                                        # Patient cards grid
-                                        html.Div(id="overview-cards-container"),
-                                    ]
-                                ),
-                            ]
-                        )
-                    ],
-                ),
-            ]
-        ),
-    ],
-    fluid=True,
-)
+# Number of patients computed between two progress updates of the overview
+OVERVIEW_CHUNK_SIZE = 10
+
+# Overview snapshots precomputed in the background for "now" and shift starts
+OVERVIEW_REFRESH_MINUTES = 5
+OVERVIEW_SHIFT_STARTS = ("07:00", "15:00", "23:00")
+
+_data_lock = threading.RLock()
+_shared_store = None
+_db_handler = None
+_knowledge_db = None
+
+
+def get_shared_store():
+    """Return the store shared with the other workers, or None in single-process mode."""
+    global _shared_store
+    if _shared_store is None and SHARED_STORE_PATH:
+        with _data_lock:
+            if _shared_store is None:
+                from shared_store import SharedVersionStore
+
+                _shared_store = SharedVersionStore(SHARED_STORE_PATH)
+    return _shared_store
+
+
+def get_db_handler():
+    """Return the patient database handler, loading the CSV on first use."""
+    global _db_handler
+    if _db_handler is None:
+        with _data_lock:
+            if _db_handler is None:
+                from db_handler import DBHandler
+
+                loinc_cache = None
+                if os.path.exists(LOINC_CACHE_PATH):
+                    from loinc_name_fetcher import LoincNameCache
+
+                    loinc_cache = LoincNameCache(LOINC_CACHE_PATH)
+                _db_handler = DBHandler(
+                    PROJECT_DB_PATH, shared_store=get_shared_store(), loinc_cache=loinc_cache
+                )
+                return _db_handler
+    _db_handler.sync()
+    return _db_handler
+
+
+def get_knowledge_db():
+    """Return the knowledge base handler (its tables are themselves loaded lazily)."""
+    global _knowledge_db
+    if _knowledge_db is None:
+        with _data_lock:
+            if _knowledge_db is None:
+                from knowledge_db_handler import KnowledgeDataHandler
+
+                _knowledge_db = KnowledgeDataHandler(shared_store=get_shared_store())
+                return _knowledge_db
+    _knowledge_db.sync()
+    return _knowledge_db
+
+
+def get_project_db():
+    """Return the current records used by the state calculators (the DB handler's view)."""
+    return get_db_handler().df
+
+
+def _gender(value):
+    from knowledge_db_handler import Gender
+
+    return Gender(value)
+
+
+def get_patient_directory():
+    """Return the patient directory kept up to date by the DB handler."""
+    return get_db_handler().directory
+
+
+def get_patient_options():
+    """Return the patient dropdown options (unique full names)."""
+    return get_patient_directory().options()
+
+
+def serve_layout():
+    """Build the page layout; called by Dash on each page load, not at import."""
+    from knowledge_db_handler import Gender
+
+    patient_options = get_patient_options()
+    # The overview opens at the current minute, the one its precomputed snapshot covers
+    now = datetime.now()
+
+    return dbc.Container(
+        [
+            dbc.Tabs(
+                [
+                    dbc.Tab(
+                        label="Patient Database",
+                        children=[
+                            dbc.Tabs(
+                                [
+                                    dbc.Tab(
+                                        label="Retrieve",
+                                        children=[
+                                            html.H3("Retrieve Records"),
+                                            dbc.Row(
+                                                [
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label("First Name"),
+                                                            dbc.Input(
+                                                                id="retrieve-first-name",
+                                                                type="text",
+                                                                placeholder="Enter first name",
+                                                            ),
+                                                        ],
+                                                        width=6,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label("Last Name"),
+                                                            dbc.Input(
+                                                                id="retrieve-last-name",
+                                                                type="text",
+                                                                placeholder="Enter last name",
+                                                            ),
+                                                        ],
+                                                        width=6,
+                                                    ),
+                                                ]
+                                            ),
+                                            dbc.Row(
+                                                [
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label("LOINC Number"),
+                                                            dbc.Input(
+                                                                id="retrieve-loinc",
+                                                                type="text",
+                                                                placeholder="Enter LOINC number",
+                                                            ),
+                                                        ],
+                                                        width=6,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label("Measurement Date"),
+                                                            dcc.DatePickerSingle(
+                                                                id="retrieve-measurement-date"
+                                                            ),
+                                                        ],
+                                                        width=3,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label(
+                                                                "Measurement Time (Optional)"
+                                                            ),
+                                                            dbc.Input(
+                                                                id="retrieve-measurement-time",
+                                                                type="text",
+                                                                placeholder="HH:MM (e.g., 14:30)",
+                                                                pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$",
+                                                            ),
+                                                        ],
+                                                        width=3,
+                                                    ),
+                                                ]
+                                            ),
+                                            dbc.Row(
+                                                [
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label(
+                                                                "Update Date Range Start"
+                                                            ),
+                                                            dcc.DatePickerSingle(
+                                                                id="retrieve-update-start-date"
+                                                            ),
+                                                        ],
+                                                        width=3,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label(
+                                                                "Start Time (Optional)"
+                                                            ),
+                                                            dbc.Input(
+                                                                id="retrieve-update-start-time",
+                                                                type="text",
+                                                                placeholder="HH:MM (e.g., 14:30)",
+                                                                pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$",
+                                                            ),
+                                                        ],
+                                                        width=3,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label(
+                                                                "Update Date Range End"
+                                                            ),
+                                                            dcc.DatePickerSingle(
+                                                                id="retrieve-update-end-date"
+                                                            ),
+                                                        ],
+                                                        width=3,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label(
+                                                                "End Time (Optional)"
+                                                            ),
+                                                            dbc.Input(
+                                                                id="retrieve-update-end-time",
+                                                                type="text",
+                                                                placeholder="HH:MM (e.g., 14:30)",
+                                                                pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$",
+                                                            ),
+                                                        ],
+                                                        width=3,
+                                                    ),
+                                                ]
+                                            ),
+                                            dbc.Button(
+                                                "Retrieve",
+                                                id="retrieve-button",
+                                                color="primary",
+                                                className="mt-3",
+                                            ),
+                                            html.Div(id="retrieve-output"),
+                                        ],
+                                    ),
+                                    dbc.Tab(
+                                        label="Update",
+                                        children=[
+                                            html.H3("Update Record"),
+                                            dbc.Row(
+                                                [
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label("First Name"),
+                                                            dbc.Input(
+                                                                id="update-first-name",
+                                                                type="text",
+                                                                placeholder="Enter first name",
+                                                            ),
+                                                        ],
+                                                        width=6,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label("Last Name"),
+                                                            dbc.Input(
+                                                                id="update-last-name",
+                                                                type="text",
+                                                                placeholder="Enter last name",
+                                                            ),
+                                                        ],
+                                                        width=6,
+                                                    ),
+                                                ]
+                                            ),
+                                            dbc.Row(
+                                                [
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label("LOINC Number"),
+                                                            dbc.Input(
+                                                                id="update-loinc",
+                                                                type="text",
+                                                                placeholder="Enter LOINC number",
+                                                            ),
+                                                        ],
+                                                        width=6,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label("New Value"),
+                                                            dbc.Input(
+                                                                id="update-value",
+                                                                type="text",
+                                                                placeholder="Enter new value",
+                                                            ),
+                                                        ],
+                                                        width=6,
+                                                    ),
+                                                ]
+                                            ),
+                                            dbc.Row(
+                                                [
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label("Update Date"),
+                                                            dcc.DatePickerSingle(
+                                                                id="update-datetime"
+                                                            ),
+                                                        ],
+                                                        width=2,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label(
+                                                                "Update Time (Optional)"
+                                                            ),
+                                                            dbc.Input(
+                                                                id="update-time",
+                                                                type="text",
+                                                                placeholder="HH:MM (e.g., 14:30)",
+                                                                pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$",
+                                                            ),
+                                                        ],
+                                                        width=2,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Button(
+                                                                "Now",
+                                                                id="update-now-button",
+                                                                color="secondary",
+                                                                size="sm",
+                                                                className="mt-4",
+                                                            ),
+                                                        ],
+                                                        width=1,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label("Measurement Date"),
+                                                            dcc.DatePickerSingle(
+                                                                id="update-measurement-datetime"
+                                                            ),
+                                                        ],
+                                                        width=2,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label(
+                                                                "Measurement Time (Optional)"
+                                                            ),
+                                                            dbc.Input(
+                                                                id="update-measurement-time",
+                                                                type="text",
+                                                                placeholder="HH:MM (e.g., 14:30)",
+                                                                pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$",
+                                                            ),
+                                                        ],
+                                                        width=2,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Button(
+                                                                "Now",
+                                                                id="update-measurement-now-button",
+                                                                color="secondary",
+                                                                size="sm",
+                                                                className="mt-4",
+                                                            ),
+                                                        ],
+                                                        width=1,
+                                                    ),
+                                                ]
+                                            ),
+                                            dbc.Button(
+                                                "Update",
+                                                id="update-button",
+                                                color="primary",
+                                                className="mt-3",
+                                            ),
+                                            html.Div(id="update-output"),
+                                        ],
+                                    ),
+                                    dbc.Tab(
+                                        label="Delete",
+                                        children=[
+                                            html.H3("Delete Record"),
+                                            dbc.Row(
+                                                [
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label("First Name"),
+                                                            dbc.Input(
+                                                                id="delete-first-name",
+                                                                type="text",
+                                                                placeholder="Enter first name",
+                                                            ),
+                                                        ],
+                                                        width=6,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label("Last Name"),
+                                                            dbc.Input(
+                                                                id="delete-last-name",
+                                                                type="text",
+                                                                placeholder="Enter last name",
+                                                            ),
+                                                        ],
+                                                        width=6,
+                                                    ),
+                                                ]
+                                            ),
+                                            dbc.Row(
+                                                [
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label("LOINC Number"),
+                                                            dbc.Input(
+                                                                id="delete-loinc",
+                                                                type="text",
+                                                                placeholder="Enter LOINC number",
+                                                            ),
+                                                        ],
+                                                        width=6,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label("Measurement Date"),
+                                                            dcc.DatePickerSingle(
+                                                                id="delete-measurement-datetime"
+                                                            ),
+                                                        ],
+                                                        width=3,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label(
+                                                                "Measurement Time (Optional)"
+                                                            ),
+                                                            dbc.Input(
+                                                                id="delete-measurement-time",
+                                                                type="text",
+                                                                placeholder="HH:MM (e.g., 14:30)",
+                                                                pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$",
+                                                            ),
+                                                        ],
+                                                        width=3,
+                                                    ),
+                                                ]
+                                            ),
+                                            dbc.Row(
+                                                [
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label("Update Date"),
+                                                            dcc.DatePickerSingle(
+                                                                id="delete-update-datetime"
+                                                            ),
+                                                        ],
+                                                        width=2,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Label(
+                                                                "Update Time (Optional)"
+                                                            ),
+                                                            dbc.Input(
+                                                                id="delete-update-time",
+                                                                type="text",
+                                                                placeholder="HH:MM (e.g., 14:30)",
+                                                                pattern="^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$",
+                                                            ),
+                                                        ],
+                                                        width=2,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Button(
+                                                                "Now",
+                                                                id="delete-update-now-button",
+                                                                color="secondary",
+                                                                size="sm",
+                                                                className="mt-4",
+                                                            ),
+                                                        ],
+                                                        width=1,
+                                                    ),
+                                                ]
+                                            ),
+                                            dbc.Button(
+                                                "Delete",
+                                                id="delete-button",
+                                                color="primary",
+                                                className="mt-3",
+                                            ),
+                                            html.Div(id="delete-output"),
+                                        ],
+                                    ),
+                                ]
+                            ),
+                        ],
+                    ),
+                    dbc.Tab(
+                        label="Knowledge Database Management",
+                        children=[
+                            dbc.Tabs(
+                                [
+                                    dbc.Tab(
+                                        label="Hemoglobin States",
+                                        children=[
+                                            html.Div(
+                                                [
+                                                    html.H4("Hemoglobin States"),
+                                                    dbc.Row(
+                                                        [
+                                                            dbc.Col(
+                                                                [
+                                                                    dbc.Label(
+                                                                        "Select Gender"
+                                                                    ),
+                                                                    dcc.Dropdown(
+                                                                        id="hem-gender",
+                                                                        options=[
+                                                                            {
+                                                                                "label": "Female",
+                                                                                "value": Gender.FEMALE.value,
+                                                                            },
+                                                                            {
+                                                                                "label": "Male",
+                                                                                "value": Gender.MALE.value,
+                                                                            },
+                                                                        ],
+                                                                        value=Gender.FEMALE.value,
+                                                                    ),
+                                                                ],
+                                                                width=4,
+                                                            )
+                                                        ],
+                                                        className="mb-3",
+                                                    ),
+                                                    html.Div(id="hem-table-container"),
+                                                    dbc.Row(
+                                                        [
+                                                            dbc.Col(
+                                                                [
+                                                                    dbc.Button(
+                                                                        "Add Row",
+                                                                        id="hem-add-row-button",
+                                                                        color="info",
+                                                                        className="me-2",
+                                                                    ),
+                                                                    dbc.Button(
+                                                                        "Reset",
+                                                                        id="hem-reset-button",
+                                                                        color="warning",
+                                                                        className="me-2",
+                                                                    ),
+                                                                    dbc.Button(
+                                                                        "Save Changes",
+                                                                        id="hem-save-button",
+                                                                        color="success",
+                                                                    ),
+                                                                ]
+                                                            )
+                                                        ],
+                                                        className="mt-3",
+                                                    ),
+                                                    html.Div(
+                                                        id="hem-output", className="mt-3"
+                                                    ),
+                                                    html.Div(
+                                                        id="hem-refresh-trigger",
+                                                        style={"display": "none"},
+                                                    ),
+                                                ]
+                                            )
+                                        ],
+                                    ),
+                                    dbc.Tab(
+                                        label="Hematological States",
+                                        children=[
+                                            html.Div(
+                                                [
+                                                    html.H4("Hematological States"),
+                                                    dbc.Row(
+                                                        [
+                                                            dbc.Col(
+                                                                [
+                                                                    dbc.Label(
+                                                                        "Select Gender"
+                                                                    ),
+                                                                    dcc.Dropdown(
+                                                                        id="hemat-gender",
+                                                                        options=[
+                                                                            {
+                                                                                "label": "Female",
+                                                                                "value": Gender.FEMALE.value,
+                                                                            },
+                                                                            {
+                                                                                "label": "Male",
+                                                                                "value": Gender.MALE.value,
+                                                                            },
+                                                                        ],
+                                                                        value=Gender.FEMALE.value,
+                                                                    ),
+                                                                ],
+                                                                width=4,
+                                                            )
+                                                        ],
+                                                        className="mb-3",
+                                                    ),
+                                                    html.Div(id="hemat-table-container"),
+                                                    dbc.Row(
+                                                        [
+                                                            dbc.Col(
+                                                                [
+                                                                    dbc.Button(
+                                                                        "Add Row",
+                                                                        id="hemat-add-row-button",
+                                                                        color="info",
+                                                                        className="me-2",
+                                                                    ),
+                                                                    dbc.Button(
+                                                                        "Reset",
+                                                                        id="hemat-reset-button",
+                                                                        color="warning",
+                                                                        className="me-2",
+                                                                    ),
+                                                                    dbc.Button(
+                                                                        "Save Changes",
+                                                                        id="hemat-save-button",
+                                                                        color="success",
+                                                                    ),
+                                                                ]
+                                                            )
+                                                        ],
+                                                        className="mt-3",
+                                                    ),
+                                                    html.Div(
+                                                        id="hemat-output", className="mt-3"
+                                                    ),
+                                                    html.Div(
+                                                        id="hemat-refresh-trigger",
+                                                        style={"display": "none"},
+                                                    ),
+                                                ]
+                                            )
+                                        ],
+                                    ),
+                                    dbc.Tab(
+                                        label="Systemic Table",
+                                        children=[
+                                            html.Div(
+                                                [
+                                                    html.H4("Systemic Table"),
+                                                    html.Div(id="sys-table-container"),
+                                                    dbc.Row(
+                                                        [
+                                                            dbc.Col(
+                                                                [
+                                                                    dbc.Button(
+                                                                        "Add Row",
+                                                                        id="sys-add-row-button",
+                                                                        color="info",
+                                                                        className="me-2",
+                                                                    ),
+                                                                    dbc.Button(
+                                                                        "Reset",
+                                                                        id="sys-reset-button",
+                                                                        color="warning",
+                                                                        className="me-2",
+                                                                    ),
+                                                                    dbc.Button(
+                                                                        "Save Changes",
+                                                                        id="sys-save-button",
+                                                                        color="success",
+                                                                    ),
+                                                                ]
+                                                            )
+                                                        ],
+                                                        className="mt-3",
+                                                    ),
+                                                    html.Div(
+                                                        id="sys-output", className="mt-3"
+                                                    ),
+                                                    html.Div(
+                                                        id="sys-refresh-trigger",
+                                                        style={"display": "none"},
+                                                    ),
+                                                ]
+                                            )
+                                        ],
+                                    ),
+                                    dbc.Tab(
+                                        label="Recommendations",
+                                        children=[
+                                            html.Div(
+                                                [
+                                                    html.H4("Recommendations"),
+                                                    dbc.Row(
+                                                        [
+                                                            dbc.Col(
+                                                                [
+                                                                    dbc.Label(
+                                                                        "Select Gender"
+                                                                    ),
+                                                                    dcc.Dropdown(
+                                                                        id="rec-gender",
+                                                                        options=[
+                                                                            {
+                                                                                "label": "Female",
+                                                                                "value": Gender.FEMALE.value,
+                                                                            },
+                                                                            {
+                                                                                "label": "Male",
+                                                                                "value": Gender.MALE.value,
+                                                                            },
+                                                                        ],
+                                                                        value=Gender.FEMALE.value,
+                                                                    ),
+                                                                ],
+                                                                width=4,
+                                                            )
+                                                        ],
+                                                        className="mb-3",
+                                                    ),
+                                                    html.Div(id="rec-table-container"),
+                                                    dbc.Row(
+                                                        [
+                                                            dbc.Col(
+                                                                [
+                                                                    dbc.Button(
+                                                                        "Add Row",
+                                                                        id="rec-add-row-button",
+                                                                        color="info",
+                                                                        className="me-2",
+                                                                    ),
+                                                                    dbc.Button(
+                                                                        "Reset",
+                                                                        id="rec-reset-button",
+                                                                        color="warning",
+                                                                        className="me-2",
+                                                                    ),
+                                                                    dbc.Button(
+                                                                        "Save Changes",
+                                                                        id="rec-save-button",
+                                                                        color="success",
+                                                                    ),
+                                                                ]
+                                                            )
+                                                        ],
+                                                        className="mt-3",
+                                                    ),
+                                                    html.Div(
+                                                        id="rec-output", className="mt-3"
+                                                    ),
+                                                    html.Div(
+                                                        id="rec-refresh-trigger",
+                                                        style={"display": "none"},
+                                                    ),
+                                                ]
+                                            )
+                                        ],
+                                    ),
+                                    dbc.Tab(
+                                        label="Test Validity",
+                                        children=[
+                                            html.Div(
+                                                [
+                                                    html.H3("Test Validity Periods"),
+                                                    html.Div(id="validity-table-container"),
+                                                    html.Div(
+                                                        [
+                                                            dbc.Button(
+                                                                "Add Row",
+                                                                id="validity-add-row-button",
+                                                                color="info",
+                                                                className="me-2",
+                                                            ),
+                                                            dbc.Button(
+                                                                "Reset",
+                                                                id="validity-reset-button",
+                                                                n_clicks=0,
+                                                                color="warning",
+                                                                className="me-2",
+                                                            ),
+                                                            dbc.Button(
+                                                                "Save Changes",
+                                                                id="validity-save-button",
+                                                                n_clicks=0,
+                                                                color="success",
+                                                            ),
+                                                        ],
+                                                        className="mt-3",
+                                                    ),
+                                                    html.Div(
+                                                        id="validity-output",
+                                                        className="mt-3",
+                                                    ),
+                                                    html.Div(
+                                                        id="validity-refresh-trigger",
+                                                        style={"display": "none"},
+                                                    ),
+                                                ]
+                                            )
+                                        ],
+                                    ),
+                                ]
+                            ),
+                        ],
+                    ),
+                    dbc.Tab(
+                        label="DSS",
+                        children=[
+                            html.Div(
+                                [
+                                    html.H3("Patient State Analysis"),
+                                    html.Div(
+                                        [
+                                            # Patient selection and datetime picker in a row
+                                            dbc.Row(
+                                                [
+                                                    dbc.Col(
+                                                        [
+                                                            html.Label("Select Patient:"),
+                                                            dcc.Dropdown(
+                                                                id="patient-selector",
+                                                                options=patient_options,
+                                                                placeholder="Select a patient...",
+                                                            ),
+                                                        ],
+                                                        width=6,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            html.Label(
+                                                                "Select Date and Time (Optional):"
+                                                            ),
+                                                            dcc.DatePickerSingle(
+                                                                id="date-picker",
+                                                                placeholder="Select a date...",
+                                                                clearable=True,
+                                                            ),
+                                                            dcc.Input(
+                                                                id="time-picker",
+                                                                type="text",
+                                                                placeholder="Select time...",
+                                                                style={
+                                                                    "marginLeft": "10px"
+                                                                },
+                                                            ),
+                                                        ],
+                                                        width=6,
+                                                    ),
+                                                ]
+                                            ),
+                                            # Recommendation display
+                                            html.Div(
+                                                id="recommendation-display",
+                                                style={
+                                                    "marginTop": "20px",
+                                                    "marginBottom": "20px",
+                                                },
+                                            ),
+                                            html.Hr(),
+                                            html.H4("Hemoglobin State Analysis"),
+                                            dcc.Graph(id="patient-state-graph"),
+                                            html.Hr(),
+                                            html.H4("Hematological State Analysis"),
+                                            dcc.Graph(id="hematological-state-graph"),
+                                        ]
+                                    ),
+                                ]
+                            )
+                        ],
+                    ),
+                    dbc.Tab(
+                        label="Overview",
+                        children=[
+                            html.Div(
+                                [
+                                    html.H3("Patient Overview"),
+                                    html.Div(
+                                        [
+                                            # Datetime picker
+                                            dbc.Row(
+                                                [
+                                                    dbc.Col(
+                                                        [
+                                                            html.Label(
+                                                                "Select Date and Time:"
+                                                            ),
+                                                            dcc.DatePickerSingle(
+                                                                id="overview-date-picker",
+                                                                date=now.strftime("%Y-%m-%d"),
+                                                                placeholder="Select a date...",
+                                                                clearable=True,
+                                                            ),
+                                                            dcc.Input(
+                                                                id="overview-time-picker",
+                                                                type="text",
+                                                                placeholder="Select time (HH:MM)...",
+                                                                value=now.strftime("%H:%M"),
+                                                                style={
+                                                                    "marginLeft": "10px"
+                                                                },
+                                                            ),
+                                                        ],
+                                                        width=6,
+                                                    ),
+                                                ],
+                                                className="mb-4",
+                                            ),
+                                            # Progress of the background overview computation
+                                            dbc.Progress(
+                                                id="overview-progress",
+                                                value=0,
+                                                max=1,
+                                                striped=True,
+                                                animated=True,
+                                                className="mb-3",
+                                                style={"visibility": "hidden"},
+                                            ),
+                                            # Cards streamed while the overview is computed
+                                            html.Div(
+                                                id="overview-cards-partial",
+                                                style={"display": "none"},
+                                            ),
+                                            # Patient cards grid
+                                            html.Div(id="overview-cards-container"),
+                                        ]
+                                    ),
+                                ]
+                            )
+                        ],
+                    ),
+                ]
+            ),
+        ],
+        fluid=True,
+    )
 
 
 # Patient Database Callbacks
-@app.callback(
+@callback(
     Output("retrieve-output", "children"),
     [Input("retrieve-button", "n_clicks")],
     [
@@ -915,7 +999,7 @@ def retrieve_records(
         elif end_date:
             end_datetime = end_date
 
-        records = db_handler.retrieve_records(
+        records = get_db_handler().retrieve_records(
             first_name,
             last_name,
             loinc,
@@ -940,7 +1024,7 @@ def retrieve_records(
         return f"Error: {str(e)}"
 
 
-@app.callback(
+@callback(
     Output("update-output", "children"),
     [Input("update-button", "n_clicks")],
     [
@@ -982,7 +1066,7 @@ def update_record(
         elif measurement_datetime:
             measurement_datetime_combined = measurement_datetime
 
-        success, message, changed_records = db_handler.update_record(
+        success, message, changed_records = get_db_handler().update_record(
             first_name,
             last_name,
             loinc,
@@ -992,6 +1076,9 @@ def update_record(
         )
 
         if success:
+            # Precomputed overview snapshots no longer reflect the data
+            overview_scheduler.invalidate()
+
             # Create the result message
             result = [html.H4("✅ " + message)]
 
@@ -1017,7 +1104,7 @@ def update_record(
         return f"Error: {str(e)}"
 
 
-@app.callback(
+@callback(
     Output("delete-output", "children"),
     [Input("delete-button", "n_clicks")],
     [
@@ -1057,7 +1144,7 @@ def delete_record(
         elif update_datetime:
             update_datetime_combined = update_datetime
 
-        success, message, changed_records = db_handler.delete_record(
+        success, message, changed_records = get_db_handler().delete_record(
             first_name,
             last_name,
             loinc,
@@ -1066,6 +1153,9 @@ def delete_record(
         )
 
         if success:
+            # Precomputed overview snapshots no longer reflect the data
+            overview_scheduler.invalidate()
+
             # Create the result message
             result = [html.H4("✅ " + message)]
 
@@ -1092,7 +1182,7 @@ def delete_record(
 
 
 # Knowledge Database Callbacks
-@app.callback(
+@callback(
     Output("hem-table-container", "children"),
     [Input("hem-gender", "value"), Input("hem-refresh-trigger", "children")],
 )
@@ -1100,7 +1190,7 @@ def update_hem_table(gender, refresh_trigger):
     if not gender:
         return "Please select a gender"
 
-    df = knowledge_db.get_hemoglobin_table(Gender(gender))
+    df = get_knowledge_db().get_hemoglobin_table(_gender(gender))
     return dash_table.DataTable(
         id="hem-table",
         data=df.to_dict("records"),
@@ -1110,7 +1200,7 @@ def update_hem_table(gender, refresh_trigger):
     )
 
 
-@app.callback(
+@callback(
     Output("hemat-table-container", "children"),
     [Input("hemat-gender", "value"), Input("hemat-refresh-trigger", "children")],
 )
@@ -1118,7 +1208,7 @@ def update_hemat_table(gender, refresh_trigger):
     if not gender:
         return "Please select a gender"
 
-    df = knowledge_db.get_hematological_table(Gender(gender))
+    df = get_knowledge_db().get_hematological_table(_gender(gender))
 
     # Convert interval indices to strings for JSON serialization
     data = []
@@ -1126,17 +1216,17 @@ def update_hemat_table(gender, refresh_trigger):
         row_dict = {}
         # Add row interval information (WBC ranges)
         row_str = (
-            f"WBC {idx.left}-{idx.right}"
+            f"WBC {idx.left:g}-{idx.right:g}"
             if idx.right != float("inf")
-            else f"WBC {idx.left}+"
+            else f"WBC {idx.left:g}+"
         )
         row_dict["WBC Range"] = row_str
         # Add column data (Hemoglobin ranges)
         for col in df.columns:
             col_str = (
-                f"{col.left}-{col.right}"
+                f"{col.left:g}-{col.right:g}"
                 if col.right != float("inf")
-                else f"{col.left}+"
+                else f"{col.left:g}+"
             )
             row_dict[col_str] = row[col]
         data.append(row_dict)
@@ -1145,7 +1235,9 @@ def update_hemat_table(gender, refresh_trigger):
     columns = [{"name": "WBC Range", "id": "WBC Range"}]  # Add row header column
     for col in df.columns:
         col_str = (
-            f"{col.left}-{col.right}" if col.right != float("inf") else f"{col.left}+"
+            f"{col.left:g}-{col.right:g}"
+            if col.right != float("inf")
+            else f"{col.left:g}+"
         )
         hb_range = f"Hb {col_str}"
         columns.append({"name": hb_range, "id": col_str})
@@ -1155,12 +1247,12 @@ def update_hemat_table(gender, refresh_trigger):
     )
 
 
-@app.callback(
+@callback(
     Output("sys-table-container", "children"),
     [Input("sys-reset-button", "n_clicks"), Input("sys-refresh-trigger", "children")],
 )
 def update_sys_table(n_clicks, refresh_trigger):
-    df = knowledge_db.get_systemic_table()
+    df = get_knowledge_db().get_systemic_table()
     # Reset index to include condition names as a column
     df = df.reset_index()
     df = df.rename(columns={"index": "Condition"})
@@ -1173,7 +1265,7 @@ def update_sys_table(n_clicks, refresh_trigger):
     )
 
 
-@app.callback(
+@callback(
     Output("rec-table-container", "children"),
     [Input("rec-gender", "value"), Input("rec-refresh-trigger", "children")],
 )
@@ -1181,7 +1273,7 @@ def update_rec_table(gender, refresh_trigger):
     if not gender:
         return "Please select a gender"
 
-    df = knowledge_db.get_recommendations(Gender(gender))
+    df = get_knowledge_db().get_recommendations(_gender(gender))
     return dash_table.DataTable(
         id="rec-table",
         data=df.to_dict("records"),
@@ -1191,12 +1283,12 @@ def update_rec_table(gender, refresh_trigger):
     )
 
 
-@app.callback(
+@callback(
     Output("validity-table-container", "children"),
     [Input("validity-refresh-trigger", "children")],
 )
 def update_validity_table(refresh_trigger):
-    df = knowledge_db.get_test_validity_table()
+    df = get_knowledge_db().get_test_validity_table()
     return dash_table.DataTable(
         id="validity-table",
         columns=[
@@ -1218,7 +1310,7 @@ def update_validity_table(refresh_trigger):
 
 
 # Save and Reset callbacks for each table
-@app.callback(
+@callback(
     [Output("hem-output", "children"), Output("hem-refresh-trigger", "children")],
     [
         Input("hem-save-button", "n_clicks"),
@@ -1228,6 +1320,8 @@ def update_validity_table(refresh_trigger):
     [State("hem-gender", "value"), State("hem-table-container", "children")],
 )
 def handle_hem_changes(save_clicks, reset_clicks, add_clicks, gender, table_container):
+    import pandas as pd
+
     if not gender:
         return "Please select a gender", ""
 
@@ -1265,7 +1359,7 @@ def handle_hem_changes(save_clicks, reset_clicks, add_clicks, gender, table_cont
 
             # Update the knowledge database with the new data
             df = pd.DataFrame(current_data)
-            knowledge_db.hemoglobin_tables[Gender(gender)] = df
+            get_knowledge_db().hemoglobin_tables[_gender(gender)] = df
 
             return "Row added successfully", "refresh"
         except Exception as e:
@@ -1273,7 +1367,7 @@ def handle_hem_changes(save_clicks, reset_clicks, add_clicks, gender, table_cont
 
     if button_id == "hem-reset-button":
         # Reset to initial state
-        knowledge_db.reset_table("hemoglobin", Gender(gender))
+        get_knowledge_db().reset_table("hemoglobin", _gender(gender))
         return "Table reset to initial state", "refresh"
 
     if button_id == "hem-save-button":
@@ -1281,10 +1375,11 @@ def handle_hem_changes(save_clicks, reset_clicks, add_clicks, gender, table_cont
             if isinstance(table_container, dict) and "props" in table_container:
                 table_data = table_container["props"]["data"]
                 df = pd.DataFrame(table_data)
-                knowledge_db.hemoglobin_tables[Gender(gender)] = df
+                get_knowledge_db().hemoglobin_tables[_gender(gender)] = df
 
                 # Save to CSV file
-                success, message = knowledge_db.save_all_data()
+                success, message = get_knowledge_db().save_all_data()
+                overview_scheduler.invalidate()
                 if success:
                     return (
                         "Changes saved successfully to memory and CSV files",
@@ -1300,7 +1395,7 @@ def handle_hem_changes(save_clicks, reset_clicks, add_clicks, gender, table_cont
             return f"Error saving changes: {str(e)}", ""
 
 
-@app.callback(
+@callback(
     [Output("hemat-output", "children"), Output("hemat-refresh-trigger", "children")],
     [
         Input("hemat-save-button", "n_clicks"),
@@ -1312,6 +1407,8 @@ def handle_hem_changes(save_clicks, reset_clicks, add_clicks, gender, table_cont
 def handle_hemat_changes(
     save_clicks, reset_clicks, add_clicks, gender, table_container
 ):
+    from knowledge_db_handler import HematologicalTable
+
     if not gender:
         return "Please select a gender", ""
 
@@ -1322,64 +1419,27 @@ def handle_hemat_changes(
     button_id = ctx.triggered[0]["prop_id"].split(".")[0]
 
     if button_id == "hemat-add-row-button":
-        try:
-            # Get current data from the table
-            if (
-                table_container
-                and isinstance(table_container, dict)
-                and "props" in table_container
-            ):
-                current_data = table_container["props"]["data"]
-            else:
-                current_data = []
-
-            # Create a new empty row
-            new_row = {}
-            if current_data:
-                # Get column names from existing data
-                columns = list(current_data[0].keys())
-                for col in columns:
-                    new_row[col] = ""
-            else:
-                # Default columns for hematological states
-                new_row = {"state": "", "low_range": "", "high_range": ""}
-
-            # Add the new row
-            current_data.append(new_row)
-
-            # Update the knowledge database with the new data
-            df = pd.DataFrame(current_data)
-            knowledge_db.hematological_tables[Gender(gender)] = df
-
-            return "Row added successfully", "refresh"
-        except Exception as e:
-            return f"Error adding row: {str(e)}", ""
+        # Rows are WBC ranges covering every value, so a blank row cannot be stored
+        return "Rows are defined by WBC ranges; edit the existing ranges instead", ""
 
     if button_id == "hemat-reset-button":
         # Reset to initial state
-        knowledge_db.reset_table("hematological", Gender(gender))
+        get_knowledge_db().reset_table("hematological", _gender(gender))
         return "Table reset to initial state", "refresh"
 
     if button_id == "hemat-save-button":
         try:
             if isinstance(table_container, dict) and "props" in table_container:
                 table_data = table_container["props"]["data"]
-                df = pd.DataFrame(table_data)
 
-                # Convert string ranges back to intervals
-                new_df = pd.DataFrame(index=df.index)
-                for col in df.columns:
-                    if "+" in col:
-                        low = float(col.replace("+", ""))
-                        high = float("inf")
-                    else:
-                        low, high = map(float, col.split("-"))
-                    new_df[pd.Interval(low, high, closed="left")] = df[col]
-
-                knowledge_db.hematological_tables[Gender(gender)] = new_df
+                # Convert the displayed ranges back to the compact interval table
+                get_knowledge_db().hematological_tables[
+                    _gender(gender)
+                ] = HematologicalTable.from_display_records(table_data)
 
                 # Save to CSV file
-                success, message = knowledge_db.save_all_data()
+                success, message = get_knowledge_db().save_all_data()
+                overview_scheduler.invalidate()
                 if success:
                     return (
                         "Changes saved successfully to memory and CSV files",
@@ -1395,7 +1455,7 @@ def handle_hemat_changes(
             return f"Error saving changes: {str(e)}", ""
 
 
-@app.callback(
+@callback(
     [Output("sys-output", "children"), Output("sys-refresh-trigger", "children")],
     [
         Input("sys-save-button", "n_clicks"),
@@ -1405,6 +1465,8 @@ def handle_hemat_changes(
     [State("sys-table-container", "children")],
 )
 def handle_sys_changes(save_clicks, reset_clicks, add_clicks, table_container):
+    import pandas as pd
+
     ctx = dash.callback_context
     if not ctx.triggered:
         return "", ""
@@ -1439,7 +1501,7 @@ def handle_sys_changes(save_clicks, reset_clicks, add_clicks, table_container):
 
             # Update the knowledge database with the new data
             df = pd.DataFrame(current_data)
-            knowledge_db.systemic_table = df
+            get_knowledge_db().systemic_table = df
 
             return "Row added successfully", "refresh"
         except Exception as e:
@@ -1447,7 +1509,7 @@ def handle_sys_changes(save_clicks, reset_clicks, add_clicks, table_container):
 
     if button_id == "sys-reset-button":
         # Reset to initial state
-        knowledge_db.reset_table("systemic")
+        get_knowledge_db().reset_table("systemic")
         return "Table reset to initial state", "refresh"
 
     if button_id == "sys-save-button":
@@ -1457,10 +1519,11 @@ def handle_sys_changes(save_clicks, reset_clicks, add_clicks, table_container):
                 df = pd.DataFrame(table_data)
                 # Set the condition column as index
                 df = df.set_index("Condition")
-                knowledge_db.systemic_table = df
+                get_knowledge_db().systemic_table = df
 
                 # Save to CSV file
-                success, message = knowledge_db.save_all_data()
+                success, message = get_knowledge_db().save_all_data()
+                overview_scheduler.invalidate()
                 if success:
                     return (
                         "Changes saved successfully to memory and CSV files",
@@ -1476,7 +1539,7 @@ def handle_sys_changes(save_clicks, reset_clicks, add_clicks, table_container):
             return f"Error saving changes: {str(e)}", ""
 
 
-@app.callback(
+@callback(
     [Output("rec-output", "children"), Output("rec-refresh-trigger", "children")],
     [
         Input("rec-save-button", "n_clicks"),
@@ -1486,6 +1549,8 @@ def handle_sys_changes(save_clicks, reset_clicks, add_clicks, table_container):
     [State("rec-gender", "value"), State("rec-table-container", "children")],
 )
 def handle_rec_changes(save_clicks, reset_clicks, add_clicks, gender, table_container):
+    import pandas as pd
+
     if not gender:
         return "Please select a gender", ""
 
@@ -1523,7 +1588,7 @@ def handle_rec_changes(save_clicks, reset_clicks, add_clicks, gender, table_cont
 
             # Update the knowledge database with the new data
             df = pd.DataFrame(current_data)
-            knowledge_db.recommendations[Gender(gender)] = df
+            get_knowledge_db().recommendations[_gender(gender)] = df
 
             return "Row added successfully", "refresh"
         except Exception as e:
@@ -1531,7 +1596,7 @@ def handle_rec_changes(save_clicks, reset_clicks, add_clicks, gender, table_cont
 
     if button_id == "rec-reset-button":
         # Reset to initial state
-        knowledge_db.reset_table("recommendations", Gender(gender))
+        get_knowledge_db().reset_table("recommendations", _gender(gender))
         return "Table reset to initial state", "refresh"
 
     if button_id == "rec-save-button":
@@ -1539,10 +1604,11 @@ def handle_rec_changes(save_clicks, reset_clicks, add_clicks, gender, table_cont
             if isinstance(table_container, dict) and "props" in table_container:
                 table_data = table_container["props"]["data"]
                 df = pd.DataFrame(table_data)
-                knowledge_db.recommendations[Gender(gender)] = df
+                get_knowledge_db().recommendations[_gender(gender)] = df
 
                 # Save to CSV file
-                success, message = knowledge_db.save_all_data()
+                success, message = get_knowledge_db().save_all_data()
+                overview_scheduler.invalidate()
                 if success:
                     return (
                         "Changes saved successfully to memory and CSV files",
@@ -1558,7 +1624,7 @@ def handle_rec_changes(save_clicks, reset_clicks, add_clicks, gender, table_cont
             return f"Error saving changes: {str(e)}", ""
 
 
-@app.callback(
+@callback(
     [
         Output("validity-output", "children"),
         Output("validity-refresh-trigger", "children"),
@@ -1571,6 +1637,8 @@ def handle_rec_changes(save_clicks, reset_clicks, add_clicks, gender, table_cont
     [State("validity-table-container", "children")],
 )
 def handle_validity_changes(save_clicks, reset_clicks, add_clicks, table_container):
+    import pandas as pd
+
     ctx = dash.callback_context
     if not ctx.triggered:
         return "", ""
@@ -1605,7 +1673,7 @@ def handle_validity_changes(save_clicks, reset_clicks, add_clicks, table_contain
 
             # Update the knowledge database with the new data
             df = pd.DataFrame(current_data)
-            knowledge_db.test_validity_table = df
+            get_knowledge_db().test_validity_table = df
 
             return "Row added successfully", "refresh"
         except Exception as e:
@@ -1613,7 +1681,7 @@ def handle_validity_changes(save_clicks, reset_clicks, add_clicks, table_contain
 
     if button_id == "validity-reset-button":
         # Reset to initial state
-        knowledge_db.reset_table("test_validity")
+        get_knowledge_db().reset_table("test_validity")
         return "Table reset to initial state", "refresh"
 
     if button_id == "validity-save-button":
@@ -1625,14 +1693,15 @@ def handle_validity_changes(save_clicks, reset_clicks, add_clicks, table_contain
 
                     # Update each test's validity periods
                     for _, row in df.iterrows():
-                        knowledge_db.update_test_validity(
+                        get_knowledge_db().update_test_validity(
                             row["test_name"],
                             int(row["good-before"]),
                             int(row["good-after"]),
                         )
 
                     # Save to CSV file
-                    success, message = knowledge_db.save_all_data()
+                    success, message = get_knowledge_db().save_all_data()
+                    overview_scheduler.invalidate()
                     if success:
                         return (
                             "Changes saved successfully to memory and CSV files",
@@ -1648,7 +1717,7 @@ def handle_validity_changes(save_clicks, reset_clicks, add_clicks, table_contain
             return f"Error saving changes: {str(e)}", ""
 
 
-@app.callback(
+@callback(
     [
         Output("patient-state-graph", "figure"),
         Output("hematological-state-graph", "figure"),
@@ -1656,15 +1725,22 @@ def handle_validity_changes(save_clicks, reset_clicks, add_clicks, table_contain
     Input("patient-selector", "value"),
 )
 def update_patient_state_graph(selected_patient):
+    import plotly.graph_objects as go
+    from plotly.colors import qualitative
+    from patient_state_calculator import (
+        calculate_hemoglobin_states,
+        calculate_hematological_states,
+    )
+
     if not selected_patient:
         return go.Figure(), go.Figure()  # Return empty figures if no patient selected
 
     # Calculate states using the new functions
     hb_segments = calculate_hemoglobin_states(
-        project_db, knowledge_db, selected_patient
+        get_project_db(), get_knowledge_db(), selected_patient, get_patient_directory()
     )
     hema_segments = calculate_hematological_states(
-        project_db, knowledge_db, selected_patient
+        get_project_db(), get_knowledge_db(), selected_patient, get_patient_directory()
     )
 
     # --- HEMOGLOBIN STATE GRAPH ---
@@ -1673,7 +1749,7 @@ def update_patient_state_graph(selected_patient):
         unique_states_hb = set(seg["state"] for seg in hb_segments)
         color_map_hb = {
             state: color
-            for state, color in zip(unique_states_hb, px.colors.qualitative.Set2)
+            for state, color in zip(unique_states_hb, qualitative.Set2)
         }
 
         for seg in hb_segments:
@@ -1713,7 +1789,7 @@ def update_patient_state_graph(selected_patient):
         unique_states_hema = set(seg["state"] for seg in hema_segments)
         color_map_hema = {
             state: color
-            for state, color in zip(unique_states_hema, px.colors.qualitative.Set2)
+            for state, color in zip(unique_states_hema, qualitative.Set2)
         }
 
         for seg in hema_segments:
@@ -1750,7 +1826,7 @@ def update_patient_state_graph(selected_patient):
     return fig1, fig2
 
 
-@app.callback(
+@callback(
     Output("recommendation-display", "children"),
     [
         Input("patient-selector", "value"),
@@ -1759,6 +1835,8 @@ def update_patient_state_graph(selected_patient):
     ],
 )
 def update_recommendation(selected_patient, selected_date, selected_time):
+    from patient_state_calculator import calculate_recommendation
+
     if not selected_patient or not selected_date or not selected_time:
         return None
 
@@ -1768,7 +1846,7 @@ def update_recommendation(selected_patient, selected_date, selected_time):
 
         # Calculate recommendation
         recommendation = calculate_recommendation(
-            project_db, knowledge_db, selected_patient, dt
+            get_project_db(), get_knowledge_db(), selected_patient, dt, get_patient_directory()
         )
 
         if recommendation:
@@ -1800,11 +1878,223 @@ def update_recommendation(selected_patient, selected_date, selected_time):
         )
 
 
-@app.callback(
+def compute_patient_overview(full_name, dt):
+    """Compute the hemoglobin/hematological state, grade and recommendation of a patient at dt."""
+    from patient_state_calculator import (
+        calculate_hemoglobin_states,
+        calculate_hematological_states,
+        calculate_recommendation,
+        calculate_grade,
+    )
+
+    project_db = get_project_db()
+    knowledge_db = get_knowledge_db()
+    directory = get_patient_directory()
+    hb_states = calculate_hemoglobin_states(project_db, knowledge_db, full_name, directory)
+    hema_states = calculate_hematological_states(project_db, knowledge_db, full_name, directory)
+
+    # Find current hemoglobin state
+    hb_state = None
+    for seg in hb_states:
+        if seg["start"] <= dt <= seg["end"]:
+            hb_state = seg["state"]
+            break
+
+    # Find current hematological state
+    hema_state = None
+    for seg in hema_states:
+        if seg["start"] <= dt <= seg["end"]:
+            hema_state = seg["state"]
+            break
+
+    # Calculate grade
+    grade = calculate_grade(project_db, knowledge_db, full_name, dt)
+
+    # Calculate recommendation
+    recommendation = calculate_recommendation(project_db, knowledge_db, full_name, dt, directory)
+
+    return {
+        "hb_state": hb_state,
+        "hema_state": hema_state,
+        "grade": grade,
+        "recommendation": recommendation,
+    }
+
+
+def build_patient_card(full_name, gender, overview):
+    """Build the overview card of a single patient."""
+    hb_state = overview["hb_state"]
+    hema_state = overview["hema_state"]
+    grade = overview["grade"]
+    recommendation = overview["recommendation"]
+
+    # Determine colors
+    hb_color = "green" if hb_state == "Normal Hemoglobin" else "red"
+    hema_color = "green" if hema_state == "Normal" else "red"
+
+    # Grade color (more red for higher grades)
+    if grade is None:
+        grade_color = "gray"
+        grade_text = "N/A"
+    else:
+        grade_value = grade.value
+        if grade_value == 1:
+            grade_color = "#90EE90"  # Light green
+        elif grade_value == 2:
+            grade_color = "#FFD700"  # Gold
+        elif grade_value == 3:
+            grade_color = "#FFA500"  # Orange
+        elif grade_value == 4:
+            grade_color = "#FF4500"  # Red-orange
+        else:
+            grade_color = "#FF0000"  # Red
+        grade_text = f"Grade {grade_value}"
+
+    # Create card
+    card = dbc.Card(
+        [
+            dbc.CardHeader(
+                [
+                    html.H5(full_name, className="card-title mb-0"),
+                    html.Small(f"Gender: {gender}", className="text-muted"),
+                ]
+            ),
+            dbc.CardBody(
+                [
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                [
+                                    html.Strong("Hemoglobin State: "),
+                                    html.Span(
+                                        hb_state or "N/A",
+                                        style={
+                                            "color": hb_color,
+                                            "fontWeight": "bold",
+                                        },
+                                    ),
+                                ],
+                                width=6,
+                            ),
+                            dbc.Col(
+                                [
+                                    html.Strong("Hematological State: "),
+                                    html.Span(
+                                        hema_state or "N/A",
+                                        style={
+                                            "color": hema_color,
+                                            "fontWeight": "bold",
+                                        },
+                                    ),
+                                ],
+                                width=6,
+                            ),
+                        ],
+                        className="mb-2",
+                    ),
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                [
+                                    html.Strong("Grade: "),
+                                    html.Span(
+                                        grade_text,
+                                        style={
+                                            "color": grade_color,
+                                            "fontWeight": "bold",
+                                        },
+                                    ),
+                                ],
+                                width=6,
+                            ),
+                        ],
+                        className="mb-3",
+                    ),
+                    html.Hr(),
+                    html.Strong("Recommendation: "),
+                    html.P(
+                        recommendation or "No recommendation available",
+                        className="mb-0",
+                        style={"fontSize": "14px"},
+                    ),
+                ]
+            ),
+        ],
+        className="mb-3",
+        style={"border": "1px solid #ddd"},
+    )
+
+    return dbc.Col(card, width=6, className="mb-3")
+
+
+def build_error_card(full_name, gender, error):
+    """Build the overview card shown when a patient's states cannot be calculated."""
+    error_card = dbc.Card(
+        [
+            dbc.CardHeader(
+                [
+                    html.H5(full_name, className="card-title mb-0"),
+                    html.Small(f"Gender: {gender}", className="text-muted"),
+                ]
+            ),
+            dbc.CardBody(
+                [
+                    html.P(
+                        f"Error calculating states: {str(error)}",
+                        style={"color": "red", "fontSize": "14px"},
+                    )
+                ]
+            ),
+        ],
+        className="mb-3",
+        style={"border": "1px solid #ddd"},
+    )
+
+    return dbc.Col(error_card, width=6, className="mb-3")
+
+
+def list_overview_patients():
+    """Return the (full_name, gender) pairs shown in the overview."""
+    return [(patient.full_name, patient.gender) for patient in get_patient_directory()]
+
+
+overview_scheduler = OverviewSnapshotScheduler(
+    list_overview_patients,
+    compute_patient_overview,
+    interval_minutes=OVERVIEW_REFRESH_MINUTES,
+    shift_starts=OVERVIEW_SHIFT_STARTS,
+    current_version=lambda: (get_knowledge_db().version, get_db_handler().version),
+)
+
+
+@callback(
     Output("overview-cards-container", "children"),
     [Input("overview-date-picker", "date"), Input("overview-time-picker", "value")],
+    background=True,
+    progress=[
+        Output("overview-progress", "value"),
+        Output("overview-progress", "max"),
+        Output("overview-cards-partial", "children"),
+    ],
+    running=[
+        (
+            Output("overview-progress", "style"),
+            {"visibility": "visible"},
+            {"visibility": "hidden"},
+        ),
+        (
+            Output("overview-cards-partial", "style"),
+            {"display": "block"},
+            {"display": "none"},
+        ),
+        (
+            Output("overview-cards-container", "style"),
+            {"display": "none"},
+            {"display": "block"},
+        ),
+    ],
 )
-def update_overview_cards(selected_date, selected_time):
+def update_overview_cards(set_progress, selected_date, selected_time):
     if not selected_date or not selected_time:
         return html.Div("Please select both date and time to view patient overview.")
 
@@ -1812,169 +2102,37 @@ def update_overview_cards(selected_date, selected_time):
         # Combine date and time into a datetime object
         dt = datetime.strptime(f"{selected_date} {selected_time}", "%Y-%m-%d %H:%M")
 
-        # Get unique patients
-        unique_patients = project_db[
-            ["first_name", "last_name", "Gender"]
-        ].drop_duplicates()
-
-        cards = []
-        for _, patient in unique_patients.iterrows():
-            full_name = f"{patient['first_name']} {patient['last_name']}"
-            gender = patient["Gender"]
-
-            # Calculate states and grade for this patient
-            try:
-                hb_states = calculate_hemoglobin_states(
-                    project_db, knowledge_db, full_name
-                )
-                hema_states = calculate_hematological_states(
-                    project_db, knowledge_db, full_name
-                )
-
-                # Find current hemoglobin state
-                hb_state = None
-                for seg in hb_states:
-                    if seg["start"] <= dt <= seg["end"]:
-                        hb_state = seg["state"]
-                        break
-
-                # Find current hematological state
-                hema_state = None
-                for seg in hema_states:
-                    if seg["start"] <= dt <= seg["end"]:
-                        hema_state = seg["state"]
-                        break
-
-                # Calculate grade
-                grade = calculate_grade(project_db, knowledge_db, full_name, dt)
-
-                # Calculate recommendation
-                recommendation = calculate_recommendation(
-                    project_db, knowledge_db, full_name, dt
-                )
-
-                # Determine colors
-                hb_color = "green" if hb_state == "Normal Hemoglobin" else "red"
-                hema_color = "green" if hema_state == "Normal" else "red"
-
-                # Grade color (more red for higher grades)
-                if grade is None:
-                    grade_color = "gray"
-                    grade_text = "N/A"
+        # Serve precomputed snapshots (now, shift starts) without recomputing
+        snapshot = overview_scheduler.lookup(dt)
+        if snapshot is not None:
+            cards = []
+            for entry in snapshot:
+                if entry["error"] is not None:
+                    cards.append(
+                        build_error_card(entry["full_name"], entry["gender"], entry["error"])
+                    )
                 else:
-                    grade_value = grade.value
-                    if grade_value == 1:
-                        grade_color = "#90EE90"  # Light green
-                    elif grade_value == 2:
-                        grade_color = "#FFD700"  # Gold
-                    elif grade_value == 3:
-                        grade_color = "#FFA500"  # Orange
-                    elif grade_value == 4:
-                        grade_color = "#FF4500"  # Red-orange
-                    else:
-                        grade_color = "#FF0000"  # Red
-                    grade_text = f"Grade {grade_value}"
-
-                # Create card
-                card = dbc.Card(
-                    [
-                        dbc.CardHeader(
-                            [
-                                html.H5(full_name, className="card-title mb-0"),
-                                html.Small(f"Gender: {gender}", className="text-muted"),
-                            ]
-                        ),
-                        dbc.CardBody(
-                            [
-                                dbc.Row(
-                                    [
-                                        dbc.Col(
-                                            [
-                                                html.Strong("Hemoglobin State: "),
-                                                html.Span(
-                                                    hb_state or "N/A",
-                                                    style={
-                                                        "color": hb_color,
-                                                        "fontWeight": "bold",
-                                                    },
-                                                ),
-                                            ],
-                                            width=6,
-                                        ),
-                                        dbc.Col(
-                                            [
-                                                html.Strong("Hematological State: "),
-                                                html.Span(
-                                                    hema_state or "N/A",
-                                                    style={
-                                                        "color": hema_color,
-                                                        "fontWeight": "bold",
-                                                    },
-                                                ),
-                                            ],
-                                            width=6,
-                                        ),
-                                    ],
-                                    className="mb-2",
-                                ),
-                                dbc.Row(
-                                    [
-                                        dbc.Col(
-                                            [
-                                                html.Strong("Grade: "),
-                                                html.Span(
-                                                    grade_text,
-                                                    style={
-                                                        "color": grade_color,
-                                                        "fontWeight": "bold",
-                                                    },
-                                                ),
-                                            ],
-                                            width=6,
-                                        ),
-                                    ],
-                                    className="mb-3",
-                                ),
-                                html.Hr(),
-                                html.Strong("Recommendation: "),
-                                html.P(
-                                    recommendation or "No recommendation available",
-                                    className="mb-0",
-                                    style={"fontSize": "14px"},
-                                ),
-                            ]
-                        ),
-                    ],
-                    className="mb-3",
-                    style={"border": "1px solid #ddd"},
-                )
-
-                cards.append(dbc.Col(card, width=6, className="mb-3"))
-
-            except Exception as e:
-                # Create error card for this patient
-                error_card = dbc.Card(
-                    [
-                        dbc.CardHeader(
-                            [
-                                html.H5(full_name, className="card-title mb-0"),
-                                html.Small(f"Gender: {gender}", className="text-muted"),
-                            ]
-                        ),
-                        dbc.CardBody(
-                            [
-                                html.P(
-                                    f"Error calculating states: {str(e)}",
-                                    style={"color": "red", "fontSize": "14px"},
-                                )
-                            ]
-                        ),
-                    ],
-                    className="mb-3",
-                    style={"border": "1px solid #ddd"},
-                )
-
-                cards.append(dbc.Col(error_card, width=6, className="mb-3"))
+                    cards.append(
+                        build_patient_card(
+                            entry["full_name"], entry["gender"], entry["overview"]
+                        )
+                    )
+        else:
+            patients = list_overview_patients()
+            total = len(patients)
+
+            cards = []
+            for done, (full_name, gender) in enumerate(patients, 1):
+                # Calculate states and grade for this patient
+                try:
+                    overview = compute_patient_overview(full_name, dt)
+                    cards.append(build_patient_card(full_name, gender, overview))
+                except Exception as e:
+                    cards.append(build_error_card(full_name, gender, e))
+
+                # Stream the cards rendered so far every chunk of patients
+                if done % OVERVIEW_CHUNK_SIZE == 0 or done == total:
+                    set_progress((done, total, dbc.Row(list(cards), className="mt-3")))
 
         # Create grid layout
         if cards:
@@ -1987,7 +2145,7 @@ def update_overview_cards(selected_date, selected_time):
 
 
 # Callbacks for "Now" buttons
-@app.callback(
+@callback(
     [
         Output("update-datetime", "date"),
         Output("update-time", "value"),
@@ -2009,7 +2167,7 @@ def set_update_now(n_clicks):
     return current_date, current_time, "success"
 
 
-@app.callback(
+@callback(
     [
         Output("update-measurement-datetime", "date"),
         Output("update-measurement-time", "value"),
@@ -2031,7 +2189,7 @@ def set_update_measurement_now(n_clicks):
     return current_date, current_time, "success"
 
 
-@app.callback(
+@callback(
     [
         Output("delete-update-datetime", "date"),
         Output("delete-update-time", "value"),
@@ -2053,5 +2211,51 @@ def set_delete_update_now(n_clicks):
     return current_date, current_time, "success"
 
 
+_services_lock = threading.Lock()
+_services_started = False
+
+
+def start_background_services():
+    """Start the knowledge table watcher and the overview precompute, once per process."""
+    global _services_started
+    if _services_started:
+        return
+    with _services_lock:
+        if not _services_started:
+            get_knowledge_db().start_watching()
+            overview_scheduler.start()
+            _services_started = True
+
+
+def create_app():
+    """
+    Application factory: build the Dash app without loading any data.
+
+    Callbacks are registered globally with dash.callback, the layout is served
+    lazily, and the data handlers are created on first use. The background
+    services start with the first request of each serving process, so they also
+    run under gunicorn (app:server) and are not left behind in a preforking master.
+    """
+    import diskcache
+
+    # Background callbacks (the patient overview) run in worker processes managed
+    # through a local disk cache, so they never block the server's request threads
+    background_callback_manager = DiskcacheManager(diskcache.Cache("./cache"))
+
+    dash_app = dash.Dash(
+        __name__,
+        external_stylesheets=[dbc.themes.BOOTSTRAP],
+        suppress_callback_exceptions=True,
+        background_callback_manager=background_callback_manager,
+    )
+    dash_app.layout = serve_layout
+    dash_app.server.before_request(start_background_services)
+    return dash_app
+
+
+app = create_app()
+server = app.server
+
+
 if __name__ == "__main__":
     app.run(debug=True)
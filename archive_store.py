@@ -0,0 +1,257 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from db_handler import RecordQuery, filter_records
+
+# Dictionary-encoded text columns, stored as int32 codes (-1 for missing)
+ARCHIVE_CODE_COLUMNS = ["first_name", "last_name", "LOINC-NUM", "Unit", "Gender", "LOINC-NAME"]
+ARCHIVE_TIMESTAMP_COLUMNS = ["measurement_datetime", "update_datetime"]
+
+_META_FILE = "meta.json"
+
+
+def _column_file(archive_dir: str, column: str, suffix: str = "") -> str:
+    return os.path.join(archive_dir, f"{column}{suffix}.bin")
+
+
+def _archive_columns() -> dict:
+    """File name -> dtype of every column file of an archive"""
+    columns = {"patient": "int32", "value": "float64", "value_text": "int32"}
+    columns.update({column: "int32" for column in ARCHIVE_CODE_COLUMNS})
+    columns.update({column: "int64" for column in ARCHIVE_TIMESTAMP_COLUMNS})
+    return columns
+
+
+def _open_column(path: str, dtype: str, rows: int, mode: str = "r") -> np.ndarray:
+    if rows == 0:
+        # Zero-length files cannot be mapped
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode=mode, shape=(rows,))
+
+
+def _encode(values: pd.Series, dictionary: dict) -> np.ndarray:
+    """Map values to int32 codes, growing the dictionary with unseen values"""
+    values = values.where(values.notna(), None)
+    for value in values.dropna().unique():
+        dictionary.setdefault(value, len(dictionary))
+    return values.map(dictionary).fillna(-1).to_numpy(dtype="int32")
+
+
+def build_archive(csv_path: str, archive_dir: str, chunksize: int = 500_000) -> int:
+    """
+    Convert a project_db CSV into a memory-mappable archive directory.
+
+    Each column is written as a raw typed file: timestamps as int64 nanoseconds,
+    text columns as int32 dictionary codes. Values keep their original text in
+    a coded value_text column (so '5000' reads back as '5000'), and numeric ones
+    are also stored as float64 in the value column for numeric scans.
+
+    Rows are grouped by patient in two passes over chunks: the first encodes the
+    CSV into unsorted column files while counting the rows of each patient, the
+    second scatters every chunk to its patients' precomputed offsets. Memory
+    follows the chunk size and the patient count, never the archive size.
+    Returns the number of archived rows.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    columns = _archive_columns()
+    dictionaries = {column: {} for column in ARCHIVE_CODE_COLUMNS + ["value_text"]}
+    patients = {}
+    counts = np.zeros(0, dtype="int64")
+    rows = 0
+
+    # Pass 1: append every chunk to unsorted column files and count rows per patient
+    unsorted = {
+        column: open(_column_file(archive_dir, column, ".unsorted"), "wb") for column in columns
+    }
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=str):
+            for column in ARCHIVE_CODE_COLUMNS:
+                if column not in chunk.columns:
+                    chunk[column] = None
+            encoded = {
+                column: _encode(chunk[column], dictionaries[column])
+                for column in ARCHIVE_CODE_COLUMNS
+            }
+            for column in ARCHIVE_TIMESTAMP_COLUMNS:
+                encoded[column] = pd.to_datetime(chunk[column]).to_numpy("datetime64[ns]").view("int64")
+
+            numeric = pd.to_numeric(chunk["Value"], errors="coerce")
+            encoded["value"] = numeric.to_numpy(dtype="float64")
+            encoded["value_text"] = _encode(chunk["Value"], dictionaries["value_text"])
+
+            names = chunk["first_name"].astype(str) + " " + chunk["last_name"].astype(str)
+            encoded["patient"] = _encode(names, patients)
+            # Patients first seen in this chunk get a zero count first
+            counts = np.pad(counts, (0, len(patients) - len(counts)))
+            counts += np.bincount(encoded["patient"], minlength=len(patients))
+
+            for column, dtype in columns.items():
+                unsorted[column].write(encoded[column].astype(dtype, copy=False).tobytes())
+            rows += len(chunk)
+    finally:
+        for f in unsorted.values():
+            f.close()
+
+    # Row range of every patient in the grouped files
+    stops = np.cumsum(counts)
+    starts = stops - counts
+
+    # Pass 2: scatter each chunk to the next free rows of its patients (file order is kept)
+    sources = {
+        column: _open_column(_column_file(archive_dir, column, ".unsorted"), dtype, rows)
+        for column, dtype in columns.items()
+    }
+    targets = {
+        column: _open_column(_column_file(archive_dir, column), dtype, rows, mode="w+")
+        for column, dtype in columns.items()
+    }
+    next_free = starts.copy()
+    for start in range(0, rows, chunksize):
+        codes = np.asarray(sources["patient"][start:start + chunksize])
+        # Rank of each row among the chunk's rows of the same patient
+        order = np.argsort(codes, kind="stable")
+        grouped = codes[order]
+        ranks = np.arange(len(codes)) - np.searchsorted(grouped, grouped)
+        positions = np.empty(len(codes), dtype="int64")
+        positions[order] = next_free[grouped] + ranks
+        next_free += np.bincount(codes, minlength=len(patients))
+
+        for column, target in targets.items():
+            target[positions] = sources[column][start:start + chunksize]
+    for target in targets.values():
+        if isinstance(target, np.memmap):
+            target.flush()
+    del sources, targets
+    for column in columns:
+        source_path = _column_file(archive_dir, column, ".unsorted")
+        if rows == 0:
+            # Nothing was mapped: an empty column file
+            os.replace(source_path, _column_file(archive_dir, column))
+        else:
+            os.remove(source_path)
+
+    meta = {
+        "rows": rows,
+        "columns": columns,
+        "dictionaries": {
+            column: list(dictionary) for column, dictionary in dictionaries.items()
+        },
+        "patients": {
+            name: [int(starts[code]), int(stops[code])] for name, code in patients.items()
+        },
+    }
+    with open(os.path.join(archive_dir, _META_FILE), "w") as f:
+        json.dump(meta, f)
+    return rows
+
+
+class ArchiveStore:
+    """
+    Read-only store over an archive written by build_archive.
+
+    It offers the retrieval API of DBHandler (retrieve_records, query_records,
+    with the same filtering and values) plus per-patient frames for the state
+    calculators, but no edits or ingestion. It is standalone: the app keeps
+    serving the live CSV through DBHandler, archives are for querying and
+    analysing frozen exports.
+
+    Column files are memory-mapped, never loaded: a retrieval slices the rows of
+    one patient (a contiguous range, zero-copy), narrows them by LOINC code on
+    the int32 codes and only then decodes the matching rows into a DataFrame.
+    Resident memory therefore follows the patients actually queried, not the
+    archive size.
+    """
+
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+        with open(os.path.join(archive_dir, _META_FILE)) as f:
+            meta = json.load(f)
+        self.rows = meta["rows"]
+        self._dictionaries = {
+            column: np.array(values, dtype=object)
+            for column, values in meta["dictionaries"].items()
+        }
+        self._codes = {
+            column: {value: code for code, value in enumerate(values)}
+            for column, values in meta["dictionaries"].items()
+        }
+        self._patients = {name: tuple(bounds) for name, bounds in meta["patients"].items()}
+        self._columns = {
+            column: _open_column(_column_file(archive_dir, column), dtype, self.rows)
+            for column, dtype in meta["columns"].items()
+        }
+
+    @property
+    def patients(self) -> list:
+        """Full names of the archived patients"""
+        return list(self._patients)
+
+    def _decode(self, rows) -> pd.DataFrame:
+        """Decode the given rows (a slice or index array) into a project_db shaped DataFrame"""
+        data = {}
+        for column in ["first_name", "last_name", "LOINC-NUM"]:
+            data[column] = self._decode_codes(column, self._columns[column][rows])
+        # Values as written in the source file
+        data["Value"] = self._decode_codes("value_text", self._columns["value_text"][rows])
+        data["Unit"] = self._decode_codes("Unit", self._columns["Unit"][rows])
+        for column in ARCHIVE_TIMESTAMP_COLUMNS:
+            # Reinterpret the int64 nanoseconds in place, no conversion pass
+            data[column] = self._columns[column][rows].view("datetime64[ns]")
+        data["Gender"] = self._decode_codes("Gender", self._columns["Gender"][rows])
+        data["LOINC-NAME"] = self._decode_codes("LOINC-NAME", self._columns["LOINC-NAME"][rows])
+        return pd.DataFrame(data, copy=False)
+
+    def _decode_codes(self, column: str, codes: np.ndarray) -> np.ndarray:
+        decoded = np.full(len(codes), None, dtype=object)
+        present = codes >= 0
+        decoded[present] = self._dictionaries[column][codes[present]]
+        return decoded
+
+    def patient_frame(self, full_name: str) -> pd.DataFrame:
+        """All archived rows of one patient, usable as project_db by the state calculators."""
+        start, stop = self._patients.get(full_name, (0, 0))
+        return self._decode(slice(start, stop))
+
+    def _records_for(self, first_name, last_name, loinc_num):
+        start, stop = self._patients.get(f"{first_name} {last_name}", (0, 0))
+        loinc_code = self._codes["LOINC-NUM"].get(loinc_num)
+        if loinc_code is None:
+            return self._decode(slice(0, 0))
+        # Zero-copy view of the patient's range; only matching rows are decoded
+        matches = np.flatnonzero(self._columns["LOINC-NUM"][start:stop] == loinc_code)
+        return self._decode(matches + start)
+
+    def retrieve_records(
+        self,
+        first_name,
+        last_name,
+        loinc_num,
+        measurement_datetime=None,
+        from_datetime=None,
+        to_datetime=None,
+    ):
+        """Retrieve records as DBHandler.retrieve_records does."""
+        return self.query_records(
+            RecordQuery.create(
+                first_name, last_name, loinc_num, measurement_datetime, from_datetime, to_datetime
+            )
+        )
+
+    def query_records(self, query: RecordQuery):
+        """Retrieve the records matching a prepared RecordQuery."""
+        return filter_records(
+            self._records_for(query.first_name, query.last_name, query.loinc_num), query
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Convert a project_db CSV into a memory-mapped archive")
+    arg_parser.add_argument("source", help="project_db CSV file")
+    arg_parser.add_argument("archive_dir", help="Directory receiving the column files")
+    arg_parser.add_argument("--chunksize", type=int, default=500_000, help="Rows per chunk")
+    args = arg_parser.parse_args()
+
+    print(f"Archived {build_archive(args.source, args.archive_dir, args.chunksize)} rows")
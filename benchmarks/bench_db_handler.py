@@ -0,0 +1,115 @@
+"""
+Latency and throughput of DBHandler operations across dataset sizes.
+
+    python -m benchmarks.bench_db_handler --sizes 1e3 1e4 1e5 1e6 1e7
+    python -m benchmarks.bench_db_handler --compare benchmarks/results/db_handler-<previous>.json
+
+Each size gets a synthetic project_db CSV (see benchmarks/synthetic.py) in a
+temporary directory; the results are stored as JSON under benchmarks/results.
+"""
+import argparse
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from benchmarks import harness
+from benchmarks.synthetic import generate_records, shape_for_rows, write_records_csv
+from db_handler import DBHandler
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+def _targets(df: pd.DataFrame, count: int, rng) -> list:
+    """(first_name, last_name, loinc_num, measurement_datetime string) of random existing rows"""
+    rows = df.iloc[rng.integers(0, len(df), count)]
+    return list(zip(
+        rows["first_name"], rows["last_name"], rows["LOINC-NUM"],
+        rows["measurement_datetime"].dt.strftime(DATETIME_FORMAT),
+    ))
+
+
+def bench_size(rows: int, shape: dict, samples: int, write_samples: int, workdir: str, seed: int = 0) -> list:
+    """Measure load, retrievals, updates and deletions on a store of about `rows` rows"""
+    df = generate_records(**shape_for_rows(rows, **shape), seed=seed)
+    csv_path = os.path.join(workdir, f"project_db_{len(df)}.csv")
+    write_records_csv(csv_path, df)
+    rng = np.random.default_rng(seed)
+
+    db = None
+
+    def load():
+        nonlocal db
+        db = DBHandler(csv_path)
+
+    measured = {"load": harness.time_calls([load])}
+
+    reads = _targets(df, samples, rng)
+    measured["retrieve_records"] = harness.time_calls(
+        lambda target=target: db.retrieve_records(*target[:3]) for target in reads
+    )
+    measured["retrieve_records_at"] = harness.time_calls(
+        lambda target=target: db.retrieve_records(*target[:3], measurement_datetime=target[3])
+        for target in reads
+    )
+
+    # Every edit appends a version later than all generated ones
+    update_base = df["update_datetime"].max() + pd.Timedelta(days=1)
+    edit_times = [(update_base + pd.Timedelta(seconds=i)).strftime(DATETIME_FORMAT) for i in range(2 * write_samples)]
+    updates = _targets(df, write_samples, rng)
+    measured["update_record"] = harness.time_calls(
+        lambda target=target, at=at: _check(db.update_record(*target[:3], "42.0", at, target[3]))
+        for target, at in zip(updates, edit_times[:write_samples])
+    )
+    deletions = _targets(df, write_samples, rng)
+    measured["delete_record"] = harness.time_calls(
+        lambda target=target, at=at: _check(db.delete_record(*target, at))
+        for target, at in zip(deletions, edit_times[write_samples:])
+    )
+
+    os.remove(csv_path)
+    return [
+        {"rows": len(df), "operation": operation, **harness.summarize(durations)}
+        for operation, durations in measured.items()
+    ]
+
+
+def _check(outcome):
+    success, message, _ = outcome
+    if not success:
+        raise RuntimeError(message)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark DBHandler operations across dataset sizes")
+    arg_parser.add_argument("--sizes", type=float, nargs="+", default=DEFAULT_SIZES,
+                            help="Approximate row counts, e.g. 1e3 1e5 1e7 (default: %(default)s)")
+    arg_parser.add_argument("--loinc-codes", type=int, default=6, help="LOINC codes per patient")
+    arg_parser.add_argument("--measurements", type=int, default=10, help="Measurements per patient and code")
+    arg_parser.add_argument("--revisions", type=int, default=1, help="Versions per measurement")
+    arg_parser.add_argument("--samples", type=int, default=100, help="Retrievals per size")
+    arg_parser.add_argument("--write-samples", type=int, default=10,
+                            help="Updates and deletions per size (each rewrites the CSV)")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--output", help="Result file (default: benchmarks/results/db_handler-<time>.json)")
+    arg_parser.add_argument("--compare", help="Previous result file to compare the p50 latencies with")
+    args = arg_parser.parse_args(argv)
+
+    shape = {"loinc_codes": args.loinc_codes, "measurements": args.measurements, "revisions": args.revisions}
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            results.extend(bench_size(int(size), shape, args.samples, args.write_samples, workdir, args.seed))
+            harness.print_table(results[-5:], ["rows", "operation", "p50_ms", "p90_ms", "p99_ms", "ops_per_second"])
+
+    config = {**shape, "sizes": [int(size) for size in args.sizes], "samples": args.samples,
+              "write_samples": args.write_samples, "seed": args.seed}
+    path = harness.write_results("db_handler", config, results, args.output)
+    print(f"Results written to {path}")
+    if args.compare:
+        harness.print_comparison(harness.compare(args.compare, results))
+    return results
+
+
+if __name__ == "__main__":
+    main()
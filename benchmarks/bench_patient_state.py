@@ -0,0 +1,122 @@
+"""
+Time and peak memory of each stage of the patient state pipeline as history
+length and measurement density grow.
+
+    python -m benchmarks.bench_patient_state --days 7 30 90 --per-day 4 12
+
+Each stage is timed on the output of the previous one, for one synthetic
+patient (see benchmarks/synthetic.py), with the repository's knowledge tables.
+Peak memory is measured with tracemalloc in a separate run, so it does not
+distort the timings. Results are stored as JSON under benchmarks/results.
+"""
+import argparse
+import os
+import tracemalloc
+from benchmarks import harness
+from benchmarks.synthetic import HEMOGLOBIN, WBC, generate_patient_history
+from knowledge_db_handler import Gender, KnowledgeDataHandler
+from patient_directory import PatientDirectory
+from patient_state_calculator import (
+    calculate_grade,
+    calculate_recommendation,
+    fill_gaps,
+    find_overlapping_states,
+    process_hematological_data,
+    resolve_conflicts,
+)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DAYS = [7, 30, 90]
+DEFAULT_PER_DAY = [4, 12]
+FULL_NAME = "Bench Patient"
+
+
+def pipeline_stages(history, knowledge_db) -> list:
+    """
+    (stage, zero-argument callable) of every pipeline stage, in order. Each
+    stage's input is computed once here from the previous stage's output.
+    """
+    directory = PatientDirectory.from_frame(history)
+    gender = Gender.FEMALE if directory.gender(FULL_NAME) == "female" else Gender.MALE
+    validity = knowledge_db.get_test_validity_table()
+    classifier = knowledge_db.get_hematological_classifier(gender)
+    # The last measurement, covered by the latest states and systemic tests
+    dt = history["measurement_datetime"].max().to_pydatetime()
+
+    patient_tests = history[history["LOINC-NUM"].isin([HEMOGLOBIN, WBC])]
+    wbc_data, hb_data = process_hematological_data(patient_tests, validity)
+    raw = find_overlapping_states(wbc_data, hb_data, classifier)
+    resolved = resolve_conflicts(list(raw))
+
+    return [
+        ("process_hematological_data", lambda: process_hematological_data(patient_tests, validity)),
+        ("find_overlapping_states", lambda: find_overlapping_states(wbc_data, hb_data, classifier)),
+        # resolve_conflicts sorts its argument in place
+        ("resolve_conflicts", lambda: resolve_conflicts(list(raw))),
+        ("fill_gaps", lambda: fill_gaps(resolved)),
+        ("calculate_grade", lambda: calculate_grade(history, knowledge_db, FULL_NAME, dt)),
+        ("calculate_recommendation",
+         lambda: calculate_recommendation(history, knowledge_db, FULL_NAME, dt, directory)),
+    ]
+
+
+def peak_memory_mb(call) -> float:
+    """Peak memory allocated while running call, in MiB"""
+    tracemalloc.start()
+    try:
+        call()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def bench_history(days: int, per_day: int, knowledge_db, repeat: int, seed: int = 0) -> list:
+    history = generate_patient_history(days, per_day, seed=seed)
+    results = []
+    for stage, call in pipeline_stages(history, knowledge_db):
+        call()  # warm-up: compiled knowledge artifacts, lazy table loads
+        durations = harness.time_calls([call] * repeat)
+        results.append({
+            "history_days": days,
+            "measurements_per_day": per_day,
+            "measurements": days * per_day,
+            "stage": stage,
+            **harness.summarize(durations),
+            "peak_memory_mb": peak_memory_mb(call),
+        })
+    return results
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark the patient state pipeline stages")
+    arg_parser.add_argument("--days", type=int, nargs="+", default=DEFAULT_DAYS,
+                            help="History lengths in days (default: %(default)s)")
+    arg_parser.add_argument("--per-day", type=int, nargs="+", default=DEFAULT_PER_DAY,
+                            help="Measurements of each test per day (default: %(default)s)")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage")
+    arg_parser.add_argument("--knowledge-dir", default=REPO_DIR, help="Directory of the knowledge tables")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--output", help="Result file (default: benchmarks/results/patient_state-<time>.json)")
+    arg_parser.add_argument("--compare", help="Previous result file to compare the p50 times with")
+    args = arg_parser.parse_args(argv)
+
+    knowledge_db = KnowledgeDataHandler(args.knowledge_dir)
+    results = []
+    for days in args.days:
+        for per_day in args.per_day:
+            config_results = bench_history(days, per_day, knowledge_db, args.repeat, args.seed)
+            results.extend(config_results)
+            harness.print_table(config_results, ["measurements", "stage", "p50_ms", "peak_memory_mb"])
+            dominant = max(config_results, key=lambda result: result["p50_ms"])
+            print(f"{days} days x {per_day}/day: {dominant['stage']} dominates\n")
+
+    config = {"days": args.days, "per_day": args.per_day, "repeat": args.repeat, "seed": args.seed}
+    path = harness.write_results("patient_state", config, results, args.output)
+    print(f"Results written to {path}")
+    if args.compare:
+        harness.print_comparison(harness.compare(args.compare, results))
+    return results
+
+
+if __name__ == "__main__":
+    main()
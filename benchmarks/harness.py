@@ -0,0 +1,114 @@
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def summarize(durations) -> dict:
+    """Latency percentiles (milliseconds) and throughput of a list of durations in seconds"""
+    durations = np.asarray(durations, dtype=float)
+    total = durations.sum()
+    ms = durations * 1000
+    return {
+        "samples": len(durations),
+        "mean_ms": float(ms.mean()),
+        "min_ms": float(ms.min()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+        "ops_per_second": float(len(durations) / total) if total > 0 else float("inf"),
+    }
+
+
+def time_calls(calls) -> list:
+    """Run each zero-argument callable once and return their durations in seconds"""
+    durations = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def environment() -> dict:
+    return {
+        "python": sys.version.split()[0],
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+def write_results(name: str, config: dict, results: list, path: str = None) -> str:
+    """Store a run as JSON (by default benchmarks/results/<name>-<timestamp>.json); returns the path"""
+    created = datetime.now()
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{name}-{created:%Y%m%d-%H%M%S}.json")
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "benchmark": name,
+                "created": created.isoformat(timespec="seconds"),
+                "environment": environment(),
+                "config": config,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    return path
+
+
+# Measured fields of a result; the other fields identify what was measured
+MEASUREMENTS = {
+    "samples", "mean_ms", "min_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms",
+    "ops_per_second", "peak_memory_mb",
+}
+
+
+def _key(result: dict) -> tuple:
+    return tuple((field, value) for field, value in result.items() if field not in MEASUREMENTS)
+
+
+def compare(baseline_path: str, results: list, metric: str = "p50_ms") -> list:
+    """
+    Pair the results of a run with those of a stored baseline run.
+    Returns (key, baseline, current, current / baseline) for every result present in both.
+    """
+    with open(baseline_path) as f:
+        baseline = {_key(result): result for result in json.load(f)["results"]}
+    rows = []
+    for result in results:
+        previous = baseline.get(_key(result))
+        if previous is not None and previous.get(metric):
+            rows.append((_key(result), previous[metric], result[metric], result[metric] / previous[metric]))
+    return rows
+
+
+def print_table(results: list, columns: list):
+    """Print results as an aligned text table"""
+    widths = [max(len(column), *(len(_format(result.get(column))) for result in results)) for column in columns]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        print("  ".join(_format(result.get(column)).rjust(width) for column, width in zip(columns, widths)))
+
+
+def print_comparison(rows: list, metric: str = "p50_ms"):
+    for key, previous, current, ratio in rows:
+        label = " ".join(f"{field}={value}" for field, value in key)
+        print(f"{label}: {metric} {previous:.3f} -> {current:.3f} ({ratio:.2f}x)")
+
+
+def _format(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
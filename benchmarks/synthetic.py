@@ -0,0 +1,138 @@
+import math
+import numpy as np
+import pandas as pd
+
+# LOINC codes of the project database, then synthetic ones for wider panels
+PROJECT_LOINC_CODES = [
+    ("30313-1", "gr/dl", "Hemoglobin:MCnc:Pt:BldA:Qn"),
+    ("6690-2", "10³/µL", "Leukocytes:NCnc:Pt:Bld:Qn:Automated count"),
+    ("8310-5", "Celsious", "Body temperature:Temp:Pt:^Patient:Qn"),
+    ("11218-5", "mg/L", "Microalbumin:MCnc:Pt:Urine:Qn:Test strip"),
+    ("777-3", "10³/µL", "Platelets:NCnc:Pt:Bld:Qn:Automated count"),
+    ("2160-0", "mg/dL", "Creatinine:MCnc:Pt:Ser/Plas:Qn"),
+]
+
+
+def loinc_panel(count: int) -> list:
+    """(code, unit, name) of `count` LOINC codes, the project ones first"""
+    panel = PROJECT_LOINC_CODES[:count]
+    for i in range(len(panel), count):
+        panel.append((f"9{i:04d}-0", "u", f"Synthetic analyte {i}"))
+    return panel
+
+
+def generate_records(
+    patients: int,
+    loinc_codes: int = 6,
+    measurements: int = 10,
+    revisions: int = 1,
+    start: str = "2025-01-01 08:00:00",
+    interval_hours: float = 6,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Synthetic project_db frame of patients x LOINC codes x measurements x revisions rows.
+
+    Every patient has each code measured `measurements` times, `interval_hours`
+    apart; every measurement has `revisions` versions, each updated one hour
+    after the previous one (the first one hour after the measurement). Columns
+    are those of project_db_with_names.csv, with parsed datetimes.
+    """
+    rng = np.random.default_rng(seed)
+    panel = loinc_panel(loinc_codes)
+    per_patient = loinc_codes * measurements * revisions
+    rows = patients * per_patient
+
+    # Row i = (patient, code, measurement, revision) in nested order
+    patient = np.repeat(np.arange(patients), per_patient)
+    code = np.tile(np.repeat(np.arange(loinc_codes), measurements * revisions), patients)
+    measurement = np.tile(np.repeat(np.arange(measurements), revisions), patients * loinc_codes)
+    revision = np.tile(np.arange(revisions), patients * loinc_codes * measurements)
+
+    first_names = np.array([f"Patient{i}" for i in range(patients)], dtype=object)
+    codes, units, names = (np.array(column, dtype=object) for column in zip(*panel))
+    measured = pd.Timestamp(start) + pd.to_timedelta(measurement * interval_hours, unit="h")
+
+    return pd.DataFrame(
+        {
+            "first_name": first_names[patient],
+            "last_name": "Synthetic",
+            "LOINC-NUM": codes[code],
+            "Value": np.round(rng.uniform(1, 100, rows), 1),
+            "Unit": units[code],
+            "measurement_datetime": measured,
+            "update_datetime": measured + pd.to_timedelta(revision + 1, unit="h"),
+            "Gender": np.where(patient % 2 == 0, "male", "female"),
+            "LOINC-NAME": names[code],
+        }
+    )
+
+
+def shape_for_rows(rows: int, loinc_codes: int = 6, measurements: int = 10, revisions: int = 1) -> dict:
+    """generate_records arguments giving at least `rows` rows by varying the patient count"""
+    per_patient = loinc_codes * measurements * revisions
+    return {
+        "patients": max(1, math.ceil(rows / per_patient)),
+        "loinc_codes": loinc_codes,
+        "measurements": measurements,
+        "revisions": revisions,
+    }
+
+
+def write_records_csv(path: str, df: pd.DataFrame, chunksize: int = 1_000_000):
+    """Write a generated frame as a project_db CSV, chunk by chunk"""
+    for start in range(0, max(len(df), 1), chunksize):
+        df.iloc[start:start + chunksize].to_csv(
+            path, mode="w" if start == 0 else "a", header=start == 0, index=False
+        )
+
+
+# LOINC code -> value sampler of the tests used by the state calculators
+HEMOGLOBIN, WBC = "30313-1", "6690-2"
+SYSTEMIC_TESTS = {
+    "8310-5": lambda rng, n: np.round(rng.uniform(36.0, 41.0, n), 1).astype(str),
+    "75275-8": lambda rng, n: rng.choice(["None", "Shaking", "Rigor"], n),
+    "39106-0": lambda rng, n: rng.choice(["Erythema", "Vesiculation", "Desquamation", "Exfoliation"], n),
+    "56840-2": lambda rng, n: rng.choice(["Edema", "Bronchospasm", "Sever-Bronchospasm", "Anaphylactic-Shock"], n),
+}
+
+
+def generate_patient_history(
+    days: int,
+    measurements_per_day: int,
+    first_name: str = "Bench",
+    last_name: str = "Patient",
+    gender: str = "female",
+    start: str = "2025-01-01 00:00:00",
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Synthetic lab history of one patient: every `24 / measurements_per_day` hours
+    over `days` days, a hemoglobin, a WBC and the four systemic tests are
+    measured. Values span the ranges of the knowledge tables, so every state
+    and grade occurs. Values are strings, as in project_db.
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.Timestamp(start) + pd.to_timedelta(
+        np.arange(days * measurements_per_day) * (24 / measurements_per_day), unit="h"
+    )
+    n = len(times)
+    values = {
+        HEMOGLOBIN: np.round(rng.uniform(6.0, 17.0, n), 1).astype(str),
+        WBC: rng.integers(2000, 12000, n).astype(str),
+    }
+    values.update({code: sample(rng, n) for code, sample in SYSTEMIC_TESTS.items()})
+
+    frames = [
+        pd.DataFrame({
+            "first_name": first_name,
+            "last_name": last_name,
+            "LOINC-NUM": code,
+            "Value": code_values,
+            "measurement_datetime": times,
+            "update_datetime": times + pd.Timedelta(hours=1),
+            "Gender": gender,
+        })
+        for code, code_values in values.items()
+    ]
+    return pd.concat(frames, ignore_index=True).sort_values("measurement_datetime", kind="stable")
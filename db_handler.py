@@ -1,23 +1,375 @@
+import operator
+import os
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import date, datetime
+from functools import lru_cache
+from typing import NamedTuple, Optional
 from dateutil import parser
+from patient_directory import PatientDirectory
+
+# Columns identifying one version of one measurement; ingestion skips rows whose key exists
+RECORD_KEY_COLUMNS = [
+    "first_name",
+    "last_name",
+    "LOINC-NUM",
+    "measurement_datetime",
+    "update_datetime",
+]
+INGEST_REQUIRED_COLUMNS = RECORD_KEY_COLUMNS + ["Value"]
+
+
+class IngestReport(NamedTuple):
+    """Outcome of a bulk ingestion run"""
+
+    rows_read: int
+    rows_ingested: int
+    rows_duplicate: int
+    rows_invalid: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.seconds if self.seconds else float("inf")
+
+    def __str__(self):
+        return (
+            f"Read {self.rows_read} rows in {self.seconds:.2f}s "
+            f"({self.rows_per_second:,.0f} rows/s): {self.rows_ingested} ingested, "
+            f"{self.rows_duplicate} duplicate, {self.rows_invalid} invalid"
+        )
+
+
+def _file_mode(path: str) -> int:
+    """Permission bits of an existing file, or those a new file would get from the umask"""
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def _key_hashes(df: pd.DataFrame) -> np.ndarray:
+    """64-bit hash of each row's record key, independent of how the columns were read"""
+    keys = pd.DataFrame(
+        {
+            "first_name": df["first_name"].astype(str),
+            "last_name": df["last_name"].astype(str),
+            "LOINC-NUM": df["LOINC-NUM"].astype(str),
+            "measurement_datetime": df["measurement_datetime"].astype("int64"),
+            "update_datetime": df["update_datetime"].astype("int64"),
+        }
+    )
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+# Formats tried in order before falling back to dateutil, with whether they carry a time of day
+QUERY_DATETIME_FORMATS = (
+    ("%Y-%m-%d %H:%M:%S", True),
+    ("%Y-%m-%d %H:%M", True),
+    ("%Y-%m-%dT%H:%M:%S", True),
+    ("%Y-%m-%dT%H:%M", True),
+    ("%Y-%m-%d %H:%M:%S.%f", True),
+    ("%Y-%m-%dT%H:%M:%S.%f", True),
+    ("%Y-%m-%d", False),
+)
+
+
+class TimeFilter(NamedTuple):
+    """A parsed datetime argument; a date-only filter stands for the whole day"""
+
+    value: datetime
+    has_time: bool
+
+
+@lru_cache(maxsize=4096)
+def _parse_datetime_string(text: str) -> TimeFilter:
+    text = text.strip()
+    for fmt, has_time in QUERY_DATETIME_FORMATS:
+        try:
+            return TimeFilter(datetime.strptime(text, fmt), has_time)
+        except ValueError:
+            continue
+    # Free-form input: dateutil, and it has a time only if the part after the date has one
+    # (separated by a space, or by 'T' in ISO 8601 timestamps)
+    parts = text.split("T" if text[10:11] == "T" else " ")
+    return TimeFilter(parser.parse(text), len(parts) > 1 and ":" in parts[1])
+
+
+def _parse_datetime_column(values: pd.Series) -> pd.Series:
+    """
+    Parse a column of datetime strings: ISO 8601 ones (space or 'T' separated) in
+    one vectorized pass, any other layout row by row. Unparsable values are NaT.
+    """
+    parsed = pd.to_datetime(values, errors="coerce", format="ISO8601")
+    retry = parsed.isna() & values.notna() & (values.astype(str) != "")
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], errors="coerce", format="mixed")
+    return parsed
+
+
+def parse_time_filter(value) -> Optional[TimeFilter]:
+    """
+    Parse a datetime argument of the handler's methods.
+
+    Strings are tried against QUERY_DATETIME_FORMATS, then dateutil, and the
+    result is memoized. datetime and pd.Timestamp values are exact, date values
+    cover their whole day, and a TimeFilter passes through, so hot paths can
+    skip string parsing entirely. None and "" mean "no filter".
+    """
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if isinstance(value, TimeFilter):
+        return value
+    if isinstance(value, datetime):
+        return TimeFilter(value, True)
+    if isinstance(value, date):
+        return TimeFilter(datetime.combine(value, datetime.min.time()), False)
+    return _parse_datetime_string(str(value))
+
+
+class RecordQuery(NamedTuple):
+    """Retrieval criteria with parsed datetimes, reusable across calls to query_records"""
+
+    first_name: str
+    last_name: str
+    loinc_num: str
+    measurement: Optional[TimeFilter] = None
+    updated_from: Optional[TimeFilter] = None
+    updated_to: Optional[TimeFilter] = None
+
+    @classmethod
+    def create(
+        cls,
+        first_name,
+        last_name,
+        loinc_num,
+        measurement_datetime=None,
+        from_datetime=None,
+        to_datetime=None,
+    ):
+        """Build a query from the arguments of retrieve_records (strings, datetimes or dates)."""
+        return cls(
+            first_name,
+            last_name,
+            loinc_num,
+            parse_time_filter(measurement_datetime),
+            parse_time_filter(from_datetime),
+            parse_time_filter(to_datetime),
+        )
+
+
+_COMPARISONS = {"==": operator.eq, ">=": operator.ge, "<=": operator.le}
+_ONE_DAY = np.timedelta64(1, "D")
+
+
+def _time_mask(column: pd.Series, time_filter: TimeFilter, op: str) -> np.ndarray:
+    """
+    Compare a datetime column with a filter, on the raw datetime64 values.
+    A date-only filter is the half-open range [day, day + 1), so matching a
+    calendar day costs two comparisons instead of a date object per row.
+    """
+    values = column.to_numpy(dtype="datetime64[ns]")
+    if time_filter.has_time:
+        # Full datetime provided, do exact comparison
+        return _COMPARISONS[op](values, np.datetime64(time_filter.value, "ns"))
+
+    day = np.datetime64(time_filter.value.date(), "ns")
+    if op == "==":
+        return (values >= day) & (values < day + _ONE_DAY)
+    if op == ">=":
+        return values >= day
+    # On or before the day: anything before the next midnight
+    return values < day + _ONE_DAY
+
+
+def filter_records(filtered_df, query: RecordQuery):
+    """
+    Rows of a records frame matching a RecordQuery, without deleted measurements.
+    Shared by the stores exposing query_records (DBHandler, ArchiveStore).
+    """
+    # Apply filters
+    mask = (
+        (filtered_df["first_name"] == query.first_name)
+        & (filtered_df["last_name"] == query.last_name)
+        & (filtered_df["LOINC-NUM"] == query.loinc_num)
+    )
+
+    if query.measurement:
+        mask &= _time_mask(filtered_df["measurement_datetime"], query.measurement, "==")
+    if query.updated_from:
+        mask &= _time_mask(filtered_df["update_datetime"], query.updated_from, ">=")
+    if query.updated_to:
+        mask &= _time_mask(filtered_df["update_datetime"], query.updated_to, "<=")
+
+    # Get the filtered records
+    result_df = filtered_df[mask]
+
+    # Group by first_name, last_name, loinc_num, and measurement_datetime
+    # and keep only the record with the latest update_datetime for each group
+    if not result_df.empty and 'DELETED' in result_df['Value'].values:
+        # Sort by update_datetime in descending order to ensure we get the latest
+        result_df = result_df.sort_values("update_datetime", ascending=False)
+
+        # Group by the specified columns and take the first record (which is the latest due to sorting)
+        result_df = (
+            result_df.groupby(
+                ["first_name", "last_name", "LOINC-NUM", "measurement_datetime"]
+            )
+            .first()
+            .reset_index()
+        )
+
+        # Sort the final result by update_datetime in descending order
+        result_df = result_df.sort_values("update_datetime", ascending=False)
+
+    result_df = result_df[result_df["Value"] != "DELETED"]
+
+    return result_df
 
 
 class DBHandler:
-    def __init__(self, csv_path):
-        """Initialize the database handler with the CSV file path."""
+    def __init__(self, csv_path, shared_store=None, loinc_cache=None):
+        """
+        Initialize the database handler with the CSV file path.
+
+        Args:
+            csv_path: Path of the records CSV
+            shared_store: Optional SharedVersionStore; when several worker processes
+                serve the same CSV, edits are serialized through it and every
+                handler reloads the file once another process has changed it
+            loinc_cache: Optional LoincNameCache used to fill missing LOINC-NAME
+                values on load and ingestion (local lookups only, no API calls)
+        """
         self.csv_path = csv_path
-        self.df = pd.read_csv(csv_path)
+        self.shared_store = shared_store
+        self.loinc_cache = loinc_cache
+        # self.df is never modified in place: edits and reloads build a new frame
+        # and swap the reference, so readers work on whichever snapshot they
+        # picked up without locking. Only writers take this lock.
+        self._write_lock = threading.RLock()
+        # Local data version, bumped on every edit or reload
+        self.version = 0
+        self._store_version = None
+        self._load()
+
+    @property
+    def _store_key(self):
+        return f"records:{os.path.abspath(self.csv_path)}"
+
+    def _load(self):
+        """(Re)read the CSV into self.df."""
+        if self.shared_store is not None:
+            # Read the version first: a concurrent edit then only causes one more reload
+            self._store_version = self.shared_store.get_version(self._store_key)
+        df = pd.read_csv(self.csv_path)
+        # Column order of the file, which rows appended in place must follow
+        self._file_columns = list(df.columns)
 
         # Convert datetime columns to datetime objects
-        self.df["measurement_datetime"] = pd.to_datetime(
-            self.df["measurement_datetime"]
-        )
-        self.df["update_datetime"] = pd.to_datetime(self.df["update_datetime"])
+        df["measurement_datetime"] = pd.to_datetime(df["measurement_datetime"])
+        df["update_datetime"] = pd.to_datetime(df["update_datetime"])
 
         # Ensure LOINC-NAME column exists
-        if "LOINC-NAME" not in self.df.columns:
-            self.df["LOINC-NAME"] = None
+        if "LOINC-NAME" not in df.columns:
+            df["LOINC-NAME"] = None
+        self._fill_loinc_names(df)
+
+        # Publish the fully prepared frame in one reference swap
+        self.directory = PatientDirectory.from_frame(df)
+        self.df = df
+        self.version += 1
+
+    def _fill_loinc_names(self, df):
+        """Fill missing LOINC-NAME values of df in place from the LOINC name cache."""
+        if self.loinc_cache is None:
+            return
+        missing = df["LOINC-NAME"].isna() & df["LOINC-NUM"].notna()
+        if not missing.any():
+            return
+        # One cache lookup per distinct code, then a vectorized take over the rows
+        codes, uniques = pd.factorize(df.loc[missing, "LOINC-NUM"])
+        names = self.loinc_cache.get_many(uniques)
+        if names:
+            lookup = np.array([names.get(str(code)) for code in uniques], dtype=object)
+            # An all-missing column is read as float
+            df["LOINC-NAME"] = df["LOINC-NAME"].astype(object)
+            df.loc[missing, "LOINC-NAME"] = lookup[codes]
+
+    def sync(self):
+        """
+        Reload the CSV if another process changed it since it was loaded.
+        Returns True when the data was reloaded (always False without a shared store).
+        """
+        if self.shared_store is None:
+            return False
+        if self.shared_store.get_version(self._store_key) == self._store_version:
+            return False
+        with self._write_lock:
+            # Another thread may have reloaded while we waited for the lock
+            if self.shared_store.get_version(self._store_key) == self._store_version:
+                return False
+            self._load()
+        return True
+
+    @contextmanager
+    def _writing(self):
+        """Serialize an edit with the other threads and processes and apply it to the latest data."""
+        with self._write_lock:
+            if self.shared_store is None:
+                yield
+                return
+            with self.shared_store.write_lock():
+                self.sync()
+                yield
+
+    def _save(self, df, new_rows=None):
+        """
+        Write df as the new CSV with an atomic rename, then swap it in as self.df.
+        If writing fails the previous snapshot stays current. Call under _writing().
+        """
+        csv_dir = os.path.dirname(os.path.abspath(self.csv_path))
+        fd, tmp_path = tempfile.mkstemp(dir=csv_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", newline="") as f:
+                df.to_csv(f, index=False)
+            # mkstemp creates the file owner-only; keep the permissions of the CSV replaced
+            os.chmod(tmp_path, _file_mode(self.csv_path))
+            os.replace(tmp_path, self.csv_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self._file_columns = list(df.columns)
+        self._publish(df, new_rows)
+
+    def _publish(self, df, new_rows=None):
+        """
+        Swap in a persisted snapshot and announce its version.
+        new_rows, the rows df adds to the current snapshot, lets the patient
+        directory be updated incrementally instead of rebuilt.
+        """
+        if new_rows is not None:
+            self.directory = self.directory.with_records(new_rows)
+        else:
+            self.directory = PatientDirectory.from_frame(df)
+        self.df = df
+        self.version += 1
+        if self.shared_store is not None:
+            self._store_version = self.shared_store.bump(self._store_key)
+
+    def _records_for(self, first_name, last_name, loinc_num):
+        """
+        Rows a retrieval for this patient and LOINC code has to filter: the
+        whole current snapshot (never modified in place, so no copy is needed).
+        """
+        self.sync()
+        return self.df
 
     def retrieve_records(
         self,
@@ -30,85 +382,24 @@ class DBHandler:
     ):
         """
         Retrieve records based on the given criteria.
+        Datetimes may be strings, datetime/date objects or TimeFilters (see parse_time_filter).
         Returns a copy of the filtered DataFrame.
         """
-        # Create a copy of the dataframe
-        filtered_df = self.df.copy()
-
-        # Apply filters
-        mask = (
-            (filtered_df["first_name"] == first_name)
-            & (filtered_df["last_name"] == last_name)
-            & (filtered_df["LOINC-NUM"] == loinc_num)
-        )
-
-        if measurement_datetime:
-            measurement_datetime_parsed = parser.parse(measurement_datetime)
-            # Check if the input contains time information
-            if (
-                " " in measurement_datetime
-                and ":" in measurement_datetime.split(" ")[1]
-            ):
-                # Full datetime provided, do exact comparison
-                mask &= (
-                    filtered_df["measurement_datetime"] == measurement_datetime_parsed
-                )
-            else:
-                # Date only provided, compare only dates
-                mask &= (
-                    filtered_df["measurement_datetime"].dt.date
-                    == measurement_datetime_parsed.date()
-                )
-
-        if from_datetime:
-            from_datetime_parsed = parser.parse(from_datetime)
-            # Check if the input contains time information
-            if " " in from_datetime and ":" in from_datetime.split(" ")[1]:
-                # Full datetime provided, do exact comparison
-                mask &= filtered_df["update_datetime"] >= from_datetime_parsed
-            else:
-                # Date only provided, compare only dates
-                mask &= (
-                    filtered_df["update_datetime"].dt.date
-                    >= from_datetime_parsed.date()
-                )
-
-        if to_datetime:
-            to_datetime_parsed = parser.parse(to_datetime)
-            # Check if the input contains time information
-            if " " in to_datetime and ":" in to_datetime.split(" ")[1]:
-                # Full datetime provided, do exact comparison
-                mask &= filtered_df["update_datetime"] <= to_datetime_parsed
-            else:
-                # Date only provided, compare only dates
-                mask &= (
-                    filtered_df["update_datetime"].dt.date <= to_datetime_parsed.date()
-                )
-
-        # Get the filtered records
-        result_df = filtered_df[mask]
-
-        # Group by first_name, last_name, loinc_num, and measurement_datetime
-        # and keep only the record with the latest update_datetime for each group
-        if not result_df.empty and 'DELETED' in result_df['Value'].values:
-            # Sort by update_datetime in descending order to ensure we get the latest
-            result_df = result_df.sort_values("update_datetime", ascending=False)
-
-            # Group by the specified columns and take the first record (which is the latest due to sorting)
-            result_df = (
-                result_df.groupby(
-                    ["first_name", "last_name", "LOINC-NUM", "measurement_datetime"]
-                )
-                .first()
-                .reset_index()
+        return self.query_records(
+            RecordQuery.create(
+                first_name,
+                last_name,
+                loinc_num,
+                measurement_datetime,
+                from_datetime,
+                to_datetime,
             )
+        )
 
-            # Sort the final result by update_datetime in descending order
-            result_df = result_df.sort_values("update_datetime", ascending=False)
-
-        result_df = result_df[result_df["Value"] != "DELETED"]
-
-        return result_df
+    def query_records(self, query: RecordQuery):
+        """Retrieve the records matching a prepared RecordQuery (no string parsing)."""
+        filtered_df = self._records_for(query.first_name, query.last_name, query.loinc_num)
+        return filter_records(filtered_df, query)
 
     def update_record(
         self,
@@ -124,57 +415,42 @@ class DBHandler:
         Returns (success, result, changed_records) tuple.
         """
         try:
-            # Convert datetime strings to datetime objects
-            update_datetime_parsed = parser.parse(update_datetime)
-            measurement_datetime_parsed = parser.parse(measurement_datetime)
-
-            # Find the record to update
-            mask = (
-                (self.df["first_name"] == first_name)
-                & (self.df["last_name"] == last_name)
-                & (self.df["LOINC-NUM"] == loinc_num)
-            )
-
-            # Check if measurement_datetime contains time information
-            if (
-                " " in measurement_datetime
-                and ":" in measurement_datetime.split(" ")[1]
-            ):
-                # Full datetime provided, do exact comparison
-                mask &= self.df["measurement_datetime"] == measurement_datetime_parsed
-            else:
-                # Date only provided, compare only dates
-                mask &= (
-                    self.df["measurement_datetime"].dt.date
-                    == measurement_datetime_parsed.date()
+            # Convert datetime arguments to datetime objects
+            update_datetime_parsed = parse_time_filter(update_datetime).value
+            measurement = parse_time_filter(measurement_datetime)
+
+            with self._writing():
+                # Find the record to update
+                mask = (
+                    (self.df["first_name"] == first_name)
+                    & (self.df["last_name"] == last_name)
+                    & (self.df["LOINC-NUM"] == loinc_num)
                 )
 
-            if not any(mask):
-                return False, "No matching record found", None
+                mask &= _time_mask(self.df["measurement_datetime"], measurement, "==")
 
-            # Get the most recent record based on update_datetime
-            matching_records = self.df[mask]
-            # Sort by update_datetime in descending order (most recent first) and take the first record
-            most_recent_record = matching_records.sort_values(
-                "update_datetime", ascending=False
-            ).iloc[0]
+                if not mask.any():
+                    return False, "No matching record found", None
 
-            # Create a new record with the updated value
-            new_record = most_recent_record.copy()
-            new_record["Value"] = value
-            new_record["update_datetime"] = update_datetime_parsed
+                # Get the most recent record based on update_datetime
+                matching_records = self.df[mask]
+                # Sort by update_datetime in descending order (most recent first) and take the first record
+                most_recent_record = matching_records.sort_values(
+                    "update_datetime", ascending=False
+                ).iloc[0]
 
-            # Append the new record
-            self.df = pd.concat(
-                [self.df, pd.DataFrame([new_record])], ignore_index=True
-            )
+                # Create a new record with the updated value
+                new_record = most_recent_record.copy()
+                new_record["Value"] = value
+                new_record["update_datetime"] = update_datetime_parsed
 
-            # Save to CSV
-            self.df.to_csv(self.csv_path, index=False)
+                # Append the new record, save to CSV and publish the new snapshot
+                new_rows = pd.DataFrame([new_record])
+                self._save(pd.concat([self.df, new_rows], ignore_index=True), new_rows)
 
-            # Return the changed records (original and updated)
-            changed_records = pd.DataFrame([most_recent_record, new_record])
-            return True, "Record updated successfully", changed_records
+                # Return the changed records (original and updated)
+                changed_records = pd.DataFrame([most_recent_record, new_record])
+                return True, "Record updated successfully", changed_records
 
         except Exception as e:
             return False, str(e), None
@@ -187,57 +463,293 @@ class DBHandler:
         Returns (success, result, changed_records) tuple.
         """
         try:
-            # Convert datetime strings to datetime objects
-            update_datetime_parsed = parser.parse(update_datetime)
-            measurement_datetime_parsed = parser.parse(measurement_datetime)
-
-            # Find the record to delete
-            mask = (
-                (self.df["first_name"] == first_name)
-                & (self.df["last_name"] == last_name)
-                & (self.df["LOINC-NUM"] == loinc_num)
-            )
-
-            # Check if measurement_datetime contains time information
-            if (
-                " " in measurement_datetime
-                and ":" in measurement_datetime.split(" ")[1]
-            ):
-                # Full datetime provided, do exact comparison
-                mask &= self.df["measurement_datetime"] == measurement_datetime_parsed
-            else:
-                # Date only provided, compare only dates
-                mask &= (
-                    self.df["measurement_datetime"].dt.date
-                    == measurement_datetime_parsed.date()
+            # Convert datetime arguments to datetime objects
+            update_datetime_parsed = parse_time_filter(update_datetime).value
+            measurement = parse_time_filter(measurement_datetime)
+
+            with self._writing():
+                # Find the record to delete
+                mask = (
+                    (self.df["first_name"] == first_name)
+                    & (self.df["last_name"] == last_name)
+                    & (self.df["LOINC-NUM"] == loinc_num)
                 )
 
-            if not any(mask):
-                return False, "No matching record found", None
+                mask &= _time_mask(self.df["measurement_datetime"], measurement, "==")
 
-            # Get the most recent record based on update_datetime
-            matching_records = self.df[mask]
-            # Sort by update_datetime in descending order (most recent first) and take the first record
-            most_recent_record = matching_records.sort_values(
-                "update_datetime", ascending=False
-            ).iloc[0]
+                if not mask.any():
+                    return False, "No matching record found", None
 
-            # Create a new record with 'DELETED' value
-            new_record = most_recent_record.copy()
-            new_record["Value"] = "DELETED"
-            new_record["update_datetime"] = update_datetime_parsed
+                # Get the most recent record based on update_datetime
+                matching_records = self.df[mask]
+                # Sort by update_datetime in descending order (most recent first) and take the first record
+                most_recent_record = matching_records.sort_values(
+                    "update_datetime", ascending=False
+                ).iloc[0]
 
-            # Append the new record
-            self.df = pd.concat(
-                [self.df, pd.DataFrame([new_record])], ignore_index=True
-            )
+                # Create a new record with 'DELETED' value
+                new_record = most_recent_record.copy()
+                new_record["Value"] = "DELETED"
+                new_record["update_datetime"] = update_datetime_parsed
 
-            # Save to CSV
-            self.df.to_csv(self.csv_path, index=False)
+                # Append the new record, save to CSV and publish the new snapshot
+                new_rows = pd.DataFrame([new_record])
+                self._save(pd.concat([self.df, new_rows], ignore_index=True), new_rows)
 
-            # Return the changed records (original and deleted)
-            changed_records = pd.DataFrame([most_recent_record, new_record])
-            return True, "Record deleted successfully", changed_records
+                # Return the changed records (original and deleted)
+                changed_records = pd.DataFrame([most_recent_record, new_record])
+                return True, "Record deleted successfully", changed_records
 
         except Exception as e:
             return False, str(e), None
+
+    def bulk_update(self, records):
+        """
+        Apply a batch of updates with one vectorized match and a single CSV write.
+
+        Args:
+            records: Iterable of dicts holding the arguments of update_record
+                (first_name, last_name, loinc_num, value, update_datetime,
+                measurement_datetime)
+        Returns:
+            A (success, message) tuple per record, in input order.
+        """
+        records = list(records)
+        values = [record.get("value") for record in records]
+        return self._bulk_append(records, values, "Record updated successfully")
+
+    def bulk_delete(self, keys):
+        """
+        Mark a batch of records as deleted with one vectorized match and a single CSV write.
+
+        Args:
+            keys: Iterable of dicts holding the arguments of delete_record
+                (first_name, last_name, loinc_num, measurement_datetime, update_datetime)
+        Returns:
+            A (success, message) tuple per key, in input order.
+        """
+        keys = list(keys)
+        return self._bulk_append(keys, ["DELETED"] * len(keys), "Record deleted successfully")
+
+    def _latest_matches(self, df, requests):
+        """
+        Match each request to the most recent record it designates, as update_record does.
+        Requests with a full measurement datetime match it exactly, date-only ones match
+        the day. Returns a Series mapping request numbers to row labels of df.
+        """
+        keys = ["first_name", "last_name", "LOINC-NUM"]
+        candidates = df[keys + ["measurement_datetime", "update_datetime"]].copy()
+        # Key columns compared as text, however the CSV was read (e.g. numeric LOINC codes)
+        for key in keys:
+            candidates[key] = candidates[key].astype(str)
+        candidates["measurement_datetime"] = pd.to_datetime(candidates["measurement_datetime"])
+        candidates["_row"] = df.index
+        candidates["_date"] = candidates["measurement_datetime"].dt.normalize()
+
+        exact = requests[~requests["date_only"]][["_request"] + keys + ["measurement_datetime"]]
+        by_date = requests[requests["date_only"]][["_request"] + keys + ["measurement_datetime"]]
+        by_date = by_date.rename(columns={"measurement_datetime": "_date"})
+        by_date["_date"] = by_date["_date"].dt.normalize()
+
+        matches = pd.concat(
+            [
+                exact.merge(candidates, on=keys + ["measurement_datetime"]),
+                by_date.merge(candidates, on=keys + ["_date"]),
+            ],
+            ignore_index=True,
+        )
+        latest = matches.sort_values("update_datetime", ascending=False).drop_duplicates("_request")
+        return latest.set_index("_request")["_row"].sort_index()
+
+    def _bulk_append(self, records, values, success_message):
+        """Append a new version with the given value for each record's latest match, then save once."""
+        outcomes = [None] * len(records)
+        rows = []
+        for i, record in enumerate(records):
+            try:
+                # Normalize the keys per record, so a bad one fails alone with its own message
+                measurement = parse_time_filter(record["measurement_datetime"])
+                rows.append(
+                    {
+                        "_request": i,
+                        "first_name": str(record["first_name"]),
+                        "last_name": str(record["last_name"]),
+                        "LOINC-NUM": str(record["loinc_num"]),
+                        "measurement_datetime": pd.Timestamp(measurement.value),
+                        "date_only": not measurement.has_time,
+                        "Value": values[i],
+                        "update_datetime": pd.Timestamp(parse_time_filter(record["update_datetime"]).value),
+                    }
+                )
+            except Exception as e:
+                outcomes[i] = (False, str(e))
+
+        if not rows:
+            return outcomes
+        requests = pd.DataFrame(rows)
+        requests["measurement_datetime"] = pd.to_datetime(requests["measurement_datetime"])
+        requests["update_datetime"] = pd.to_datetime(requests["update_datetime"])
+
+        try:
+            with self._writing():
+                targets = self._latest_matches(self.df, requests)
+                if len(targets):
+                    new_values = requests.set_index("_request").loc[targets.index]
+                    new_records = self.df.loc[targets.values].copy()
+                    new_records["Value"] = new_values["Value"].values
+                    new_records["update_datetime"] = new_values["update_datetime"].values
+                    self._save(pd.concat([self.df, new_records], ignore_index=True), new_records)
+        except Exception as e:
+            for request in requests["_request"]:
+                outcomes[request] = (False, str(e))
+            return outcomes
+
+        for request in requests["_request"]:
+            if request in targets.index:
+                outcomes[request] = (True, success_message)
+            else:
+                outcomes[request] = (False, "No matching record found")
+        return outcomes
+
+    def _prepare_ingest_chunk(self, chunk: pd.DataFrame):
+        """
+        Validate and type-convert one chunk of an ingested feed.
+        Returns the valid rows laid out like self.df and the number of invalid rows.
+        """
+        missing = [col for col in INGEST_REQUIRED_COLUMNS if col not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+        chunk = chunk.copy()
+        for col in ["measurement_datetime", "update_datetime"]:
+            chunk[col] = _parse_datetime_column(chunk[col])
+        for col in ["first_name", "last_name", "LOINC-NUM", "Value"]:
+            chunk[col] = chunk[col].where(chunk[col].notna(), "").astype(str)
+
+        valid = (
+            chunk["measurement_datetime"].notna()
+            & chunk["update_datetime"].notna()
+            & (chunk["first_name"] != "")
+            & (chunk["last_name"] != "")
+            & (chunk["LOINC-NUM"] != "")
+            & (chunk["Value"] != "")
+        )
+        # Keep the store's columns only, filling the optional ones (Unit, names...) with None
+        rows = chunk[valid].reindex(columns=self.df.columns)
+        # Empty names in a feed mean unknown
+        rows["LOINC-NAME"] = rows["LOINC-NAME"].mask(rows["LOINC-NAME"] == "")
+        self._fill_loinc_names(rows)
+        return rows, int((~valid).sum())
+
+    def _append_rows(self, rows):
+        """
+        Append rows to a copy of the CSV, atomically rename it over the CSV and
+        publish the rows, so other processes reading the file never see a partly
+        written chunk. If writing fails the file and snapshot stay unchanged.
+        Call under _writing().
+        """
+        df = pd.concat([self.df, rows], ignore_index=True)
+        if self._file_columns != list(self.df.columns):
+            # The file's columns differ from the store's: rewrite it once
+            self._save(df, rows)
+            return
+        csv_dir = os.path.dirname(os.path.abspath(self.csv_path))
+        fd, tmp_path = tempfile.mkstemp(dir=csv_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb+") as f:
+                with open(self.csv_path, "rb") as source:
+                    shutil.copyfileobj(source, f)
+                # Terminate a hand-edited last line so the rows start on their own line
+                if f.tell():
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) not in (b"\n", b"\r"):
+                        f.write(b"\n")
+            rows.to_csv(tmp_path, mode="a", header=False, index=False)
+            # mkstemp creates the file owner-only; keep the permissions of the CSV replaced
+            os.chmod(tmp_path, _file_mode(self.csv_path))
+            os.replace(tmp_path, self.csv_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self._publish(df, rows)
+
+    def ingest(self, path, chunksize=50_000, file_format=None):
+        """
+        Stream a CSV or NDJSON lab export into the store.
+
+        The file is read chunksize rows at a time; each chunk is validated and
+        type-converted, rows whose (patient, LOINC, measurement_datetime,
+        update_datetime) key already exists (in the store or earlier in the file)
+        are skipped, and the new rows are appended to a copy of the CSV that
+        atomically replaces it. Each chunk is published as soon as it is written,
+        so besides the store itself only one chunk is held in memory, and readers
+        of the file only ever see whole chunks; a chunk whose write fails leaves
+        the file and snapshot as they were.
+        Re-running an interrupted ingestion skips the rows that were already appended.
+
+        Args:
+            path: File to ingest
+            chunksize: Rows parsed per chunk
+            file_format: "csv" or "ndjson"; inferred from the extension when omitted
+        Returns:
+            IngestReport with the row counts and throughput
+        """
+        if file_format is None:
+            extension = os.path.splitext(str(path))[1].lower()
+            file_format = "ndjson" if extension in (".ndjson", ".jsonl") else "csv"
+        if file_format == "csv":
+            reader = pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=False)
+        elif file_format == "ndjson":
+            reader = pd.read_json(path, lines=True, chunksize=chunksize, dtype=False)
+        else:
+            raise ValueError(f"Unsupported ingestion format: {file_format}")
+
+        start = time.perf_counter()
+        rows_read = rows_ingested = rows_duplicate = rows_invalid = 0
+
+        with self._writing():
+            # Hashes of every key present, kept sorted for binary-search lookups
+            seen = np.sort(_key_hashes(self.df))
+
+            with reader:
+                for chunk in reader:
+                    rows_read += len(chunk)
+                    rows, invalid = self._prepare_ingest_chunk(chunk)
+                    rows_invalid += invalid
+                    if rows.empty:
+                        continue
+
+                    hashes = _key_hashes(rows)
+                    positions = np.searchsorted(seen, hashes).clip(max=max(len(seen) - 1, 0))
+                    known = seen[positions] == hashes if len(seen) else np.zeros(len(rows), bool)
+                    # Also drop repeats within the chunk itself
+                    new = ~known & ~pd.Series(hashes).duplicated().to_numpy()
+                    rows_duplicate += int((~new).sum())
+                    rows = rows[new]
+                    if rows.empty:
+                        continue
+
+                    self._append_rows(rows)
+                    rows_ingested += len(rows)
+                    seen = np.union1d(seen, hashes[new])
+
+        return IngestReport(
+            rows_read, rows_ingested, rows_duplicate, rows_invalid, time.perf_counter() - start
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Bulk-ingest a lab export into the patient store")
+    arg_parser.add_argument("source", help="CSV or NDJSON file to ingest")
+    arg_parser.add_argument(
+        "--db", default="project_db_with_names.csv", help="Patient store CSV (default: %(default)s)"
+    )
+    arg_parser.add_argument("--chunksize", type=int, default=50_000, help="Rows per chunk")
+    arg_parser.add_argument(
+        "--format", choices=["csv", "ndjson"], help="Input format (default: from the extension)"
+    )
+    args = arg_parser.parse_args()
+
+    print(DBHandler(args.db).ingest(args.source, chunksize=args.chunksize, file_format=args.format))
@@ -1,7 +1,20 @@
+import io
+import json
+import os
+import re
+import tempfile
+import threading
 import pandas as pd
 import numpy as np
 from enum import Enum
 from datetime import timedelta, datetime
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+
+_NUMBER = r"-?\d+(?:\.\d+)?"
+_RANGE_PATTERN = re.compile(rf"^({_NUMBER})\s*-\s*({_NUMBER})$")
+_OPEN_RANGE_PATTERN = re.compile(rf"^({_NUMBER})\s*\+$")
+_POINT_PATTERN = re.compile(rf"^{_NUMBER}$")
 
 
 class Gender(Enum):
@@ -17,46 +30,422 @@ class Grade(Enum):
     GRADE_5 = 5
 
 
-class KnowledgeDataHandler:
-    def __init__(self):
-        # Load data from CSV files
-        self.load_all_data()
+def _parse_numeric_range(cell):
+    """
+    Parse a systemic table cell into a numeric interval.
+    "a-b" is [a, b), "a+" is [a, inf) and a plain number "a" is the point [a, a].
+    Returns (low, high, closed_right) or None if the cell is not numeric.
+    """
+    text = str(cell).strip()
+    match = _RANGE_PATTERN.match(text)
+    if match:
+        return float(match.group(1)), float(match.group(2)), False
+    match = _OPEN_RANGE_PATTERN.match(text)
+    if match:
+        return float(match.group(1)), np.inf, False
+    if _POINT_PATTERN.match(text):
+        return float(text), float(text), True
+    return None
 
-        # Store initial states for reset functionality
-        self._store_initial_states()
 
-    def load_all_data(self):
-        """Load all data from CSV files"""
-        try:
-            # Load systemic table
-            self.systemic_table = self._load_systemic_table()
+class SystemicRule:
+    """
+    Compiled grading rule of a single systemic test (one row of the systemic table).
 
-            # Load test validity table
-            self.test_validity_table = self._load_test_validity_table()
+    Numeric rows grade a value by the cell listing it exactly (a bare number) if
+    any, else by the leftmost range containing it: with fever
+    "0-38.5,38.5-40.0,40.0+,40.0", 40.0 is grade 4 and 40.5 grade 3.
+    """
 
-            # Load hemoglobin tables
-            self.hemoglobin_tables = {
-                Gender.MALE: self._load_hemoglobin_table("male"),
-                Gender.FEMALE: self._load_hemoglobin_table("female"),
-            }
+    def __init__(self, test_name, grades, intervals=None, ordinal=None):
+        self.test_name = test_name
+        self.grades = np.asarray(grades, dtype=np.int64)
+        self.numeric = intervals is not None
+        if self.numeric:
+            self.lows = np.array([low for low, _, _ in intervals], dtype=float)
+            self.highs = np.array([high for _, high, _ in intervals], dtype=float)
+            self.closed_right = np.array([closed for _, _, closed in intervals], dtype=bool)
+        self.ordinal = ordinal or {}
+
+    @classmethod
+    def from_row(cls, test_name, row: pd.Series):
+        """Compile a systemic table row, column order giving the grade (grade 1 first)"""
+        cells = [
+            (grade, cell)
+            for grade, cell in enumerate(row.values, 1)
+            if not pd.isna(cell) and str(cell) != ""
+        ]
+        intervals = [_parse_numeric_range(cell) for _, cell in cells]
+        grades = [grade for grade, _ in cells]
+        if cells and all(interval is not None for interval in intervals):
+            return cls(test_name, grades, intervals=intervals)
+
+        # Categorical test: the first (lowest) grade listing a value wins
+        ordinal = {}
+        for grade, cell in cells:
+            ordinal.setdefault(str(cell), grade)
+        return cls(test_name, grades, ordinal=ordinal)
+
+    def grade(self, values) -> np.ndarray:
+        """Grade a sequence of values, returning 0 where no grade matches"""
+        if self.numeric:
+            numbers = pd.to_numeric(
+                pd.Series(values, dtype=object), errors="coerce"
+            ).to_numpy(dtype=float)[:, None]
+            points = self.closed_right & (self.lows == self.highs)
+            point_matches = points & (numbers == self.lows)
+            matches = (numbers >= self.lows) & (
+                (numbers < self.highs) | (self.closed_right & (numbers == self.highs))
+            )
+            # A value listed exactly (a bare number cell) takes that cell's grade,
+            # as it did when cells were matched as strings; otherwise the leftmost
+            # matching range wins, as the table is read left to right
+            matches = np.where(point_matches.any(axis=1)[:, None], point_matches, matches)
+            first = matches.argmax(axis=1)
+            return np.where(matches.any(axis=1), self.grades[first], 0)
+
+        return np.array(
+            [self.ordinal.get(str(value), 0) for value in values], dtype=np.int64
+        )
+
+
+def _parse_range_label(label):
+    """Parse a displayed range such as "0-4000", "WBC 0-4000" or "10000+" into (low, high)"""
+    text = str(label).replace("WBC", "").replace("Hb", "").strip()
+    if text.endswith("+"):
+        return float(text[:-1]), np.inf
+    low, high = text.split("-")
+    return float(low), float(high)
+
+
+def _elementary_bins(ranges):
+    """Split possibly gapped (low, high) ranges into sorted boundaries and the range index of each bin"""
+    bounds = sorted({bound for low, high in ranges for bound in (low, high)})
+    owners = []
+    for low, high in zip(bounds[:-1], bounds[1:]):
+        owner = -1
+        for i, (range_low, range_high) in enumerate(ranges):
+            if range_low <= low and high <= range_high:
+                owner = i
+                break
+        owners.append(owner)
+    return np.array(bounds, dtype=float), owners
+
+
+class HematologicalTable:
+    """
+    Compact WBC x hemoglobin state table: interval boundaries plus a matrix of state codes.
+    Intervals are closed on the left, code -1 marks a cell without a state.
+    Instances are immutable; edits build a new table.
+    """
+
+    def __init__(self, wbc_bounds, hb_bounds, states, codes):
+        self.wbc_bounds = np.asarray(wbc_bounds, dtype=float)
+        self.hb_bounds = np.asarray(hb_bounds, dtype=float)
+        self.states = list(states)
+        self.codes = np.asarray(codes, dtype=np.int32).reshape(
+            len(self.wbc_bounds) - 1, len(self.hb_bounds) - 1
+        )
+        self._state_names = np.array(self.states + [None], dtype=object)
+        for array in (self.wbc_bounds, self.hb_bounds, self.codes):
+            array.flags.writeable = False
+
+    @classmethod
+    def from_state_matrix(cls, wbc_ranges, hb_ranges, matrix):
+        """Build a table from (low, high) WBC rows, (low, high) Hb columns and a matrix of state names"""
+        wbc_bounds, wbc_owners = _elementary_bins(wbc_ranges)
+        hb_bounds, hb_owners = _elementary_bins(hb_ranges)
+        states = []
+        codes = np.full((len(wbc_owners), len(hb_owners)), -1, dtype=np.int32)
+        for i, row in enumerate(wbc_owners):
+            for j, column in enumerate(hb_owners):
+                if row == -1 or column == -1:
+                    continue
+                state = matrix[row][column]
+                if state is None or pd.isna(state) or state == "":
+                    continue
+                if state not in states:
+                    states.append(state)
+                codes[i, j] = states.index(state)
+        return cls(wbc_bounds, hb_bounds, states, codes)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame):
+        """Build a table from a DataFrame indexed by WBC intervals with Hb interval columns"""
+        wbc_ranges = [(float(interval.left), float(interval.right)) for interval in df.index]
+        hb_ranges = [(float(interval.left), float(interval.right)) for interval in df.columns]
+        return cls.from_state_matrix(wbc_ranges, hb_ranges, df.values.tolist())
+
+    @classmethod
+    def from_display_records(cls, records, row_label="WBC Range"):
+        """Build a table from the records of the UI table ("WBC Range" rows, Hb range columns)"""
+        records = [record for record in records if str(record.get(row_label) or "").strip()]
+        columns = [column for column in records[0] if column != row_label] if records else []
+        wbc_ranges = [_parse_range_label(record[row_label]) for record in records]
+        hb_ranges = [_parse_range_label(column) for column in columns]
+        matrix = [[record.get(column) for column in columns] for record in records]
+        return cls.from_state_matrix(wbc_ranges, hb_ranges, matrix)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Render the table as a DataFrame with WBC interval rows and Hb interval columns"""
+        df = pd.DataFrame(
+            self._state_names[self.codes],
+            index=pd.IntervalIndex.from_breaks(self.wbc_bounds, closed="left", name="WBC"),
+            columns=pd.IntervalIndex.from_breaks(self.hb_bounds, closed="left", name="Hemoglobin"),
+        )
+        return df
+
+    @staticmethod
+    def _bin(bounds, values):
+        index = np.searchsorted(bounds, values, side="right") - 1
+        return np.where(index < len(bounds) - 1, index, -1)
+
+    def classify(self, wbc_values, hb_values) -> np.ndarray:
+        """Vectorized state lookup for aligned WBC and Hb values (None where no state applies)"""
+        wbc_index = self._bin(self.wbc_bounds, np.asarray(wbc_values, dtype=float))
+        hb_index = self._bin(self.hb_bounds, np.asarray(hb_values, dtype=float))
+        valid = (wbc_index >= 0) & (hb_index >= 0)
+        codes = np.full(len(wbc_index), -1, dtype=np.int32)
+        codes[valid] = self.codes[wbc_index[valid], hb_index[valid]]
+        return self._state_names[codes]
+
+    def state(self, wbc_value, hb_value):
+        """State for a single WBC and Hb value pair"""
+        return self.classify([wbc_value], [hb_value])[0]
+
+    def copy(self):
+        # Immutable, so sharing the instance is safe
+        return self
 
-            # Load recommendations tables
-            self.recommendations = {
-                Gender.MALE: self._load_recommendations_table("male"),
-                Gender.FEMALE: self._load_recommendations_table("female"),
+    def to_json(self) -> str:
+        def encode(bounds):
+            return [float(bound) if np.isfinite(bound) else "inf" for bound in bounds]
+
+        return json.dumps(
+            {
+                "wbc_bounds": encode(self.wbc_bounds),
+                "hb_bounds": encode(self.hb_bounds),
+                "states": self.states,
+                "codes": self.codes.tolist(),
             }
+        )
+
+    @classmethod
+    def from_json(cls, text: str):
+        data = json.loads(text)
+        return cls(
+            [float(bound) for bound in data["wbc_bounds"]],
+            [float(bound) for bound in data["hb_bounds"]],
+            data["states"],
+            data["codes"],
+        )
+
+
+GENDER_SPECIFIC_TABLES = ("hemoglobin", "hematological", "recommendations")
+
+# Tables persisted by save_all_data, keyed by (table_type, gender)
+PERSISTED_TABLES = [
+    ("systemic", None),
+    ("test_validity", None),
+    ("hemoglobin", Gender.MALE),
+    ("hemoglobin", Gender.FEMALE),
+    ("recommendations", Gender.MALE),
+    ("recommendations", Gender.FEMALE),
+    ("hematological", Gender.MALE),
+    ("hematological", Gender.FEMALE),
+]
+
+
+def _table_filename(table_type: str, gender: Gender = None) -> str:
+    """File name of a knowledge table"""
+    if table_type in ("systemic", "test_validity"):
+        return f"{table_type}_table.csv"
+    if table_type == "hematological":
+        return f"hematological_{gender.value}.json"
+    return f"{table_type}_{gender.value}.csv"
 
-            # Load hematological tables (these are complex interval-based tables, so we'll keep them hard-coded for now)
-            self._load_hematological_tables()
 
-        except FileNotFoundError as e:
-            print(f"Warning: CSV file not found, using default data: {e}")
-            self._load_default_data()
+def _file_mode(path: str) -> int:
+    """Permission bits of an existing file, or those a new file would get from the umask"""
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def _atomic_write(path: str, text: str):
+    """Write a file through a temporary file and an atomic rename, so readers never see a partial file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "w", newline="") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file owner-only; keep the permissions of the file replaced
+        os.chmod(tmp_path, _file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class TableSnapshot(NamedTuple):
+    """
+    Immutable view of a knowledge table at a given version.
+    The handler never mutates a table in place (every change installs a new
+    DataFrame), so the data of a snapshot stays valid after later edits.
+    """
+
+    table_type: str
+    gender: Optional[Gender]
+    version: int
+    data: pd.DataFrame
+
+
+class _GenderTables:
+    """Dict-like access to the per-gender versions of a knowledge table"""
+
+    def __init__(self, handler, table_type):
+        self._handler = handler
+        self._table_type = table_type
+
+    def __getitem__(self, gender):
+        return self._handler._get_table(self._table_type, gender)
+
+    def __setitem__(self, gender, df):
+        self._handler._set_table(self._table_type, df, gender)
+
+    def __contains__(self, gender):
+        return isinstance(gender, Gender)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        return [gender for gender in Gender if gender in self]
+
+    def values(self):
+        return [self[gender] for gender in self.keys()]
+
+    def items(self):
+        return [(gender, self[gender]) for gender in self.keys()]
+
+
+class KnowledgeDataHandler:
+    def __init__(self, data_dir: str = ".", packed_path: str = None, shared_store=None):
+        """
+        Args:
+            data_dir: Directory holding the knowledge table CSV files
+            packed_path: Optional single file batching every persisted table;
+                when given it is preferred on load and written instead of the CSVs
+            shared_store: Optional SharedVersionStore used by multi-process deployments;
+                saves are serialized through it and sync() reloads other processes' saves
+        """
+        self.data_dir = data_dir
+        self.packed_path = packed_path
+        self.shared_store = shared_store
+        self._store_version = (
+            shared_store.get_version(self._store_key) if shared_store is not None else None
+        )
+        # Parsed packed file, kept only while a batch of tables is being loaded
+        self._packed_tables = None
+        # Modification times of the watched files, as last loaded or written by this handler
+        self._mtimes = {}
+        self._watcher = None
+        self._stop_watching = threading.Event()
+
+        # Current tables and their versions, keyed by (table_type, gender)
+        self._tables = {}
+        self._versions = {}
+        self._version_counter = 0
+        self._lock = threading.RLock()
+        # Artifacts compiled from the tables, keyed by the versions they were built from
+        self._compiled = {}
+        # Versions last written to disk, used to save only the changed tables
+        self._saved_versions = {}
+        # Tables as first loaded, the baseline for reset (shared, never copied)
+        self._initial_states = {}
+
+        # Tables are loaded on first use; only remember the files' current state
+        self._record_mtimes()
+
+    @property
+    def _store_key(self) -> str:
+        return f"knowledge:{os.path.abspath(self.packed_path or self.data_dir)}"
+
+    def _table_path(self, table_type: str, gender: Gender = None) -> str:
+        return os.path.join(self.data_dir, _table_filename(table_type, gender))
+
+    def _read_packed(self):
+        """Parsed packed knowledge file, or None when tables are stored as separate files"""
+        if self._packed_tables is not None:
+            return self._packed_tables
+        if self.packed_path and os.path.exists(self.packed_path):
+            with open(self.packed_path) as f:
+                return json.load(f)
+        return None
+
+    def _read_text(self, table_type: str, gender: Gender = None) -> str:
+        """Read a stored table from the packed knowledge file if present, otherwise from its own file"""
+        packed = self._read_packed()
+        if packed is not None:
+            name = _table_filename(table_type, gender)
+            if name not in packed:
+                raise FileNotFoundError(f"{name} not found in {self.packed_path}")
+            return packed[name]
+        with open(self._table_path(table_type, gender), newline="") as f:
+            return f.read()
+
+    def _on_disk(self, table_type: str, gender: Gender = None) -> bool:
+        packed = self._read_packed()
+        if packed is not None:
+            return _table_filename(table_type, gender) in packed
+        return os.path.exists(self._table_path(table_type, gender))
+
+    def _install_loaded(self, key, table):
+        """
+        Install a table freshly loaded from disk as its reset baseline. Loading a
+        table on first use does not change the data, so only reloads get a new version.
+        """
+        self._set_table(key[0], table, key[1], new_version=key in self._tables)
+        self._initial_states[key] = table
+        # Tables read from disk are clean; defaults are written on the next save
+        if self._on_disk(*key):
+            self._saved_versions[key] = self._versions[key]
+
+    def _read_csv(self, table_type: str, gender: Gender = None, **kwargs) -> pd.DataFrame:
+        return pd.read_csv(io.StringIO(self._read_text(table_type, gender)), **kwargs)
+
+    def load_all_data(self):
+        """Load (or reload) every table from disk now instead of on first use"""
+        with self._lock:
+            self._packed_tables = self._read_packed()
+            try:
+                try:
+                    tables = {key: self._load_table(*key) for key in PERSISTED_TABLES}
+                except FileNotFoundError as e:
+                    print(f"Warning: CSV file not found, using default data: {e}")
+                    self._load_default_data()
+                    tables = {key: self._tables[key] for key in PERSISTED_TABLES}
+
+                for key, table in tables.items():
+                    self._install_loaded(key, table)
+            finally:
+                self._packed_tables = None
+            self._record_mtimes()
 
     def _load_systemic_table(self):
         """Load systemic table from CSV"""
         try:
-            df = pd.read_csv("systemic_table.csv", index_col=0)
+            # Keep literal values such as "None" instead of reading them as NaN
+            df = self._read_csv("systemic", index_col=0, keep_default_na=False)
             # Rename columns to match expected format
             df.columns = [f"grade {i}" for i in range(1, 5)]
             return df
@@ -90,7 +479,7 @@ class KnowledgeDataHandler:
     def _load_test_validity_table(self):
         """Load test validity table from CSV"""
         try:
-            return pd.read_csv("test_validity_table.csv")
+            return self._read_csv("test_validity")
         except FileNotFoundError:
             # Fallback to default data
             return pd.DataFrame(
@@ -107,7 +496,7 @@ class KnowledgeDataHandler:
     def _load_hemoglobin_table(self, gender):
         """Load hemoglobin table from CSV"""
         try:
-            df = pd.read_csv(f"hemoglobin_{gender}.csv")
+            df = self._read_csv("hemoglobin", Gender(gender))
             # Handle infinity values
             df["high_range"] = df["high_range"].replace("inf", np.inf)
             return df
@@ -145,7 +534,7 @@ class KnowledgeDataHandler:
     def _load_recommendations_table(self, gender):
         """Load recommendations table from CSV"""
         try:
-            return pd.read_csv(f"recommendati  ons_{gender}.csv")
+            return self._read_csv("recommendations", Gender(gender))
         except FileNotFoundError:
             # Fallback to default data
             if gender == "male":
@@ -220,71 +609,41 @@ class KnowledgeDataHandler:
                 )
 
     def _load_hematological_tables(self):
-        """Load hematological tables (keeping the complex interval logic for now)"""
-        # Initialize hematological tables
-        wbc_intervals = pd.IntervalIndex.from_tuples(
-            [(0, 4000), (4000, 10000), (10000, np.inf)], closed="left"
-        )
-
-        # Female hematological table
-        female_hb_intervals = pd.IntervalIndex.from_tuples(
-            [(0, 8), (8, 10), (10, 12), (12, 14), (14, np.inf)], closed="left"
-        )
-
-        female_hematological_data = [
-            [
-                "Pancytopenia",
-                "Pancytopenia",
-                "Pancytopenia",
-                "Leukopenia",
-                "Suspected Polycytemia Vera",
-            ],
-            ["Anemia", "Anemia", "Anemia", "Normal", "Polyhemia"],
-            [
-                "Suspected Leukemia",
-                "Suspected Leukemia",
-                "Suspected Leukemia",
-                "Leukemoid reaction",
-                "Suspected Polycytemia Vera",
-            ],
-        ]
+        """Load the compact hematological tables, falling back to the built-in ones"""
         self.hematological_tables = {
-            Gender.FEMALE: pd.DataFrame(
-                female_hematological_data,
-                index=wbc_intervals,
-                columns=female_hb_intervals,
-            )
+            Gender.MALE: self._load_hematological_table("male"),
+            Gender.FEMALE: self._load_hematological_table("female"),
         }
-        self.hematological_tables[Gender.FEMALE].index.name = "WBC"
-        self.hematological_tables[Gender.FEMALE].columns.name = "Hemoglobin"
 
-        # Male hematological table
-        male_hb_intervals = pd.IntervalIndex.from_tuples(
-            [(0, 9), (9, 11), (11, 13), (13, 16), (16, np.inf)], closed="left"
-        )
-
-        male_hematological_data = [
-            [
-                "Pancytopenia",
-                "Pancytopenia",
-                "Pancytopenia",
-                "Leukopenia",
-                "Suspected Polycytemia Vera",
-            ],
-            ["Anemia", "Anemia", "Anemia", "Normal", "Polyhemia"],
-            [
-                "Suspected Leukemia",
-                "Suspected Leukemia",
-                "Suspected Leukemia",
-                "Leukemoid reaction",
-                "Suspected Polycytemia Vera",
-            ],
-        ]
-        self.hematological_tables[Gender.MALE] = pd.DataFrame(
-            male_hematological_data, index=wbc_intervals, columns=male_hb_intervals
-        )
-        self.hematological_tables[Gender.MALE].index.name = "WBC"
-        self.hematological_tables[Gender.MALE].columns.name = "Hemoglobin"
+    def _load_hematological_table(self, gender):
+        """Load a hematological table from its compact JSON file"""
+        try:
+            return HematologicalTable.from_json(self._read_text("hematological", Gender(gender)))
+        except FileNotFoundError:
+            # Fallback to default data
+            wbc_ranges = [(0, 4000), (4000, 10000), (10000, np.inf)]
+            if gender == "male":
+                hb_ranges = [(0, 9), (9, 11), (11, 13), (13, 16), (16, np.inf)]
+            else:  # female
+                hb_ranges = [(0, 8), (8, 10), (10, 12), (12, 14), (14, np.inf)]
+            states = [
+                [
+                    "Pancytopenia",
+                    "Pancytopenia",
+                    "Pancytopenia",
+                    "Leukopenia",
+                    "Suspected Polycytemia Vera",
+                ],
+                ["Anemia", "Anemia", "Anemia", "Normal", "Polyhemia"],
+                [
+                    "Suspected Leukemia",
+                    "Suspected Leukemia",
+                    "Suspected Leukemia",
+                    "Leukemoid reaction",
+                    "Suspected Polycytemia Vera",
+                ],
+            ]
+            return HematologicalTable.from_state_matrix(wbc_ranges, hb_ranges, states)
 
     def _load_default_data(self):
         """Load default hard-coded data if CSV files are not available"""
@@ -417,24 +776,197 @@ class KnowledgeDataHandler:
         # Load hematological tables
         self._load_hematological_tables()
 
-    def _store_initial_states(self):
-        """Store initial states for reset functionality"""
-        self._initial_states = {
-            "hemoglobin": {
-                Gender.FEMALE: self.hemoglobin_tables[Gender.FEMALE].copy(),
-                Gender.MALE: self.hemoglobin_tables[Gender.MALE].copy(),
-            },
-            "hematological": {
-                Gender.FEMALE: self.hematological_tables[Gender.FEMALE].copy(),
-                Gender.MALE: self.hematological_tables[Gender.MALE].copy(),
-            },
-            "systemic": self.systemic_table.copy(),
-            "recommendations": {
-                Gender.FEMALE: self.recommendations[Gender.FEMALE].copy(),
-                Gender.MALE: self.recommendations[Gender.MALE].copy(),
-            },
-            "test_validity": self.test_validity_table.copy(),
+    def _get_table(self, table_type: str, gender: Gender = None) -> pd.DataFrame:
+        key = (table_type, gender)
+        table = self._tables.get(key)
+        if table is None:
+            with self._lock:
+                # Load on first use
+                table = self._tables.get(key)
+                if table is None:
+                    table = self._load_table(table_type, gender)
+                    self._install_loaded(key, table)
+        return table
+
+    def _set_table(self, table_type: str, df: pd.DataFrame, gender: Gender = None, new_version: bool = True):
+        """
+        Install a new version of a table (tables are replaced, never mutated in place).
+        Without new_version the table takes the current version, for a first load.
+        """
+        if table_type == "hematological" and isinstance(df, pd.DataFrame):
+            df = HematologicalTable.from_frame(df)
+        with self._lock:
+            if new_version:
+                self._version_counter += 1
+            self._tables[(table_type, gender)] = df
+            self._versions[(table_type, gender)] = self._version_counter
+
+    @property
+    def systemic_table(self) -> pd.DataFrame:
+        return self._get_table("systemic")
+
+    @systemic_table.setter
+    def systemic_table(self, df):
+        self._set_table("systemic", df)
+
+    @property
+    def test_validity_table(self) -> pd.DataFrame:
+        return self._get_table("test_validity")
+
+    @test_validity_table.setter
+    def test_validity_table(self, df):
+        self._set_table("test_validity", df)
+
+    @property
+    def hemoglobin_tables(self) -> _GenderTables:
+        return _GenderTables(self, "hemoglobin")
+
+    @hemoglobin_tables.setter
+    def hemoglobin_tables(self, tables):
+        for gender, df in tables.items():
+            self._set_table("hemoglobin", df, gender)
+
+    @property
+    def hematological_tables(self) -> _GenderTables:
+        return _GenderTables(self, "hematological")
+
+    @hematological_tables.setter
+    def hematological_tables(self, tables):
+        for gender, df in tables.items():
+            self._set_table("hematological", df, gender)
+
+    @property
+    def recommendations(self) -> _GenderTables:
+        return _GenderTables(self, "recommendations")
+
+    @recommendations.setter
+    def recommendations(self, tables):
+        for gender, df in tables.items():
+            self._set_table("recommendations", df, gender)
+
+    @property
+    def version(self) -> int:
+        """Version of the knowledge base as a whole (increases on every table change)"""
+        return self._version_counter
+
+    def get_version(self, table_type: str, gender: Gender = None) -> int:
+        """Get the version of a table, increasing every time the table changes"""
+        self._get_table(table_type, gender)
+        return self._versions[(table_type, gender)]
+
+    def snapshot(self, table_type: str, gender: Gender = None) -> TableSnapshot:
+        """Get an immutable snapshot of a table at its current version"""
+        with self._lock:
+            table = self._get_table(table_type, gender)
+            return TableSnapshot(
+                table_type, gender, self._versions[(table_type, gender)], table
+            )
+
+    def snapshot_all(self) -> dict:
+        """Get consistent snapshots of every table, keyed by (table_type, gender)"""
+        with self._lock:
+            return {key: self.snapshot(*key) for key in PERSISTED_TABLES}
+
+    def _get_compiled(self, name: str, keys, builder):
+        """Get an artifact compiled from the given tables, rebuilding it when one of them changed"""
+        versions = tuple(self.get_version(*key) for key in keys)
+        cached = self._compiled.get(name)
+        if cached is not None and cached[0] == versions:
+            return cached[1]
+        compiled = builder()
+        self._compiled[name] = (versions, compiled)
+        return compiled
+
+    def _compile_recommendations(self):
+        """Compile the recommendations tables into a lookup keyed by (gender, hb state, hematological state, grade)"""
+        lookup = {}
+        for gender, table in self.recommendations.items():
+            for hb_state, hematological_state, toxicity, recommendation in zip(
+                table["Hemoglobinstate"],
+                table["Hematologicalstate"],
+                table["Systematic Toxicity"],
+                table["Recommendation"],
+            ):
+                try:
+                    grade = int(str(toxicity).upper().replace("GRADE", "").strip())
+                except ValueError:
+                    # Skip incomplete rows (e.g. rows just added in the UI)
+                    continue
+                # Keep the first matching row, as the table is read top to bottom
+                lookup.setdefault((gender, hb_state, hematological_state, grade), recommendation)
+
+        index = {
+            gender: pd.Series(
+                {
+                    key[1:]: recommendation
+                    for key, recommendation in lookup.items()
+                    if key[0] == gender
+                },
+                dtype=object,
+            )
+            for gender in Gender
         }
+        return lookup, index
+
+    @property
+    def recommendation_lookup(self) -> dict:
+        """Recommendation lookup keyed by (gender, hb state, hematological state, grade)"""
+        return self._get_compiled(
+            "recommendations",
+            [("recommendations", gender) for gender in Gender],
+            self._compile_recommendations,
+        )[0]
+
+    @property
+    def recommendation_index(self) -> dict:
+        """Per-gender recommendation series indexed by (hb state, hematological state, grade)"""
+        return self._get_compiled(
+            "recommendations",
+            [("recommendations", gender) for gender in Gender],
+            self._compile_recommendations,
+        )[1]
+
+    def _compile_systemic_rules(self):
+        """Compile the systemic table into typed grading rules, one per test"""
+        return {
+            test: SystemicRule.from_row(test, row)
+            for test, row in self.systemic_table.iterrows()
+        }
+
+    @property
+    def systemic_rules(self) -> dict:
+        """Compiled grading rules of the systemic table, keyed by test"""
+        return self._get_compiled(
+            "systemic_rules", [("systemic", None)], self._compile_systemic_rules
+        )
+
+    def grade_systemic_values(self, test: str, values) -> np.ndarray:
+        """Grade values of a systemic test, returning 0 where no grade matches"""
+        rule = self.systemic_rules.get(test)
+        if rule is None:
+            return np.zeros(len(values), dtype=np.int64)
+        return rule.grade(values)
+
+    def get_recommendation(
+        self, gender: Gender, hb_state: str, hematological_state: str, grade
+    ):
+        """Get the recommendation for a (gender, hb state, hematological state, grade) combination"""
+        if isinstance(grade, Grade):
+            grade = grade.value
+        return self.recommendation_lookup.get(
+            (gender, hb_state, hematological_state, grade)
+        )
+
+    def lookup_recommendations(
+        self, gender: Gender, hb_states, hematological_states, grades
+    ) -> pd.Series:
+        """Vectorized recommendation lookup for aligned sequences of states and grades"""
+        grades = [grade.value if isinstance(grade, Grade) else grade for grade in grades]
+        keys = pd.MultiIndex.from_arrays([list(hb_states), list(hematological_states), grades])
+        index = self.recommendation_index[gender]
+        if index.empty:
+            return pd.Series([None] * len(keys), dtype=object)
+        return index.reindex(keys).reset_index(drop=True)
 
     def update_systemic_grade(self, condition: str, grade: int, value: str):
         """Update a grade value in the systemic table"""
@@ -443,14 +975,21 @@ class KnowledgeDataHandler:
         if grade not in range(1, 5):
             raise ValueError(f"Invalid grade: {grade}")
 
-        self.systemic_table.loc[condition, f"grade {grade}"] = value
+        # Copy on write so snapshots of the previous version stay untouched
+        table = self.systemic_table.copy()
+        table.loc[condition, f"grade {grade}"] = value
+        self.systemic_table = table
 
     def get_hemoglobin_table(self, gender: Gender) -> pd.DataFrame:
         """Get the hemoglobin state table for a specific gender"""
         return self.hemoglobin_tables[gender]
 
     def get_hematological_table(self, gender: Gender) -> pd.DataFrame:
-        """Get the hematological state table for a specific gender"""
+        """Get the hematological state table for a specific gender, as an interval-indexed DataFrame"""
+        return self.hematological_tables[gender].to_frame()
+
+    def get_hematological_classifier(self, gender: Gender) -> HematologicalTable:
+        """Get the compiled hematological state classifier for a specific gender"""
         return self.hematological_tables[gender]
 
     def get_recommendations(self, gender: Gender) -> pd.DataFrame:
@@ -470,75 +1009,204 @@ class KnowledgeDataHandler:
         if test_name not in self.test_validity_table["test_name"].values:
             raise ValueError(f"Invalid test name: {test_name}")
 
-        self.test_validity_table.loc[
-            self.test_validity_table["test_name"] == test_name, "good-before"
-        ] = good_before
-        self.test_validity_table.loc[
-            self.test_validity_table["test_name"] == test_name, "good-after"
-        ] = good_after
+        # Copy on write so snapshots of the previous version stay untouched
+        table = self.test_validity_table.copy()
+        table.loc[table["test_name"] == test_name, "good-before"] = good_before
+        table.loc[table["test_name"] == test_name, "good-after"] = good_after
+        self.test_validity_table = table
 
     def reset_table(self, table_type: str, gender: Gender = None):
         """Reset a table to its initial state"""
-        if table_type == "systemic":
-            self.systemic_table = self._initial_states["systemic"].copy()
-        elif table_type == "test_validity":
-            self.test_validity_table = self._initial_states["test_validity"].copy()
-        elif gender is not None:
-            if table_type == "hemoglobin":
-                self.hemoglobin_tables[gender] = self._initial_states["hemoglobin"][
-                    gender
-                ].copy()
-            elif table_type == "hematological":
-                self.hematological_tables[gender] = self._initial_states[
-                    "hematological"
-                ][gender].copy()
-            elif table_type == "recommendations":
-                self.recommendations[gender] = self._initial_states["recommendations"][
-                    gender
-                ].copy()
+        if table_type in GENDER_SPECIFIC_TABLES:
+            if gender is None:
+                raise ValueError("Gender must be provided for gender-specific tables")
         else:
-            raise ValueError("Gender must be provided for gender-specific tables")
+            gender = None
+
+        # Tables are never mutated in place, so the baseline can be shared as is
+        current = self._get_table(table_type, gender)
+        baseline = self._initial_states[(table_type, gender)]
+        if current is baseline or (isinstance(current, pd.DataFrame) and current.equals(baseline)):
+            # Already at its baseline: not a change
+            return
+        self._set_table(table_type, baseline, gender)
+
+    def is_dirty(self, table_type: str, gender: Gender = None) -> bool:
+        """Whether a table changed since it was last loaded from or saved to disk"""
+        key = (table_type, gender)
+        if key not in self._tables:
+            # Never loaded, so unchanged
+            return False
+        return key not in self._saved_versions or self._saved_versions[key] != self._versions.get(key)
+
+    def _serialize_table(self, table_type: str, gender: Gender = None) -> str:
+        """Render a table as the CSV text stored on disk"""
+        df = self._get_table(table_type, gender)
+        if table_type == "systemic":
+            # Reset index to include condition as a column
+            df = df.reset_index()
+        elif table_type == "hematological":
+            return df.to_json()
+        elif table_type == "hemoglobin":
+            # Handle infinity values for CSV storage
+            df = df.copy()
+            df["high_range"] = df["high_range"].replace(np.inf, "inf")
+        return df.to_csv(index=False)
+
+    @contextmanager
+    def _shared_write(self):
+        """
+        Hold the cross-process write lock (if any) and publish a new version on success.
+        Other processes' saves are picked up first, so a packed write never drops them.
+        """
+        if self.shared_store is None:
+            yield
+            return
+        with self.shared_store.write_lock():
+            self.sync()
+            yield
+            self._store_version = self.shared_store.bump(self._store_key)
 
     def save_all_data(self):
-        """Save all data to CSV files"""
+        """Save the changed tables to CSV files (or to the packed knowledge file)"""
         try:
-            # Save systemic table
-            self._save_systemic_table()
+            with self._lock:
+                if not any(self.is_dirty(*key) for key in PERSISTED_TABLES):
+                    return True, "No changes to save"
 
-            # Save test validity table
-            self._save_test_validity_table()
+            with self._lock, self._shared_write():
+                dirty = [key for key in PERSISTED_TABLES if self.is_dirty(*key)]
 
-            # Save hemoglobin tables
-            self._save_hemoglobin_table("male")
-            self._save_hemoglobin_table("female")
+                if self.packed_path:
+                    # Batch every table into one file written with a single rename.
+                    # Serializing loads the tables not used yet, so their versions
+                    # are only known afterwards
+                    packed = {
+                        _table_filename(*key): self._serialize_table(*key)
+                        for key in PERSISTED_TABLES
+                    }
+                    _atomic_write(self.packed_path, json.dumps(packed))
+                    self._saved_versions.update({key: self._versions[key] for key in PERSISTED_TABLES})
+                    written = [self.packed_path]
+                else:
+                    written = []
+                    for key in dirty:
+                        path = self._table_path(*key)
+                        _atomic_write(path, self._serialize_table(*key))
+                        self._saved_versions[key] = self._versions[key]
+                        written.append(path)
+                # Our own writes must not be picked up as external changes; other
+                # files keep their recorded mtimes so their external edits still are
+                for path in written:
+                    self._mtimes[path] = self._mtime(path)
 
-            # Save recommendations tables
-            self._save_recommendations_table("male")
-            self._save_recommendations_table("female")
-
-            return True, "All data saved successfully"
+            return True, f"Saved {len(dirty)} changed table(s)"
         except Exception as e:
             return False, f"Error saving data: {str(e)}"
 
-    def _save_systemic_table(self):
-        """Save systemic table to CSV"""
-        # Reset index to include condition as a column
-        df_to_save = self.systemic_table.reset_index()
-        df_to_save.to_csv("systemic_table.csv", index=False)
-
-    def _save_test_validity_table(self):
-        """Save test validity table to CSV"""
-        self.test_validity_table.to_csv("test_validity_table.csv", index=False)
-
-    def _save_hemoglobin_table(self, gender):
-        """Save hemoglobin table to CSV"""
-        df = self.hemoglobin_tables[Gender(gender)].copy()
-        # Handle infinity values for CSV storage
-        df["high_range"] = df["high_range"].replace(np.inf, "inf")
-        df.to_csv(f"hemoglobin_{gender}.csv", index=False)
-
-    def _save_recommendations_table(self, gender):
-        """Save recommendations table to CSV"""
-        self.recommendations[Gender(gender)].to_csv(
-            f"recommendations_{gender}.csv", index=False
+    def _watched_files(self) -> dict:
+        """Files backing the persisted tables, mapped to the tables they hold"""
+        if self.packed_path:
+            return {self.packed_path: list(PERSISTED_TABLES)}
+        return {self._table_path(*key): [key] for key in PERSISTED_TABLES}
+
+    @staticmethod
+    def _mtime(path: str):
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _record_mtimes(self):
+        self._mtimes = {path: self._mtime(path) for path in self._watched_files()}
+
+    def _load_table(self, table_type: str, gender: Gender = None):
+        """Load a single table from disk"""
+        if table_type == "systemic":
+            return self._load_systemic_table()
+        if table_type == "test_validity":
+            return self._load_test_validity_table()
+        if table_type == "hemoglobin":
+            return self._load_hemoglobin_table(gender.value)
+        if table_type == "recommendations":
+            return self._load_recommendations_table(gender.value)
+        if table_type == "hematological":
+            return self._load_hematological_table(gender.value)
+        raise ValueError(f"Invalid table type: {table_type}")
+
+    def check_for_changes(self) -> list:
+        """
+        Reload the tables whose files changed on disk since they were loaded or saved.
+        Tables with unsaved local edits are kept. Returns the reloaded (table_type, gender) keys.
+        """
+        changed = []
+        for path, keys in self._watched_files().items():
+            mtime = self._mtime(path)
+            if mtime is None or mtime == self._mtimes.get(path):
+                continue
+            self._mtimes[path] = mtime
+            for key in keys:
+                if key not in self._tables:
+                    # Not loaded yet, the first use reads the new file
+                    continue
+                if self.is_dirty(*key):
+                    print(
+                        f"Warning: {path} changed on disk but {key[0]} has unsaved edits, keeping them"
+                    )
+                    continue
+                changed.append(key)
+
+        if not changed:
+            return []
+
+        # Load everything first, then install the new versions in one swap
+        self._packed_tables = self._read_packed()
+        try:
+            tables = {key: self._load_table(*key) for key in changed}
+        finally:
+            self._packed_tables = None
+        with self._lock:
+            for (table_type, gender), df in tables.items():
+                self._set_table(table_type, df, gender)
+                self._saved_versions[(table_type, gender)] = self._versions[(table_type, gender)]
+        return changed
+
+    def sync(self) -> list:
+        """
+        Reload the tables another process saved since this handler last synced.
+        Cheap when nothing changed (a single version lookup); returns the reloaded keys.
+        """
+        if self.shared_store is None:
+            return []
+        store_version = self.shared_store.get_version(self._store_key)
+        if store_version == self._store_version:
+            return []
+        self._store_version = store_version
+        return self.check_for_changes()
+
+    def _watch(self, interval_seconds: float):
+        while not self._stop_watching.wait(interval_seconds):
+            try:
+                self.check_for_changes()
+            except Exception as e:
+                print(f"Warning: failed to reload knowledge tables: {e}")
+
+    def start_watching(self, interval_seconds: float = 2.0):
+        """Poll the knowledge files in a daemon thread and hot-reload the tables that change"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(
+            target=self._watch,
+            args=(interval_seconds,),
+            name="knowledge-file-watcher",
+            daemon=True,
         )
+        self._watcher.start()
+
+    def stop_watching(self):
+        """Stop the file watcher thread"""
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
@@ -1,6 +1,14 @@
+import json
+import os
 import requests
+import numpy as np
 import pandas as pd
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 import time
 
 
@@ -8,6 +16,301 @@ API_KEY = '1a5b7436-1a8b-4b66-a699-43a9a22644f4'
 
 AUTH_ENDPOINT = 'https://utslogin.nlm.nih.gov/cas/v1/api-key'
 LOINC_ENDPOINT = 'https://uts-ws.nlm.nih.gov/rest/content/current/CUI/'
+LNC_SOURCE_ENDPOINT = 'https://uts-ws.nlm.nih.gov/rest/content/current/source/LNC/'
+SERVICE = 'http://umlsks.nlm.nih.gov'
+
+# Persistent name cache shared by enrichment runs and the DB handler
+DEFAULT_CACHE_PATH = 'loinc_names.sqlite'
+DEFAULT_CACHE_TTL_SECONDS = 90 * 24 * 3600
+
+# Columns of the official LOINC table (Loinc.csv) kept by import_table
+LOINC_TABLE_COLUMNS = {
+    'LOINC_NUM': 'code',
+    'LONG_COMMON_NAME': 'long_common_name',
+    'COMPONENT': 'component',
+    'SYSTEM': 'system',
+    'EXAMPLE_UCUM_UNITS': 'units',
+    'EXAMPLE_UNITS': 'example_units',
+}
+
+
+class LoincNameCache:
+    """
+    LOINC code -> long common name cache persisted in a local SQLite file.
+
+    Names come first from the official LOINC table, once imported with
+    import_table(); the API is then only needed for codes missing from it.
+    Names fetched from the API are cached with a time-to-live: older entries
+    are ignored (and refetched by the next enrichment run), so names corrected
+    upstream eventually propagate. Only resolved names are stored; codes the
+    API could not resolve are retried.
+    """
+
+    # SQLite limits the number of bound parameters per statement
+    _BATCH = 500
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_CACHE_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS loinc_names '
+                '(code TEXT PRIMARY KEY, name TEXT NOT NULL, fetched_at REAL NOT NULL)'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS loinc_table '
+                '(code TEXT PRIMARY KEY, long_common_name TEXT, component TEXT, system TEXT, units TEXT) '
+                'WITHOUT ROWID'
+            )
+
+    def _select(self, query, codes, *params):
+        """Run a 'code IN (...)' query over the codes, batch by batch (lock held by the caller)"""
+        rows = []
+        for start in range(0, len(codes), self._BATCH):
+            batch = codes[start:start + self._BATCH]
+            placeholders = ','.join('?' * len(batch))
+            rows.extend(self._conn.execute(query.format(placeholders), batch + list(params)).fetchall())
+        return rows
+
+    def get_many(self, codes):
+        """Return {code: name} for the given codes that have a fresh entry."""
+        codes = [str(code) for code in codes]
+        oldest = time.time() - self.ttl_seconds
+        with self._lock:
+            names = dict(self._select(
+                'SELECT code, long_common_name FROM loinc_table '
+                'WHERE code IN ({}) AND long_common_name IS NOT NULL',
+                codes,
+            ))
+            missing = [code for code in codes if code not in names]
+            names.update(self._select(
+                'SELECT code, name FROM loinc_names WHERE code IN ({}) AND fetched_at >= ?',
+                missing, oldest,
+            ))
+        return names
+
+    def get(self, code):
+        """Cached name of one code, or None if unknown or expired."""
+        return self.get_many([code]).get(str(code))
+
+    def put_many(self, names, fetched_at=None):
+        """Store {code: name} pairs (None names are skipped)."""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        rows = [(str(code), name, fetched_at) for code, name in names.items() if name is not None]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO loinc_names (code, name, fetched_at) VALUES (?, ?, ?)', rows
+            )
+        return len(rows)
+
+    def put(self, code, name):
+        self.put_many({code: name})
+
+    def warm_up(self, source):
+        """
+        Bulk-load the names of an already enriched file (a CSV path or a DataFrame
+        with LOINC-NUM and LOINC-NAME columns). Returns the number of codes stored.
+        """
+        df = pd.read_csv(source, usecols=['LOINC-NUM', 'LOINC-NAME'], dtype=str) \
+            if isinstance(source, str) else source
+        known = df[['LOINC-NUM', 'LOINC-NAME']].dropna().drop_duplicates('LOINC-NUM')
+        return self.put_many(dict(zip(known['LOINC-NUM'], known['LOINC-NAME'])))
+
+    def import_table(self, loinc_csv_path, chunksize=100_000):
+        """
+        Import the official LOINC table (Loinc.csv of the LOINC distribution),
+        replacing any previous import. Only the code, long common name,
+        component, system and units are kept. Returns the number of codes imported.
+        """
+        columns = lambda column: column in LOINC_TABLE_COLUMNS
+        imported = 0
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM loinc_table')
+            for chunk in pd.read_csv(loinc_csv_path, usecols=columns, dtype=str,
+                                     chunksize=chunksize, keep_default_na=False):
+                chunk = chunk.rename(columns=LOINC_TABLE_COLUMNS)
+                chunk = chunk.reindex(columns=list(LOINC_TABLE_COLUMNS.values()))
+                chunk = chunk.mask(chunk.isna() | (chunk == ''), None)
+                # Older distributions only give the free-text example units
+                example_units = chunk.pop('example_units')
+                chunk['units'] = chunk['units'].where(chunk['units'].notna(), example_units)
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO loinc_table '
+                    '(code, long_common_name, component, system, units) VALUES (?, ?, ?, ?, ?)',
+                    chunk.itertuples(index=False, name=None),
+                )
+                imported += len(chunk)
+        return imported
+
+    def details(self, codes):
+        """
+        LOINC table entries of the given codes, as a DataFrame indexed by code with
+        long_common_name, component, system and units columns (unknown codes omitted).
+        """
+        with self._lock:
+            rows = self._select(
+                'SELECT code, long_common_name, component, system, units FROM loinc_table '
+                'WHERE code IN ({})',
+                [str(code) for code in codes],
+            )
+        columns = ['code', 'long_common_name', 'component', 'system', 'units']
+        return pd.DataFrame(rows, columns=columns).set_index('code')
+
+    def close(self):
+        self._conn.close()
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: acquire() takes one token, waiting for the bucket
+    to refill when it is empty. Allows bursts of up to `capacity` calls and a
+    sustained `rate` calls per second.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class UMLSClient:
+    """
+    UMLS REST client resolving LOINC long common names concurrently.
+
+    All requests go through one pooled requests.Session and a shared token
+    bucket, so the worker threads reuse connections and stay under the API
+    rate limit together. The ticket-granting ticket (TGT) is fetched once and
+    reused until it expires (or the API rejects it); each lookup still needs
+    its own single-use service ticket. Connection errors, 429 and 5xx answers
+    are retried with exponential backoff.
+    """
+
+    def __init__(self, api_key=API_KEY, auth_endpoint=AUTH_ENDPOINT,
+                 lookup_endpoint=LNC_SOURCE_ENDPOINT, rate_per_second=10.0,
+                 max_workers=8, retries=3, backoff_seconds=0.5,
+                 tgt_lifetime_seconds=7 * 3600, timeout=30.0):
+        """
+        Args:
+            api_key: UMLS API key
+            auth_endpoint: URL issuing ticket-granting tickets
+            lookup_endpoint: URL prefix of the LOINC code lookups
+            rate_per_second: Sustained request rate shared by all workers (the
+                UMLS terms of use allow 20 per second)
+            max_workers: Concurrent lookups (and pooled connections)
+            retries: Retries of a failed request before giving up
+            backoff_seconds: Delay before the first retry, doubled at each retry
+            tgt_lifetime_seconds: Age after which the TGT is renewed (UMLS TGTs last 8 hours)
+            timeout: Seconds to wait for a response
+        """
+        self.api_key = api_key
+        self.auth_endpoint = auth_endpoint
+        self.lookup_endpoint = lookup_endpoint
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.tgt_lifetime_seconds = tgt_lifetime_seconds
+        self.timeout = timeout
+        self.limiter = TokenBucket(rate_per_second)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._tgt = None
+        self._tgt_fetched_at = 0.0
+        self._tgt_lock = threading.Lock()
+
+    def _request(self, method, url, **kwargs):
+        """Send a rate-limited request, retrying connection errors, 429 and 5xx answers."""
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except requests.ConnectionError:
+                if attempt == self.retries:
+                    raise
+                response = None
+            if response is not None and response.status_code != 429 and response.status_code < 500:
+                return response
+            if attempt == self.retries:
+                return response
+            delay = self.backoff_seconds * 2 ** attempt
+            retry_after = response.headers.get('Retry-After') if response is not None else None
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            time.sleep(delay)
+
+    def tgt(self, refresh=False):
+        """Current ticket-granting ticket, fetched again once expired or when refresh is set."""
+        with self._tgt_lock:
+            expired = time.monotonic() - self._tgt_fetched_at > self.tgt_lifetime_seconds
+            if refresh or self._tgt is None or expired:
+                response = self._request('POST', self.auth_endpoint, data={'apikey': self.api_key})
+                if response.status_code != 201:
+                    raise Exception(f"Failed to get TGT: {response.status_code}")
+                from bs4 import BeautifulSoup
+                soup = BeautifulSoup(response.text, 'html.parser')
+                self._tgt = soup.form['action']
+                self._tgt_fetched_at = time.monotonic()
+            return self._tgt
+
+    def service_ticket(self):
+        tgt = self.tgt()
+        response = self._request('POST', tgt, data={'service': SERVICE})
+        if response.status_code in (401, 404):
+            # The TGT expired or was revoked server-side
+            response = self._request('POST', self.tgt(refresh=True), data={'service': SERVICE})
+        if response.status_code != 200:
+            raise Exception(f"Failed to get service ticket: {response.status_code}")
+        return response.text
+
+    def long_common_name(self, loinc_code):
+        """Long common name of one code, or None if the API does not know it."""
+        url = f"{self.lookup_endpoint}{loinc_code}"
+        response = self._request('GET', url, params={'ticket': self.service_ticket()})
+        if response.status_code == 401:
+            # Service tickets are single use; a rejected one is not retried as is
+            response = self._request('GET', url, params={'ticket': self.service_ticket()})
+        if response.status_code != 200:
+            print(f"Error: {response.status_code} for code {loinc_code}")
+            return None
+        return response.json().get('result', {}).get('name')
+
+    def fetch_names(self, loinc_codes):
+        """
+        Resolve the given codes concurrently. Returns {code: name}, with None for
+        codes that could not be resolved (a failed lookup never aborts the batch).
+        """
+        def lookup(code):
+            try:
+                return self.long_common_name(code)
+            except Exception as e:
+                print(f"Error: {e} for code {code}")
+                return None
+
+        loinc_codes = list(dict.fromkeys(loinc_codes))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return dict(zip(loinc_codes, executor.map(lookup, loinc_codes)))
+
+    def close(self):
+        self.session.close()
 
 
 def get_tgt(api_key):
@@ -39,32 +342,73 @@ def get_loinc_long_common_name(loinc_code, tgt):
     return data.get('result', {}).get('name')
 
 
-def add_loinc_names_to_csv(input_csv_path, output_csv_path=None):
+def import_loinc_table(loinc_csv_path, cache_path=DEFAULT_CACHE_PATH):
+    """Import the official LOINC table into the name cache file. Returns the number of codes."""
+    cache = LoincNameCache(cache_path)
+    try:
+        return cache.import_table(loinc_csv_path)
+    finally:
+        cache.close()
+
+
+@contextmanager
+def _client_closing(client, owned=True):
+    """Close a client created for one run when the run ends"""
+    try:
+        yield client
+    finally:
+        if owned:
+            client.close()
+
+
+def resolve_loinc_names(loinc_codes, cache, client=None, unresolved=None):
+    """
+    LOINC names of a column of codes, aligned with it (None where unknown).
+
+    Each distinct code is resolved once: from the cache in one batched query,
+    then through the UMLS client for the codes still missing (stored back in
+    the cache). The names are attached to the rows with a single vectorized
+    take over the factorized codes, with no Python call per row.
+
+    unresolved, an optional set shared by the calls of one run, remembers the
+    codes the API could not resolve so they are not fetched again.
     """
-    Add LOINC names to the CSV file by fetching them from the UMLS API.
-    Uses pandas apply for efficient processing.
+    codes, uniques = pd.factorize(loinc_codes)
+    names = cache.get_many(uniques)
+    unresolved = unresolved if unresolved is not None else set()
+
+    # Resolve the missing codes concurrently, only once a code is actually missing
+    missing = [code for code in uniques if str(code) not in names and str(code) not in unresolved]
+    if missing:
+        with _client_closing(client if client is not None else UMLSClient(), client is None) as run_client:
+            fetched = run_client.fetch_names(missing)
+        cache.put_many(fetched)
+        names.update({str(code): name for code, name in fetched.items()})
+        unresolved.update(str(code) for code, name in fetched.items() if name is None)
+
+    # Code -1 (missing LOINC-NUM) picks the trailing None
+    lookup = np.array([names.get(str(code)) for code in uniques] + [None], dtype=object)
+    return pd.Series(lookup[codes], index=loinc_codes.index, name='LOINC-NAME')
+
+
+def add_loinc_names_to_csv(input_csv_path, output_csv_path=None, cache=None, client=None):
+    """
+    Add LOINC names to the CSV file, fetching from the UMLS API only the codes
+    missing from the imported LOINC table and the persistent cache (files with
+    known codes enrich offline). Names are resolved once per distinct code
+    (see resolve_loinc_names).
     
     Args:
         input_csv_path (str): Path to the input CSV file
         output_csv_path (str, optional): Path to save the output CSV file. If None, overwrites the input file.
+        cache (LoincNameCache, optional): Persistent name cache. Defaults to DEFAULT_CACHE_PATH.
+        client (UMLSClient, optional): Client resolving the missing codes. Created on demand.
     """
     # Read the CSV file
     df = pd.read_csv(input_csv_path)
+    cache = cache if cache is not None else LoincNameCache()
     
-    # Get TGT for API authentication
-    tgt = get_tgt(API_KEY)
-    
-    # Define a function to get LOINC name with caching
-    loinc_name_cache = {}
-    def get_loinc_name_with_cache(loinc_num):
-        if loinc_num not in loinc_name_cache:
-            loinc_name = get_loinc_long_common_name(loinc_num, tgt)
-            loinc_name_cache[loinc_num] = loinc_name
-            time.sleep(0.5)  # Rate limiting
-        return loinc_name_cache[loinc_num]
-    
-    # Apply the function to get LOINC names
-    df['LOINC-NAME'] = df['LOINC-NUM'].apply(get_loinc_name_with_cache)
+    df['LOINC-NAME'] = resolve_loinc_names(df['LOINC-NUM'], cache, client)
     
     # Save the updated dataframe
     output_path = output_csv_path if output_csv_path else input_csv_path
@@ -73,13 +417,114 @@ def add_loinc_names_to_csv(input_csv_path, output_csv_path=None):
     return df
 
 
+def _input_signature(path):
+    """Size and modification time of a file, to tell whether a checkpoint still applies"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _write_checkpoint(checkpoint_path, state):
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def stream_loinc_names_to_csv(input_csv_path, output_csv_path=None, cache=None, client=None,
+                              chunksize=100_000, checkpoint_path=None):
+    """
+    Add LOINC names to a CSV file chunk by chunk, so memory use is bounded by the
+    chunk size rather than the file size. Values are copied as read (no type
+    inference), only the LOINC-NAME column is (re)computed.
+
+    One UMLS client serves the whole run (a single TGT), and codes it could not
+    resolve are not fetched again in later chunks.
+
+    After every chunk written, a checkpoint records the input rows done and the
+    output size. If the run is interrupted, calling it again with the same
+    arguments truncates the output to the last complete chunk and resumes from
+    there; a checkpoint is ignored if the input file has changed since.
+
+    Args:
+        input_csv_path (str): Path to the input CSV file
+        output_csv_path (str, optional): Path of the output CSV file. If None, the input
+            file is replaced once the whole file is enriched.
+        cache (LoincNameCache, optional): Persistent name cache. Defaults to DEFAULT_CACHE_PATH.
+        client (UMLSClient, optional): Client resolving the missing codes. Created on demand.
+        chunksize (int): Rows read, resolved and written at a time
+        checkpoint_path (str, optional): Checkpoint file. Defaults to the output path + '.checkpoint'.
+
+    Returns:
+        int: Number of rows written
+    """
+    in_place = output_csv_path is None
+    # In place, the partial output goes to a side file renamed over the input at the end
+    partial_path = f"{input_csv_path}.partial" if in_place else output_csv_path
+    checkpoint_path = checkpoint_path or f"{partial_path}.checkpoint"
+    cache = cache if cache is not None else LoincNameCache()
+
+    signature = _input_signature(input_csv_path)
+    state = {'input': os.path.abspath(input_csv_path), 'signature': signature, 'rows': 0, 'bytes': 0}
+    if os.path.exists(checkpoint_path) and os.path.exists(partial_path):
+        with open(checkpoint_path) as f:
+            saved = json.load(f)
+        if saved['input'] == state['input'] and saved['signature'] == signature:
+            state = saved
+
+    done = state['rows']
+    reader = pd.read_csv(
+        input_csv_path, dtype=str, keep_default_na=False, chunksize=chunksize,
+        # Skip the rows of the chunks already written (row 0 is the header). A
+        # callable, since pandas turns a list-like skiprows into a set of every row
+        skiprows=lambda row: 0 < row <= done,
+    )
+    owned = client is None
+    client = client if client is not None else UMLSClient()
+    unresolved = set()
+    with reader, _client_closing(client, owned), open(partial_path, 'r+b' if done else 'wb') as out:
+        # Drop whatever an interrupted chunk left after the last checkpoint
+        out.truncate(state['bytes'])
+        out.seek(state['bytes'])
+        for chunk in reader:
+            codes = chunk['LOINC-NUM'].mask(chunk['LOINC-NUM'] == '')
+            chunk['LOINC-NAME'] = resolve_loinc_names(codes, cache, client, unresolved)
+            out.write(chunk.to_csv(index=False, header=state['rows'] == 0).encode())
+            out.flush()
+            os.fsync(out.fileno())
+            state['rows'] += len(chunk)
+            state['bytes'] = out.tell()
+            _write_checkpoint(checkpoint_path, state)
+        if state['rows'] == 0:
+            # Header-only input: still write the header
+            columns = pd.read_csv(input_csv_path, nrows=0).columns.tolist()
+            out.write(','.join(dict.fromkeys(columns + ['LOINC-NAME'])).encode() + b'\n')
+
+    if in_place:
+        os.replace(partial_path, input_csv_path)
+    os.remove(checkpoint_path)
+    return state['rows']
+
+
 if __name__ == '__main__':
+    import sys
+
+    # python loinc_name_fetcher.py --import-table Loinc.csv [cache_path]
+    if len(sys.argv) > 2 and sys.argv[1] == '--import-table':
+        count = import_loinc_table(*sys.argv[2:4])
+        print(f"Imported {count} LOINC codes")
+        sys.exit()
+
+    # python loinc_name_fetcher.py --enrich input.csv [output.csv] (rerun to resume)
+    if len(sys.argv) > 2 and sys.argv[1] == '--enrich':
+        count = stream_loinc_names_to_csv(*sys.argv[2:4])
+        print(f"Enriched {count} rows")
+        sys.exit()
+
     # Example usage for single LOINC code
     loinc_codes = ['12181-4']
-    tgt = get_tgt(API_KEY)
+    client = UMLSClient()
 
-    for code in loinc_codes:
-        name = get_loinc_long_common_name(code, tgt)
+    for code, name in client.fetch_names(loinc_codes).items():
         print(f"{code}: {name}")
     
     # Example usage for CSV file
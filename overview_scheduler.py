@@ -0,0 +1,133 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class OverviewSnapshotScheduler:
+    """
+    Periodically precompute the patient overview for "now" (and optional shift starts).
+
+    A snapshot is the list of per-patient overview entries for a single timestamp,
+    and serves requests for that exact minute only, so an overview is never
+    shown for a later time than the data it was computed at. Any other
+    timestamp is left to on-demand computation.
+    """
+
+    def __init__(
+        self,
+        list_patients: Callable[[], Iterable[Tuple[str, str]]],
+        compute_overview: Callable[[str, datetime], Dict],
+        interval_minutes: float = 5,
+        shift_starts: Iterable[str] = (),
+        current_version: Optional[Callable[[], int]] = None,
+    ):
+        """
+        Args:
+            list_patients: Returns (full_name, gender) pairs for the whole census
+            compute_overview: Computes the overview dict of one patient at a datetime
+            interval_minutes: Minutes between two scheduled refreshes
+            shift_starts: Shift start times ("HH:MM") precomputed for the current day
+            current_version: Returns the version of the data the snapshots derive from;
+                snapshots built from an older version are never served
+        """
+        self.list_patients = list_patients
+        self.compute_overview = compute_overview
+        self.interval = timedelta(minutes=interval_minutes)
+        self.shift_starts = [
+            datetime.strptime(shift_start, "%H:%M").time() for shift_start in shift_starts
+        ]
+
+        self.current_version = current_version or (lambda: None)
+
+        self._snapshots: Dict[datetime, List[Dict]] = {}
+        self._snapshots_version = None
+        # Bumped by invalidate(); a refresh spanning an invalidation is discarded
+        self._invalidations = 0
+        self._swap_lock = threading.Lock()
+        self._refresh_requested = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _truncate(dt: datetime) -> datetime:
+        return dt.replace(second=0, microsecond=0)
+
+    def _compute_snapshot(self, dt: datetime) -> List[Dict]:
+        snapshot = []
+        for full_name, gender in self.list_patients():
+            entry = {"full_name": full_name, "gender": gender, "overview": None, "error": None}
+            try:
+                entry["overview"] = self.compute_overview(full_name, dt)
+            except Exception as e:
+                entry["error"] = e
+            snapshot.append(entry)
+        return snapshot
+
+    def refresh(self, now: Optional[datetime] = None) -> bool:
+        """
+        Recompute the snapshots for now and for today's shift starts.
+        Returns False, keeping nothing, if the data changed or invalidate() was
+        called while computing (the snapshots may mix old and new data).
+        """
+        now = self._truncate(now or datetime.now())
+        invalidations = self._invalidations
+        version = self.current_version()
+        timestamps = [now] + [
+            datetime.combine(now.date(), shift_start) for shift_start in self.shift_starts
+        ]
+
+        snapshots = {}
+        for dt in timestamps:
+            if dt not in snapshots:
+                snapshots[dt] = self._compute_snapshot(dt)
+
+        with self._swap_lock:
+            if invalidations != self._invalidations or version != self.current_version():
+                return False
+            # Swap the references so lookups never see a half-built table
+            self._snapshots = snapshots
+            self._snapshots_version = version
+        return True
+
+    def invalidate(self):
+        """Drop the current snapshots and ask the scheduler thread for a refresh (after data edits)."""
+        with self._swap_lock:
+            self._invalidations += 1
+            self._snapshots = {}
+        self._refresh_requested.set()
+
+    def lookup(self, dt: datetime) -> Optional[List[Dict]]:
+        """Return the precomputed snapshot for dt, or None if it must be computed on demand."""
+        snapshots = self._snapshots
+        if self._snapshots_version != self.current_version():
+            return None
+        return snapshots.get(self._truncate(dt))
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._refresh_requested.clear()
+            try:
+                if not self.refresh():
+                    # The data changed meanwhile: recompute without waiting a full interval
+                    self._refresh_requested.set()
+            except Exception as e:
+                print(f"Warning: overview snapshot refresh failed: {e}")
+            self._refresh_requested.wait(self.interval.total_seconds())
+
+    def start(self):
+        """Start refreshing the snapshots in a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="overview-snapshot-scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop the scheduler thread."""
+        self._stopped.set()
+        self._refresh_requested.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,111 @@
+from typing import Dict, Iterator, List, NamedTuple, Optional
+import pandas as pd
+
+
+class PatientEntry(NamedTuple):
+    """One patient of the directory"""
+
+    patient_id: int
+    first_name: str
+    last_name: str
+    gender: Optional[str]
+    first_measurement: Optional[pd.Timestamp]
+    last_measurement: Optional[pd.Timestamp]
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.first_name} {self.last_name}"
+
+
+class PatientDirectory:
+    """
+    Patients of the records store keyed by full name, with their gender and
+    measurement span.
+
+    Lookups are dictionary reads. The directory is immutable: with_records()
+    folds a batch of new rows into a new directory, touching only the patients
+    in the batch, so the owner can swap it in the same way it swaps its
+    records snapshot.
+    """
+
+    def __init__(self, entries: Dict[str, PatientEntry] = None):
+        self._entries = dict(entries or {})
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "PatientDirectory":
+        """Build the directory of every patient in a records frame."""
+        return cls().with_records(df)
+
+    def with_records(self, df: pd.DataFrame) -> "PatientDirectory":
+        """Return a directory that also covers the given records (e.g. rows just appended)."""
+        if df.empty:
+            return self
+        columns = ["first_name", "last_name", "measurement_datetime"]
+        has_gender = "Gender" in df.columns
+        if has_gender:
+            columns.append("Gender")
+        rows = df[columns]
+
+        grouped = rows.groupby(["first_name", "last_name"], sort=False)
+        spans = grouped["measurement_datetime"].agg(["min", "max"])
+        # First gender given for the patient in this batch (missing values skipped)
+        genders = grouped["Gender"].first() if has_gender else None
+
+        entries = dict(self._entries)
+        for (first_name, last_name), span in spans.iterrows():
+            full_name = f"{first_name} {last_name}"
+            gender = genders.get((first_name, last_name)) if has_gender else None
+            if isinstance(gender, str):
+                gender = gender.lower()
+            else:
+                gender = None
+
+            current = entries.get(full_name)
+            if current is None:
+                entries[full_name] = PatientEntry(
+                    len(entries), first_name, last_name, gender, span["min"], span["max"]
+                )
+            else:
+                entries[full_name] = current._replace(
+                    gender=current.gender or gender,
+                    first_measurement=_earliest(current.first_measurement, span["min"]),
+                    last_measurement=_latest(current.last_measurement, span["max"]),
+                )
+        return PatientDirectory(entries)
+
+    def get(self, full_name: str) -> Optional[PatientEntry]:
+        return self._entries.get(full_name)
+
+    def gender(self, full_name: str) -> Optional[str]:
+        """Lower-case gender of a patient, or None if unknown."""
+        entry = self._entries.get(full_name)
+        return entry.gender if entry else None
+
+    def options(self) -> List[dict]:
+        """Dropdown options, one per patient in order of first appearance."""
+        return [{"label": name, "value": name} for name in self._entries]
+
+    def __contains__(self, full_name) -> bool:
+        return full_name in self._entries
+
+    def __iter__(self) -> Iterator[PatientEntry]:
+        return iter(self._entries.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _earliest(a, b):
+    if pd.isna(a):
+        return b
+    if pd.isna(b):
+        return a
+    return min(a, b)
+
+
+def _latest(a, b):
+    if pd.isna(a):
+        return b
+    if pd.isna(b):
+        return a
+    return max(a, b)
@@ -3,7 +3,7 @@ import numpy as np
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 from models import WBCStateRange, HemoglobinStateRange
-from knowledge_db_handler import Gender, Grade
+from knowledge_db_handler import Gender, Grade, HematologicalTable
 
 
 def process_hematological_data(patient_tests: pd.DataFrame, validity: pd.DataFrame):
@@ -14,36 +14,42 @@ def process_hematological_data(patient_tests: pd.DataFrame, validity: pd.DataFra
 
     for _, row in hb_tests.iterrows():
         hb_data.append(HemoglobinStateRange(
-            datetime.strptime(row['measurement_datetime'], '%Y-%m-%d %H:%M:%S'),
+            pd.Timestamp(row['measurement_datetime']).to_pydatetime(),
             float(row['Value']),
             float(validity[validity['test_name'] == 'hemoglobin'].iloc[0]['good-before']),
             float(validity[validity['test_name'] == 'hemoglobin'].iloc[0]['good-after'])
         ))
     for _, row in wbc_tests.iterrows():
         wbc_data.append(WBCStateRange(
-            datetime.strptime(row['measurement_datetime'], '%Y-%m-%d %H:%M:%S'),
+            pd.Timestamp(row['measurement_datetime']).to_pydatetime(),
             float(row['Value']),
             float(validity[validity['test_name'] == 'WBC'].iloc[0]['good-before']),
             float(validity[validity['test_name'] == 'WBC'].iloc[0]['good-after'])
         ))
     return wbc_data, hb_data
 
-def find_overlapping_states(wbc_ranges: List[WBCStateRange], hb_ranges: List[HemoglobinStateRange], table: pd.DataFrame):
-    raw_intervals = []
+def find_overlapping_states(wbc_ranges: List[WBCStateRange], hb_ranges: List[HemoglobinStateRange], table):
+    if isinstance(table, pd.DataFrame):
+        table = HematologicalTable.from_frame(table)
 
+    overlaps = []
     for wbc in wbc_ranges:
         for hb in hb_ranges:
             overlap_start = max(wbc.start, hb.start)
             overlap_end = min(wbc.end, hb.end)
             if overlap_start < overlap_end:
-                wbc_interval = table.index.get_indexer([wbc.value])[0]
-                hb_interval = table.columns.get_indexer([hb.value])[0]
-                if wbc_interval == -1 or hb_interval == -1:
-                    continue
-                state = table.iloc[wbc_interval, hb_interval]
-                raw_intervals.append((overlap_start, overlap_end, state))
-    
-    return raw_intervals
+                overlaps.append((overlap_start, overlap_end, wbc.value, hb.value))
+
+    if not overlaps:
+        return []
+
+    # Classify every overlapping pair in one lookup
+    states = table.classify([o[2] for o in overlaps], [o[3] for o in overlaps])
+    return [
+        (overlap_start, overlap_end, state)
+        for (overlap_start, overlap_end, _, _), state in zip(overlaps, states)
+        if state is not None
+    ]
 
 def resolve_conflicts(raw_intervals):
     if not raw_intervals:
@@ -88,7 +94,7 @@ def fill_gaps(intervals):
 def generate_patient_state_timeline(
     wbc_ranges: List[WBCStateRange],
     hb_ranges: List[HemoglobinStateRange],
-    table: pd.DataFrame
+    table
 ):
     raw = find_overlapping_states(wbc_ranges, hb_ranges, table)
     resolved = resolve_conflicts(raw)
@@ -163,42 +169,44 @@ def calculate_grade(project_db: pd.DataFrame, knowledge_db, full_name: str, dt:
             values[test] = test_df.loc[idx, 'Value']
         else:
             values[test] = None
-    # Now, for each test, determine the grade from systemic_table
-    grade_idx = -1
-    for i, test in enumerate(['fever', 'chills', 'skin-look', 'allergic state']):
+    # Now, for each test, determine the grade from the compiled systemic rules
+    grade_value = 0
+    for test in ['fever', 'chills', 'skin-look', 'allergic state']:
         val = values[test]
         if val is None:
             continue
-        # Go left to right in systemic_table row for this test
-        row = knowledge_db.systemic_table.loc[test]
-        for j, col in enumerate(knowledge_db.systemic_table.columns):
-            if str(row[col]) == str(val):
-                grade_idx = max(grade_idx, j)
-                break
+        grade_value = max(grade_value, int(knowledge_db.grade_systemic_values(test, [val])[0]))
     # Return the grade
-    if grade_idx == -1:
+    if grade_value == 0:
         return None
-    return Grade(grade_idx + 1)
+    return Grade(grade_value)
 
-def get_patient_gender(project_db: pd.DataFrame, full_name: str) -> Optional[str]:
+def get_patient_gender(project_db: pd.DataFrame, full_name: str, directory=None) -> Optional[str]:
+    """
+    Lower-case gender of a patient, from the records' 'Gender' column. With a
+    PatientDirectory this is a dictionary lookup; otherwise the records are scanned.
+    """
+    if directory is not None:
+        return directory.gender(full_name)
     first_name, last_name = full_name.split(' ', 1)
     row = project_db[(project_db['first_name'] == first_name) & (project_db['last_name'] == last_name)]
-    if not row.empty and 'gender' in row.columns:
-        return row.iloc[0]['gender'].lower()
+    if not row.empty and 'Gender' in row.columns and isinstance(row.iloc[0]['Gender'], str):
+        return row.iloc[0]['Gender'].lower()
     return None
 
-def calculate_hemoglobin_states(project_db: pd.DataFrame, knowledge_db, selected_patient: str) -> List[Dict[str, Any]]:
+def calculate_hemoglobin_states(project_db: pd.DataFrame, knowledge_db, selected_patient: str, directory=None) -> List[Dict[str, Any]]:
     """
     Calculate hemoglobin states for a patient.
     Args:
         project_db (pd.DataFrame): The project database
         knowledge_db: The knowledge database handler
         selected_patient (str): Patient's full name
+        directory (PatientDirectory, optional): Patient directory for O(1) gender lookups
     Returns:
         List[Dict[str, Any]]: List of segments with start, end, and state
     """
     first_name, last_name = selected_patient.split(' ')
-    gender_str = get_patient_gender(project_db, selected_patient)
+    gender_str = get_patient_gender(project_db, selected_patient, directory)
     gender = Gender.FEMALE if gender_str == 'female' else Gender.MALE
     
     # Get patient's hemoglobin tests
@@ -242,18 +250,19 @@ def calculate_hemoglobin_states(project_db: pd.DataFrame, knowledge_db, selected
     
     return segments
 
-def calculate_hematological_states(project_db: pd.DataFrame, knowledge_db, selected_patient: str) -> List[Dict[str, Any]]:
+def calculate_hematological_states(project_db: pd.DataFrame, knowledge_db, selected_patient: str, directory=None) -> List[Dict[str, Any]]:
     """
     Calculate hematological states for a patient.
     Args:
         project_db (pd.DataFrame): The project database
         knowledge_db: The knowledge database handler
         selected_patient (str): Patient's full name
+        directory (PatientDirectory, optional): Patient directory for O(1) gender lookups
     Returns:
         List[Dict[str, Any]]: List of segments with start, end, and state
     """
     first_name, last_name = selected_patient.split(' ')
-    gender_str = get_patient_gender(project_db, selected_patient)
+    gender_str = get_patient_gender(project_db, selected_patient, directory)
     gender = Gender.FEMALE if gender_str == 'female' else Gender.MALE
     
     # Get patient's hemoglobin and WBC tests
@@ -278,7 +287,7 @@ def calculate_hematological_states(project_db: pd.DataFrame, knowledge_db, selec
     state_timeline = generate_patient_state_timeline(
         wbc_data,
         hb_data,
-        knowledge_db.get_hematological_table(gender)
+        knowledge_db.get_hematological_classifier(gender)
     )
     
     # Create time points
@@ -298,7 +307,7 @@ def calculate_hematological_states(project_db: pd.DataFrame, knowledge_db, selec
     
     return segments
 
-def calculate_recommendation(project_db: pd.DataFrame, knowledge_db, full_name: str, dt: datetime) -> Optional[str]:
+def calculate_recommendation(project_db: pd.DataFrame, knowledge_db, full_name: str, dt: datetime, directory=None) -> Optional[str]:
     """
     Calculate recommendation for a patient at a given datetime based on their states and grade.
     Args:
@@ -306,6 +315,7 @@ def calculate_recommendation(project_db: pd.DataFrame, knowledge_db, full_name:
         knowledge_db: The knowledge database handler
         full_name (str): Patient's full name
         dt (datetime): The datetime to check
+        directory (PatientDirectory, optional): Patient directory for O(1) gender lookups
     Returns:
         Optional[str]: The recommendation string if found, None otherwise
     """
@@ -314,12 +324,12 @@ def calculate_recommendation(project_db: pd.DataFrame, knowledge_db, full_name:
     if grade is None:
         return None
     
-    gender_str = get_patient_gender(project_db, full_name)
+    gender_str = get_patient_gender(project_db, full_name, directory)
     gender = Gender.FEMALE if gender_str == 'female' else Gender.MALE
     
     # Get hemoglobin and hematological states
-    hb_segments = calculate_hemoglobin_states(project_db, knowledge_db, full_name)
-    hema_segments = calculate_hematological_states(project_db, knowledge_db, full_name)
+    hb_segments = calculate_hemoglobin_states(project_db, knowledge_db, full_name, directory)
+    hema_segments = calculate_hematological_states(project_db, knowledge_db, full_name, directory)
     
     # Find the relevant hemoglobin state for the given datetime
     hb_state = None
@@ -339,17 +349,5 @@ def calculate_recommendation(project_db: pd.DataFrame, knowledge_db, full_name:
     if hb_state is None or hema_state is None:
         return None
     
-    # Get recommendations table for the patient's gender (using FEMALE for simplicity)
-    recommendations = knowledge_db.recommendations[gender]
-    
-    # Find matching recommendation
-    matching_rec = recommendations[
-        (recommendations['Hemoglobinstate'] == hb_state) &
-        (recommendations['Hematologicalstate'] == hema_state) &
-        (recommendations['Systematic Toxicity'] == f'GRADE {grade.value}')
-    ]
-    
-    if matching_rec.empty:
-        return None
-    
-    return matching_rec.iloc[0]['Recommendation']
+    # Resolve the recommendation from the compiled lookup table
+    return knowledge_db.get_recommendation(gender, hb_state, hema_state, grade)
@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class SharedVersionStore:
+    """
+    Version counters shared by every worker process through a local SQLite file.
+
+    A writer takes the cross-process write lock, brings its in-memory copy up to
+    date, persists its change and bumps the version of the resource it changed.
+    Readers compare the stored version with the one their copy was loaded from
+    and reload when they differ, so no worker serves data older than the last
+    committed edit.
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        """
+        Args:
+            path: SQLite file shared by the workers (created if missing)
+            timeout: Seconds to wait for another process holding the write lock
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connection of the calling thread, reopened after a fork"""
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            # WAL lets readers check versions while a writer holds the lock
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = pid
+        return self._local.conn
+
+    def get_version(self, name: str) -> int:
+        """Committed version of a resource (0 if it was never written)."""
+        row = self._connection().execute(
+            "SELECT version FROM versions WHERE name = ?", (name,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    @contextmanager
+    def write_lock(self):
+        """Hold the cross-process write lock; version bumps commit when the block exits."""
+        conn = self._connection()
+        if conn.in_transaction:
+            # Already held by this thread
+            yield
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def bump(self, name: str) -> int:
+        """Increment the version of a resource and return the new value."""
+        with self.write_lock():
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO versions (name, version) VALUES (?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+                (name,),
+            )
+            return conn.execute(
+                "SELECT version FROM versions WHERE name = ?", (name,)
+            ).fetchone()[0]
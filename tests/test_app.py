@@ -206,3 +206,90 @@ def test_delete_validation(test_input, expected):
         assert not isinstance(result, str) or "Please fill in all required fields" not in result
     else:
         assert isinstance(result, str) and "Please fill in all required fields" in result
+
+
+def test_overview_streams_progress():
+    """Test that the background overview callback reports progress in chunks"""
+    from app import update_overview_cards
+
+    progress_updates = []
+
+    #call the background callback with a recording set_progress
+    result = update_overview_cards(progress_updates.append, '2025-05-18', '14:00')
+
+    #the final grid and the last progress update should cover every patient
+    assert progress_updates
+    done, total, partial = progress_updates[-1]
+    assert done == total
+    assert len(partial.children) == total
+    assert len(result.children) == total
+
+
+def test_overview_requires_date_and_time():
+    """Test that the overview asks for both date and time before computing"""
+    from app import update_overview_cards
+
+    result = update_overview_cards(lambda progress: None, None, '10:00')
+    assert "Please select both date and time" in result.children
+
+
+#import of app.py must stay cheap: no data loading, no pandas/plotly
+STARTUP_BUDGET_SECONDS = 2.0
+
+
+def test_app_import_defers_data_loading():
+    """Test that importing the app loads no data and stays within the startup budget"""
+    import subprocess
+    import sys
+
+    script = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import app\n"
+        "elapsed = time.perf_counter() - start\n"
+        "loaded = [m for m in ('pandas', 'plotly.graph_objects', 'plotly.express') if m in sys.modules]\n"
+        "data = [app._shared_store, app._db_handler, app._knowledge_db]\n"
+        "print(elapsed, loaded, data)\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    ).stdout.split(" ", 1)
+
+    elapsed = float(output[0])
+    assert output[1].strip() == "[] [None, None, None]"
+    assert elapsed < STARTUP_BUDGET_SECONDS
+
+
+def test_background_services_start_once_on_first_request(monkeypatch):
+    """Test that serving a request starts the watcher and the overview precompute once"""
+    import app as app_module
+    started = []
+
+    class FakeKnowledgeDB:
+        def start_watching(self):
+            started.append('watcher')
+
+    monkeypatch.setattr(app_module, '_services_started', False)
+    monkeypatch.setattr(app_module, 'get_knowledge_db', lambda: FakeKnowledgeDB())
+    monkeypatch.setattr(app_module.overview_scheduler, 'start', lambda: started.append('scheduler'))
+
+    client = app_module.create_app().server.test_client()
+    client.get('/_dash-layout')
+    client.get('/_dash-dependencies')
+    assert started == ['watcher', 'scheduler']
+
+
+def test_overview_defaults_to_the_current_minute():
+    """Test that the overview opens at the minute its precomputed snapshot covers"""
+    from app import serve_layout
+
+    before = datetime.now().replace(second=0, microsecond=0)
+    layout = serve_layout()
+    after = datetime.now()
+
+    components = {component.id: component for component in layout._traverse() if getattr(component, 'id', None)}
+    opened = datetime.strptime(
+        f"{components['overview-date-picker'].date} {components['overview-time-picker'].value}",
+        "%Y-%m-%d %H:%M",
+    )
+    assert before <= opened <= after
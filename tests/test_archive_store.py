@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+from archive_store import build_archive, ArchiveStore
+from db_handler import DBHandler
+from knowledge_db_handler import KnowledgeDataHandler
+from patient_state_calculator import calculate_hemoglobin_states, calculate_grade
+
+PROJECT_DB = 'project_db_with_names.csv'
+
+
+@pytest.fixture(scope='module')
+def archive(tmp_path_factory):
+    """Fixture: archive of the project database, built in small chunks"""
+    archive_dir = tmp_path_factory.mktemp('archive')
+    assert build_archive(PROJECT_DB, str(archive_dir), chunksize=16) == len(pd.read_csv(PROJECT_DB))
+    return ArchiveStore(str(archive_dir))
+
+
+def test_columns_are_memory_mapped(archive):
+    """Test that the typed columns are mapped from disk rather than loaded"""
+    assert isinstance(archive._columns['measurement_datetime'], np.memmap)
+    assert archive._columns['measurement_datetime'].dtype == np.int64
+    assert archive._columns['LOINC-NUM'].dtype == np.int32
+    assert archive._columns['value'].dtype == np.float64
+
+
+@pytest.mark.parametrize('loinc', ['30313-1', '6690-2', '39106-0', '00000-0'])
+def test_retrieval_matches_csv_store(archive, loinc):
+    """Test that every patient's records come back as from the CSV-backed handler"""
+    db = DBHandler(PROJECT_DB)
+    for full_name in archive.patients:
+        first_name, last_name = full_name.split(' ')
+        expected = db.retrieve_records(first_name, last_name, loinc)
+        result = archive.retrieve_records(first_name, last_name, loinc)
+        assert len(result) == len(expected)
+        assert sorted(result['measurement_datetime']) == sorted(expected['measurement_datetime'])
+
+
+def test_values_keep_their_text(archive):
+    """Test that values decode as written in the source file, numeric or not"""
+    frame = archive.patient_frame('John Doe')
+    #rows of a patient keep their file order
+    assert frame.iloc[0]['LOINC-NUM'] == '30313-1' and frame.iloc[0]['Value'] == '10.0'
+    assert frame.iloc[1]['LOINC-NUM'] == '6690-2' and frame.iloc[1]['Value'] == '5000'
+    assert frame.iloc[3]['LOINC-NUM'] == '75275-8' and frame.iloc[3]['Value'] == 'Shaking'
+    assert archive._columns['value'][1] == 5000.0
+    assert archive.patient_frame('Nobody Here').empty
+
+
+def test_calculator_runs_on_patient_slices(archive):
+    """Test that the state calculators give the same answers on an archived patient"""
+    knowledge_db = KnowledgeDataHandler()
+    project_db = pd.read_csv(PROJECT_DB)
+    frame = archive.patient_frame('John Doe')
+
+    assert calculate_hemoglobin_states(frame, knowledge_db, 'John Doe') == \
+        calculate_hemoglobin_states(project_db, knowledge_db, 'John Doe')
+    dt = pd.Timestamp('2025-05-18 15:00:00').to_pydatetime()
+    assert calculate_grade(frame, knowledge_db, 'John Doe', dt) == \
+        calculate_grade(project_db, knowledge_db, 'John Doe', dt)
+
+
+def test_retrieval_frames_equal_csv_store(archive):
+    """Test that retrievals return the same rows and value strings as DBHandler"""
+    db = DBHandler(PROJECT_DB)
+    columns = ['first_name', 'last_name', 'LOINC-NUM', 'Value', 'Unit', 'measurement_datetime', 'update_datetime']
+    for args in [('John', 'Doe', '6690-2'), ('John', 'Doe', '30313-1', '2025-05-18')]:
+        expected = db.retrieve_records(*args)[columns].reset_index(drop=True)
+        result = archive.retrieve_records(*args)[columns].reset_index(drop=True)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_build_groups_patients_one_chunk_at_a_time(tmp_path, monkeypatch):
+    """Test that patients are grouped in file order without sorting more than a chunk of rows"""
+    argsort = np.argsort
+    sorted_sizes = []
+
+    def recording_argsort(values, *args, **kwargs):
+        sorted_sizes.append(len(values))
+        return argsort(values, *args, **kwargs)
+
+    monkeypatch.setattr(np, 'argsort', recording_argsort)
+    build_archive(PROJECT_DB, str(tmp_path), chunksize=16)
+    assert sorted_sizes and max(sorted_sizes) <= 16
+
+    archive = ArchiveStore(str(tmp_path))
+    source = pd.read_csv(PROJECT_DB, dtype=str)
+    for full_name in archive.patients:
+        first_name, last_name = full_name.split(' ')
+        expected = source[(source['first_name'] == first_name) & (source['last_name'] == last_name)]
+        frame = archive.patient_frame(full_name)
+        assert list(frame['Value'].fillna('')) == list(expected['Value'].fillna(''))
+        assert list(frame['LOINC-NUM']) == list(expected['LOINC-NUM'])
@@ -0,0 +1,56 @@
+import json
+from benchmarks import harness
+from benchmarks.bench_db_handler import main as bench_db_handler
+from benchmarks.bench_patient_state import main as bench_patient_state
+from benchmarks.synthetic import generate_patient_history, generate_records, shape_for_rows
+
+
+def test_generate_records_shape():
+    """Test that the generator yields patients x codes x measurements x revisions ordered versions"""
+    df = generate_records(patients=3, loinc_codes=8, measurements=4, revisions=2)
+    assert len(df) == 3 * 8 * 4 * 2
+    assert df["first_name"].nunique() == 3
+    assert df["LOINC-NUM"].nunique() == 8
+    assert (df.groupby(["first_name", "LOINC-NUM"])["measurement_datetime"].nunique() == 4).all()
+    versions = df.groupby(["first_name", "LOINC-NUM", "measurement_datetime"])["update_datetime"]
+    assert (versions.nunique() == 2).all()
+    assert (df["update_datetime"] > df["measurement_datetime"]).all()
+
+    assert shape_for_rows(1000, loinc_codes=6, measurements=10)["patients"] == 17
+
+
+def test_db_handler_benchmark_writes_comparable_results(tmp_path):
+    """Test a minimal benchmark run: JSON results per operation, comparable with a previous run"""
+    output = tmp_path / "run.json"
+    args = ["--sizes", "200", "--samples", "3", "--write-samples", "2", "--output", str(output)]
+    results = bench_db_handler(args)
+
+    stored = json.loads(output.read_text())
+    assert stored["benchmark"] == "db_handler"
+    assert [result["operation"] for result in stored["results"]] == [
+        "load", "retrieve_records", "retrieve_records_at", "update_record", "delete_record"
+    ]
+    assert all(result["p50_ms"] > 0 for result in stored["results"])
+    assert len(harness.compare(str(output), results)) == 5
+
+
+def test_generate_patient_history_density():
+    """Test that every test is measured at the requested density over the history"""
+    history = generate_patient_history(days=3, measurements_per_day=4)
+    assert len(history) == 6 * 3 * 4
+    counts = history.groupby("LOINC-NUM")["measurement_datetime"].nunique()
+    assert (counts == 12).all()
+    assert history["measurement_datetime"].is_monotonic_increasing
+
+
+def test_patient_state_benchmark_reports_every_stage(tmp_path):
+    """Test a minimal pipeline benchmark run: time and peak memory of every stage"""
+    output = tmp_path / "run.json"
+    bench_patient_state(["--days", "1", "--per-day", "4", "--repeat", "1", "--output", str(output)])
+
+    stored = json.loads(output.read_text())
+    assert [result["stage"] for result in stored["results"]] == [
+        "process_hematological_data", "find_overlapping_states", "resolve_conflicts",
+        "fill_gaps", "calculate_grade", "calculate_recommendation",
+    ]
+    assert all(result["peak_memory_mb"] > 0 for result in stored["results"])
@@ -1 +1,111 @@
- 
\ No newline at end of file
+import shutil
+import pytest
+import pandas as pd
+from datetime import datetime
+from knowledge_db_handler import KnowledgeDataHandler, Gender, Grade
+from patient_state_calculator import calculate_recommendation
+
+
+@pytest.fixture
+def knowledge_db():
+    """Fixture: knowledge handler loaded from the repository tables"""
+    return KnowledgeDataHandler()
+
+
+def test_get_recommendation(knowledge_db):
+    """Test the compiled (gender, hb state, hematological state, grade) lookup"""
+    recommendation = knowledge_db.get_recommendation(
+        Gender.MALE, 'Moderate Anemia', 'Anemia', Grade.GRADE_2
+    )
+    assert recommendation == 'Measure BP every 3 days. Give aspirin 5g twice a week'
+
+    #plain integer grades resolve the same way
+    assert knowledge_db.get_recommendation(
+        Gender.MALE, 'Moderate Anemia', 'Anemia', 2
+    ) == recommendation
+
+    #unknown combinations have no recommendation
+    assert knowledge_db.get_recommendation(
+        Gender.MALE, 'Moderate Anemia', 'Anemia', Grade.GRADE_4
+    ) is None
+
+
+def test_lookup_recommendations_vectorized(knowledge_db):
+    """Test that the vectorized lookup matches the scalar one row by row"""
+    hb_states = ['Severe Anemia', 'Mild Anemia', 'Severe Anemia']
+    hema_states = ['Pancytopenia', 'Suspected Leukemia', 'Anemia']
+    grades = [Grade.GRADE_1, 3, 1]
+
+    result = knowledge_db.lookup_recommendations(Gender.FEMALE, hb_states, hema_states, grades)
+
+    assert len(result) == 3
+    for i in range(3):
+        expected = knowledge_db.get_recommendation(
+            Gender.FEMALE, hb_states[i], hema_states[i], grades[i]
+        )
+        if expected is None:
+            assert pd.isna(result[i])
+        else:
+            assert result[i] == expected
+
+
+def test_lookup_rebuilt_on_save(tmp_path):
+    """Test that the compiled lookup follows edits once the table is saved"""
+    #work on a copy of the knowledge tables to avoid touching the repository csv files
+    for name in ['systemic_table.csv', 'test_validity_table.csv', 'hemoglobin_male.csv',
+                 'hemoglobin_female.csv', 'recommendations_male.csv', 'recommendations_female.csv']:
+        shutil.copy(name, tmp_path / name)
+    knowledge_db = KnowledgeDataHandler(data_dir=str(tmp_path))
+
+    table = knowledge_db.get_recommendations(Gender.MALE).copy()
+    table.loc[0, 'Recommendation'] = 'Call the attending physician'
+    knowledge_db.recommendations[Gender.MALE] = table
+    success, _ = knowledge_db.save_all_data()
+
+    assert success
+    assert knowledge_db.get_recommendation(
+        Gender.MALE, 'Severe Anemia', 'Pancytopenia', Grade.GRADE_1
+    ) == 'Call the attending physician'
+
+
+def test_calculate_recommendation():
+    """Test the end-to-end recommendation of a patient at a given datetime"""
+    knowledge_db = KnowledgeDataHandler()
+    project_db = pd.DataFrame([
+        {'first_name': 'John', 'last_name': 'Doe', 'LOINC-NUM': '30313-1', 'Value': '10.0',
+         'measurement_datetime': '2025-05-18 14:00:00', 'Gender': 'male'},
+        {'first_name': 'John', 'last_name': 'Doe', 'LOINC-NUM': '6690-2', 'Value': '5000',
+         'measurement_datetime': '2025-05-18 14:00:00', 'Gender': 'male'},
+        {'first_name': 'John', 'last_name': 'Doe', 'LOINC-NUM': '75275-8', 'Value': 'Shaking',
+         'measurement_datetime': '2025-05-18 14:00:00', 'Gender': 'male'},
+    ])
+
+    recommendation = calculate_recommendation(
+        project_db, knowledge_db, 'John Doe', datetime(2025, 5, 18, 14, 0)
+    )
+
+    #hb 10.0 (male) is moderate anemia, wbc 5000 with it is anemia, shaking chills is grade 2
+    assert recommendation == 'Measure BP every 3 days. Give aspirin 5g twice a week'
+
+
+@pytest.mark.parametrize("use_directory", [False, True])
+def test_female_patient_is_graded_with_female_tables(knowledge_db, use_directory):
+    """Test that a female patient's states and recommendation come from the female tables"""
+    from db_handler import DBHandler
+    from patient_state_calculator import calculate_hemoglobin_states, calculate_hematological_states
+
+    db = DBHandler('project_db.csv')
+    directory = db.directory if use_directory else None
+
+    hb_states = calculate_hemoglobin_states(db.df, knowledge_db, 'Brittany Jackson', directory)
+    hema_states = calculate_hematological_states(db.df, knowledge_db, 'Brittany Jackson', directory)
+    #hb 8.5 is moderate anemia in the female table (severe in the male one)
+    assert [segment['state'] for segment in hb_states] == ['Severe Anemia', 'Moderate Anemia']
+    assert [segment['state'] for segment in hema_states] == ['Pancytopenia', 'Anemia']
+
+    recommendation = calculate_recommendation(
+        db.df, knowledge_db, 'Brittany Jackson', datetime(2025, 5, 18, 20, 30), directory
+    )
+    assert recommendation == (
+        'Measure BP every 3 days and Give Celectone 2g twice a day for two days drug treatment'
+    )
@@ -1,7 +1,7 @@
 import pytest
 import pandas as pd
-from datetime import datetime
-from db_handler import DBHandler
+from datetime import datetime, timezone
+from db_handler import DBHandler, RecordQuery, TimeFilter, parse_time_filter, _time_mask
 import os
 
 @pytest.fixture
@@ -159,3 +159,365 @@ def test_delete_record(temp_db):
     assert not success
     #assert that the result message indicates no matching record found
     assert "No matching record found" in result
+
+
+@pytest.fixture
+def lab_db(tmp_path):
+    """Fixture: DBHandler over a CSV of hemoglobin measurements with string LOINC codes"""
+    db_path = tmp_path / "lab_db.csv"
+    pd.DataFrame({
+        'first_name': ['John'] * 3,
+        'last_name': ['Doe'] * 3,
+        'LOINC-NUM': ['30313-1'] * 3,
+        'Value': ['12.5', '12.1', '11.8'],
+        'Unit': ['g/dL'] * 3,
+        'measurement_datetime': ['2024-01-01 10:00:00', '2024-01-02 10:00:00', '2024-01-03 10:00:00'],
+        'update_datetime': ['2024-01-01 10:00:00', '2024-01-02 10:00:00', '2024-01-03 10:00:00'],
+    }).to_csv(db_path, index=False)
+    return DBHandler(str(db_path))
+
+
+def test_concurrent_reads_during_updates(lab_db):
+    """Test that readers running alongside a writer always see complete snapshots"""
+    import threading
+
+    errors = []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            try:
+                records = lab_db.retrieve_records('John', 'Doe', '30313-1')
+                #every snapshot holds the 3 originals plus whole appended rows
+                assert len(records) >= 3
+                assert records['update_datetime'].notna().all()
+            except Exception as e:
+                errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    writers = [
+        threading.Thread(target=lab_db.update_record, args=(
+            'John', 'Doe', '30313-1', str(10 + i), f'2024-02-{i + 1:02d} 10:00:00', '2024-01-01 10:00:00'
+        ))
+        for i in range(10)
+    ]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert not errors
+    #no edit was lost between concurrent writers
+    assert len(lab_db.df) == 13
+    assert len(pd.read_csv(lab_db.csv_path)) == 13
+
+
+def test_failed_save_keeps_previous_snapshot(lab_db, monkeypatch):
+    """Test that an edit whose CSV write fails is not published"""
+    before = lab_db.df
+    version = lab_db.version
+
+    def fail(*args):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(os, 'replace', fail)
+    success, message, _ = lab_db.update_record(
+        'John', 'Doe', '30313-1', '9.9', '2024-02-01 10:00:00', '2024-01-01 10:00:00'
+    )
+    assert not success and 'disk full' in message
+    assert lab_db.df is before
+    assert lab_db.version == version
+    assert not [f for f in os.listdir(os.path.dirname(lab_db.csv_path)) if f.endswith('.tmp')]
+
+
+def test_bulk_update_persists_once(lab_db, monkeypatch):
+    """Test that a batch of updates is matched in one pass and written with one save"""
+    writes = []
+    real_replace = os.replace
+    monkeypatch.setattr(os, 'replace', lambda *args: writes.append(args) or real_replace(*args))
+
+    outcomes = lab_db.bulk_update([
+        {'first_name': 'John', 'last_name': 'Doe', 'loinc_num': '30313-1', 'value': '13.0',
+         'update_datetime': '2024-02-01 10:00:00', 'measurement_datetime': '2024-01-01 10:00:00'},
+        #date only: matches the measurement of that day
+        {'first_name': 'John', 'last_name': 'Doe', 'loinc_num': '30313-1', 'value': '12.9',
+         'update_datetime': '2024-02-01 10:00:00', 'measurement_datetime': '2024-01-03'},
+        {'first_name': 'Jane', 'last_name': 'Roe', 'loinc_num': '30313-1', 'value': '11.0',
+         'update_datetime': '2024-02-01 10:00:00', 'measurement_datetime': '2024-01-01 10:00:00'},
+        {'first_name': 'John', 'last_name': 'Doe', 'loinc_num': '30313-1', 'value': '11.0',
+         'update_datetime': 'not a date', 'measurement_datetime': '2024-01-01 10:00:00'},
+    ])
+
+    assert [success for success, _ in outcomes] == [True, True, False, False]
+    assert outcomes[2][1] == "No matching record found"
+    assert len(writes) == 1
+
+    saved = pd.read_csv(lab_db.csv_path, dtype={'Value': str})
+    assert len(saved) == 5
+    assert list(saved['Value'].tail(2)) == ['13.0', '12.9']
+    assert list(saved['measurement_datetime'].tail(2)) == ['2024-01-01 10:00:00', '2024-01-03 10:00:00']
+
+
+def test_bulk_update_targets_latest_version(lab_db):
+    """Test that each update copies the most recent version of its record"""
+    lab_db.update_record('John', 'Doe', '30313-1', '12.0', '2024-01-05 10:00:00', '2024-01-02 10:00:00')
+    lab_db.bulk_update([
+        {'first_name': 'John', 'last_name': 'Doe', 'loinc_num': '30313-1', 'value': '12.2',
+         'update_datetime': '2024-01-06 10:00:00', 'measurement_datetime': '2024-01-02 10:00:00'},
+    ])
+    latest = lab_db.df.sort_values('update_datetime').iloc[-1]
+    assert latest['Value'] == '12.2'
+    assert latest['Unit'] == 'g/dL'
+
+
+def test_bulk_update_normalizes_key_dtypes(temp_db):
+    """Test that string datetimes and codes match a store read with other dtypes, and a bad row fails alone"""
+    #the store reads LOINC code 12345 as an integer
+    assert temp_db.df['LOINC-NUM'].dtype != object
+
+    outcomes = temp_db.bulk_update([
+        {'first_name': 'John', 'last_name': 'Doe', 'loinc_num': '12345', 'value': '130',
+         'update_datetime': '2024-02-01 10:00:00', 'measurement_datetime': '2024-01-01 10:00:00'},
+        {'first_name': 'Jane', 'last_name': 'Smith', 'loinc_num': 12345, 'value': '115',
+         'update_datetime': '2024-02-01T10:00:00', 'measurement_datetime': '2024-01-02T10:00'},
+        {'first_name': 'John', 'last_name': 'Doe', 'loinc_num': '12345', 'value': '140',
+         'update_datetime': '2024-02-01 10:00:00', 'measurement_datetime': 'not a date'},
+    ])
+
+    assert [success for success, _ in outcomes] == [True, True, False]
+    assert 'not a date' in outcomes[2][1]
+    assert list(temp_db.df['Value'].astype(str).tail(2)) == ['130', '115']
+
+
+def test_bulk_delete(lab_db):
+    """Test that bulk deletion hides the deleted records from retrieval"""
+    outcomes = lab_db.bulk_delete([
+        {'first_name': 'John', 'last_name': 'Doe', 'loinc_num': '30313-1',
+         'measurement_datetime': '2024-01-01 10:00:00', 'update_datetime': '2024-02-01 10:00:00'},
+        {'first_name': 'John', 'last_name': 'Doe', 'loinc_num': '30313-1',
+         'measurement_datetime': '2024-01-02', 'update_datetime': '2024-02-01 10:00:00'},
+    ])
+    assert outcomes == [(True, "Record deleted successfully")] * 2
+
+    records = lab_db.retrieve_records('John', 'Doe', '30313-1')
+    assert list(records['Value'].astype(str)) == ['11.8']
+    assert lab_db.bulk_delete([]) == []
+
+
+def test_save_keeps_file_permissions(lab_db):
+    """Test that rewriting the CSV keeps its permissions"""
+    os.chmod(lab_db.csv_path, 0o644)
+    success, _, _ = lab_db.update_record('John', 'Doe', '30313-1', '12.0', '2024-02-01 10:00:00', '2024-01-01 10:00:00')
+    assert success
+    assert os.stat(lab_db.csv_path).st_mode & 0o777 == 0o644
+
+
+def write_feed(path, rows):
+    """Write lab feed rows (first_name, last_name, loinc, value, measured, updated) as CSV"""
+    pd.DataFrame(rows, columns=[
+        'first_name', 'last_name', 'LOINC-NUM', 'Value', 'measurement_datetime', 'update_datetime'
+    ]).to_csv(path, index=False)
+
+
+def test_ingest_streams_and_dedups(lab_db, tmp_path, monkeypatch):
+    """Test chunked ingestion with validation and deduplication"""
+    feed = tmp_path / 'feed.csv'
+    write_feed(feed, [
+        #already in the store
+        ['John', 'Doe', '30313-1', '12.5', '2024-01-01 10:00:00', '2024-01-01 10:00:00'],
+        ['John', 'Doe', '30313-1', '11.5', '2024-01-04 10:00:00', '2024-01-04 10:00:00'],
+        #repeated within the feed, across chunks
+        ['Jane', 'Roe', '6690-2', '7000', '2024-01-04 10:00:00', '2024-01-04 11:00:00'],
+        ['Jane', 'Roe', '6690-2', '7000', '2024-01-04 10:00:00', '2024-01-04 11:00:00'],
+        #invalid: unparsable date, missing value
+        ['Jane', 'Roe', '6690-2', '7100', 'yesterday', '2024-01-04 11:00:00'],
+        ['Jane', 'Roe', '6690-2', '', '2024-01-05 10:00:00', '2024-01-05 11:00:00'],
+    ])
+
+    report = lab_db.ingest(feed, chunksize=2)
+    assert (report.rows_read, report.rows_ingested, report.rows_duplicate, report.rows_invalid) == (6, 2, 2, 2)
+    assert report.rows_per_second > 0
+    assert 'rows/s' in str(report)
+
+    saved = pd.read_csv(lab_db.csv_path, dtype={'Value': str})
+    assert len(saved) == 5 == len(lab_db.df)
+    assert list(saved['Value'].tail(2)) == ['11.5', '7000']
+    assert list(saved['Unit'].tail(2).isna()) == [True, True]
+
+    #ingesting the same feed again adds nothing
+    assert lab_db.ingest(feed).rows_ingested == 0
+    assert len(pd.read_csv(lab_db.csv_path)) == 5
+
+    #the file now has the store's columns, so new rows follow the existing ones
+    write_feed(feed, [['John', 'Doe', '30313-1', '11.0', '2024-01-05 10:00:00', '2024-01-05 10:00:00']])
+    assert lab_db.ingest(feed).rows_ingested == 1
+    assert len(pd.read_csv(lab_db.csv_path)) == 6 == len(lab_db.df)
+
+
+def test_ingest_publishes_each_chunk_and_drops_failed_ones(lab_db, tmp_path, monkeypatch):
+    """Test that chunks are published as they are written and a failed chunk leaves no rows behind"""
+    feed = tmp_path / 'feed.csv'
+    write_feed(feed, [
+        ['Jane', 'Roe', '6690-2', str(7000 + i), f'2024-01-0{i + 1} 10:00:00', '2024-01-10 10:00:00']
+        for i in range(6)
+    ])
+    replace = os.replace
+    published = []
+
+    def failing_replace(src, dst):
+        if len(published) == 2:
+            raise OSError('disk full')
+        published.append(len(pd.read_csv(src)))
+        replace(src, dst)
+
+    monkeypatch.setattr(os, 'replace', failing_replace)
+    with pytest.raises(OSError):
+        lab_db.ingest(feed, chunksize=2)
+
+    #the first two chunks were published one by one, the third was dropped
+    assert published == [5, 7]
+    assert len(pd.read_csv(lab_db.csv_path)) == 7 == len(lab_db.df)
+    assert not [f for f in os.listdir(tmp_path) if f.endswith('.tmp')]
+
+    monkeypatch.setattr(os, 'replace', replace)
+    assert lab_db.ingest(feed, chunksize=2).rows_ingested == 2
+    assert len(pd.read_csv(lab_db.csv_path)) == 9 == len(lab_db.df)
+
+
+def test_readers_never_see_a_chunk_being_written(lab_db, tmp_path, monkeypatch):
+    """Test that a reader reloading the CSV during a multi-chunk ingest only sees published chunks"""
+    feed = tmp_path / 'feed.csv'
+    write_feed(feed, [
+        ['Jane', 'Roe', '6690-2', str(7000 + i), f'2024-01-0{i + 1} 10:00:00', '2024-01-10 10:00:00']
+        for i in range(6)
+    ])
+    to_csv = pd.DataFrame.to_csv
+    seen = []
+
+    def write_then_reload(df, *args, **kwargs):
+        result = to_csv(df, *args, **kwargs)
+        if kwargs.get('mode') == 'a':
+            #another worker reloads while the chunk is written but not yet published
+            reader = DBHandler(lab_db.csv_path)
+            assert reader.df['update_datetime'].notna().all()
+            seen.append((len(reader.df), len(lab_db.df)))
+        return result
+
+    monkeypatch.setattr(pd.DataFrame, 'to_csv', write_then_reload)
+    assert lab_db.ingest(feed, chunksize=2).rows_ingested == 6
+    #the first chunk rewrote the file with the store's columns, the others were appended
+    assert seen == [(5, 5), (7, 7)]
+    assert len(DBHandler(lab_db.csv_path).df) == 9
+
+
+def test_ingest_ndjson(lab_db, tmp_path):
+    """Test ingestion of newline-delimited JSON exports"""
+    feed = tmp_path / 'feed.ndjson'
+    feed.write_text(
+        '{"first_name": "John", "last_name": "Doe", "LOINC-NUM": "6690-2", "Value": 5000, '
+        '"Unit": "10*3/uL", "measurement_datetime": "2024-01-04T10:00:00", '
+        '"update_datetime": "2024-01-04T10:00:00"}\n'
+    )
+    report = lab_db.ingest(feed)
+    assert report.rows_ingested == 1
+    records = lab_db.retrieve_records('John', 'Doe', '6690-2')
+    assert list(records['Value']) == ['5000']
+    assert list(records['Unit']) == ['10*3/uL']
+
+
+def test_ingest_parses_iso_timestamps_in_one_pass(lab_db, tmp_path, monkeypatch):
+    """Test that space and 'T' separated ISO timestamps skip the per-row parser, other layouts still parse"""
+    feed = tmp_path / 'feed.csv'
+    write_feed(feed, [
+        ['John', 'Doe', '6690-2', '5000', '2024-01-04T10:00:00', '2024-01-04T11:00:00.500'],
+        ['John', 'Doe', '6690-2', '5100', '2024-01-05 10:00:00', '2024-01-05 11:00:00'],
+    ])
+    to_datetime = pd.to_datetime
+    formats = []
+
+    def recording_to_datetime(*args, **kwargs):
+        formats.append(kwargs.get('format'))
+        return to_datetime(*args, **kwargs)
+
+    monkeypatch.setattr(pd, 'to_datetime', recording_to_datetime)
+
+    assert lab_db.ingest(feed).rows_ingested == 2
+    assert 'mixed' not in formats
+    records = lab_db.retrieve_records('John', 'Doe', '6690-2')
+    assert sorted(records['update_datetime']) == [
+        pd.Timestamp('2024-01-04 11:00:00.500'), pd.Timestamp('2024-01-05 11:00:00')
+    ]
+
+    write_feed(feed, [['John', 'Doe', '6690-2', '5200', '01/06/2024 10:00', '01/06/2024 11:00']])
+    assert lab_db.ingest(feed).rows_ingested == 1
+    assert 'mixed' in formats
+    assert pd.Timestamp('2024-01-06 10:00') in set(lab_db.df['measurement_datetime'])
+
+
+def test_ingest_requires_key_columns(lab_db, tmp_path):
+    """Test that a feed without the key columns is rejected before anything is written"""
+    feed = tmp_path / 'feed.csv'
+    pd.DataFrame({'first_name': ['John'], 'Value': ['1']}).to_csv(feed, index=False)
+    with pytest.raises(ValueError, match='Missing required columns'):
+        lab_db.ingest(feed)
+    assert len(pd.read_csv(lab_db.csv_path)) == 3
+
+
+@pytest.mark.parametrize("text,expected", [
+    ('2024-01-02 10:30:00', TimeFilter(datetime(2024, 1, 2, 10, 30), True)),
+    ('2024-01-02 10:30', TimeFilter(datetime(2024, 1, 2, 10, 30), True)),
+    ('2024-01-02T10:30:00', TimeFilter(datetime(2024, 1, 2, 10, 30), True)),
+    ('2024-01-02T10:30:00.250000', TimeFilter(datetime(2024, 1, 2, 10, 30, 0, 250000), True)),
+    ('2024-01-02', TimeFilter(datetime(2024, 1, 2), False)),
+    #not a fixed format: dateutil fallback
+    ('Jan 2 2024', TimeFilter(datetime(2024, 1, 2), False)),
+    ('2024-01-02T10:30:00Z', TimeFilter(datetime(2024, 1, 2, 10, 30, tzinfo=timezone.utc), True)),
+    ('', None),
+    (None, None),
+])
+def test_parse_time_filter(text, expected):
+    """Test strict formats first, then the dateutil fallback"""
+    assert parse_time_filter(text) == expected
+
+
+def test_parse_time_filter_accepts_parsed_values():
+    """Test that datetimes are exact, dates cover the day and parsing is memoized"""
+    from datetime import date
+    assert parse_time_filter(datetime(2024, 1, 2, 10)) == TimeFilter(datetime(2024, 1, 2, 10), True)
+    assert parse_time_filter(pd.Timestamp('2024-01-02 10:00')).has_time
+    assert parse_time_filter(date(2024, 1, 2)) == TimeFilter(datetime(2024, 1, 2), False)
+    assert parse_time_filter('2024-03-04 05:06:07') is parse_time_filter('2024-03-04 05:06:07')
+    with pytest.raises(ValueError):
+        parse_time_filter('not a date')
+
+
+def test_query_records_with_prepared_query(lab_db):
+    """Test that a prepared query gives the same records as the string arguments"""
+    query = RecordQuery.create('John', 'Doe', '30313-1', from_datetime=datetime(2024, 1, 2),
+                               to_datetime='2024-01-03')
+    expected = lab_db.retrieve_records('John', 'Doe', '30313-1', None, '2024-01-02 00:00:00', '2024-01-03')
+    result = lab_db.query_records(query)
+    assert list(result['Value']) == list(expected['Value']) and len(result) == 2
+
+    #date-only measurement filter matches the whole day
+    result = lab_db.query_records(query._replace(measurement=parse_time_filter('2024-01-03')))
+    assert len(result) == 1
+
+
+def test_date_filters_are_half_open_days():
+    """Test that a date-only filter covers [day, day + 1) for every comparison"""
+    column = pd.Series(pd.to_datetime([
+        '2024-01-01 23:59:59', '2024-01-02 00:00:00', '2024-01-02 23:59:59.999999', '2024-01-03 00:00:00'
+    ], format='ISO8601'))
+    day = parse_time_filter('2024-01-02')
+    assert list(_time_mask(column, day, '==')) == [False, True, True, False]
+    assert list(_time_mask(column, day, '>=')) == [False, True, True, True]
+    assert list(_time_mask(column, day, '<=')) == [True, True, True, False]
+
+    exact = parse_time_filter('2024-01-02 00:00:00')
+    assert list(_time_mask(column, exact, '==')) == [False, True, False, False]
@@ -0,0 +1,330 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from knowledge_db_handler import KnowledgeDataHandler, SystemicRule, HematologicalTable, Gender, Grade
+from patient_state_calculator import calculate_grade
+
+
+@pytest.fixture
+def knowledge_db():
+    """Fixture: knowledge handler loaded from the repository tables"""
+    return KnowledgeDataHandler()
+
+
+def test_fever_rule_is_numeric(knowledge_db):
+    """Test that the fever row compiles into numeric intervals"""
+    rule = knowledge_db.systemic_rules['fever']
+    assert rule.numeric
+
+    #"0-38.5" / "38.5-40.0" / "40.0+" / "40.0": the exact 40.0 cell wins over the 40.0+ range
+    grades = knowledge_db.grade_systemic_values('fever', ['37.2', 38.5, '39.9', '40.0', 40, 41, 'hot', -1])
+    assert list(grades) == [1, 2, 2, 4, 4, 3, 0, 0]
+
+
+def test_categorical_rules(knowledge_db):
+    """Test that categorical rows map each value to its lowest grade"""
+    assert not knowledge_db.systemic_rules['chills'].numeric
+    #rigor is listed under grade 3 and grade 4, the first one wins
+    grades = knowledge_db.grade_systemic_values('chills', ['None', 'Shaking', 'Rigor', 'Sweating'])
+    assert list(grades) == [1, 2, 3, 0]
+
+
+def test_unknown_test_grades_nothing(knowledge_db):
+    """Test that grading an unknown test returns no grades"""
+    assert list(knowledge_db.grade_systemic_values('pulse', ['80', '90'])) == [0, 0]
+
+
+def test_rules_follow_systemic_updates(knowledge_db):
+    """Test that updating the systemic table recompiles its rules"""
+    knowledge_db.update_systemic_grade('skin-look', 1, 'Rash')
+    assert list(knowledge_db.grade_systemic_values('skin-look', ['Rash', 'Erythema'])) == [1, 0]
+
+
+def test_open_and_point_ranges():
+    """Test range parsing of a hand-written numeric row"""
+    import pandas as pd
+    rule = SystemicRule.from_row('pulse', pd.Series(['50-100', '100-120', '120+', '']))
+    assert rule.numeric
+    assert list(rule.grade(np.array([75, 100, 150, 20]))) == [1, 2, 3, 0]
+
+
+def test_versions_increase_on_every_change(knowledge_db):
+    """Test that per-table versions move only when that table changes"""
+    validity_version = knowledge_db.get_version('test_validity')
+    systemic_version = knowledge_db.get_version('systemic')
+
+    knowledge_db.update_test_validity('hemoglobin', 4, 4)
+    assert knowledge_db.get_version('test_validity') > validity_version
+    assert knowledge_db.get_version('systemic') == systemic_version
+
+    hemoglobin_version = knowledge_db.get_version('hemoglobin', Gender.MALE)
+    knowledge_db.hemoglobin_tables[Gender.MALE] = knowledge_db.get_hemoglobin_table(Gender.MALE).copy()
+    assert knowledge_db.get_version('hemoglobin', Gender.MALE) > hemoglobin_version
+    assert knowledge_db.version == knowledge_db.get_version('hemoglobin', Gender.MALE)
+
+    knowledge_db.reset_table('test_validity')
+    assert knowledge_db.get_version('test_validity') > validity_version
+
+
+def test_loading_and_noop_resets_keep_the_version(knowledge_db):
+    """Test that first loads and resets of an unchanged table are not counted as changes"""
+    version = knowledge_db.version
+    knowledge_db.get_systemic_table()
+    knowledge_db.get_hemoglobin_table(Gender.FEMALE)
+    assert knowledge_db.version == version
+
+    knowledge_db.reset_table('systemic')
+    knowledge_db.reset_table('recommendations', Gender.MALE)
+    assert knowledge_db.version == version
+    assert not knowledge_db.is_dirty('systemic')
+
+    #a reset after an edit is a change
+    knowledge_db.update_systemic_grade('chills', 1, 'Mild')
+    knowledge_db.reset_table('systemic')
+    assert knowledge_db.version == version + 2
+    #and loaded tables still get distinct versions per change
+    assert knowledge_db.get_version('systemic') > knowledge_db.get_version('hemoglobin', Gender.FEMALE)
+
+
+def test_snapshot_is_not_affected_by_later_edits(knowledge_db):
+    """Test that a snapshot keeps the table as it was at its version"""
+    snapshot = knowledge_db.snapshot('test_validity')
+    knowledge_db.update_test_validity('hemoglobin', 10, 10)
+
+    row = snapshot.data[snapshot.data['test_name'] == 'hemoglobin'].iloc[0]
+    assert row['good-before'] == 3
+    assert snapshot.version < knowledge_db.get_version('test_validity')
+
+
+def test_compiled_rules_cached_by_version(knowledge_db):
+    """Test that compiled artifacts are reused until their table changes"""
+    rules = knowledge_db.systemic_rules
+    assert knowledge_db.systemic_rules is rules
+
+    knowledge_db.update_systemic_grade('fever', 4, '41.0+')
+    assert knowledge_db.systemic_rules is not rules
+
+
+KNOWLEDGE_FILES = ['systemic_table.csv', 'test_validity_table.csv', 'hemoglobin_male.csv',
+                   'hemoglobin_female.csv', 'recommendations_male.csv', 'recommendations_female.csv',
+                   'hematological_male.json', 'hematological_female.json']
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Fixture: a copy of the repository knowledge tables in a temporary directory"""
+    import shutil
+    for name in KNOWLEDGE_FILES:
+        shutil.copy(name, tmp_path / name)
+    return tmp_path
+
+
+def test_save_writes_only_changed_tables(data_dir):
+    """Test that saving rewrites the edited table only, without leaving temporary files"""
+    knowledge_db = KnowledgeDataHandler(data_dir=str(data_dir))
+    before = {name: (data_dir / name).stat().st_mtime_ns for name in KNOWLEDGE_FILES}
+
+    knowledge_db.update_test_validity('WBC', 6, 6)
+    success, message = knowledge_db.save_all_data()
+    assert success
+    assert '1 changed table' in message
+
+    after = {name: (data_dir / name).stat().st_mtime_ns for name in KNOWLEDGE_FILES}
+    changed = [name for name in KNOWLEDGE_FILES if before[name] != after[name]]
+    assert changed == ['test_validity_table.csv']
+    assert not knowledge_db.is_dirty('test_validity')
+    assert not [path for path in data_dir.iterdir() if path.name.startswith('.tmp-')]
+
+    #a reload sees the saved value
+    reloaded = KnowledgeDataHandler(data_dir=str(data_dir))
+    validity = reloaded.get_test_validity_table().set_index('test_name')
+    assert validity.loc['WBC', 'good-before'] == 6
+
+
+def test_save_keeps_file_permissions(data_dir):
+    """Test that a rewritten table keeps the permissions of the file it replaces"""
+    path = data_dir / 'test_validity_table.csv'
+    os.chmod(path, 0o644)
+    knowledge_db = KnowledgeDataHandler(data_dir=str(data_dir))
+    knowledge_db.update_test_validity('WBC', 6, 6)
+    assert knowledge_db.save_all_data()[0]
+    assert path.stat().st_mode & 0o777 == 0o644
+
+
+def test_defaults_are_saved_when_files_are_missing(tmp_path):
+    """Test that tables loaded from defaults are written by the next save"""
+    knowledge_db = KnowledgeDataHandler(data_dir=str(tmp_path))
+    knowledge_db.get_systemic_table()
+    assert knowledge_db.is_dirty('systemic')
+
+    success, _ = knowledge_db.save_all_data()
+    assert success
+    assert (tmp_path / 'systemic_table.csv').exists()
+    #tables that were never used are not written
+    assert not (tmp_path / 'hemoglobin_male.csv').exists()
+
+    knowledge_db.load_all_data()
+    success, _ = knowledge_db.save_all_data()
+    assert all((tmp_path / name).exists() for name in KNOWLEDGE_FILES)
+
+
+def test_tables_load_on_first_use(data_dir):
+    """Test that tables are loaded lazily, one at a time"""
+    knowledge_db = KnowledgeDataHandler(data_dir=str(data_dir))
+    assert knowledge_db._tables == {}
+
+    knowledge_db.get_hemoglobin_table(Gender.MALE)
+    assert list(knowledge_db._tables) == [('hemoglobin', Gender.MALE)]
+
+
+def test_reset_shares_the_baseline(data_dir):
+    """Test that reset restores the loaded table without copying it and later edits leave it intact"""
+    knowledge_db = KnowledgeDataHandler(data_dir=str(data_dir))
+    baseline = knowledge_db.get_test_validity_table()
+
+    knowledge_db.update_test_validity('WBC', 9, 9)
+    knowledge_db.reset_table('test_validity')
+    assert knowledge_db.get_test_validity_table() is baseline
+
+    knowledge_db.update_test_validity('WBC', 7, 7)
+    assert baseline.set_index('test_name').loc['WBC', 'good-before'] == 5
+
+    with pytest.raises(ValueError):
+        knowledge_db.reset_table('hemoglobin')
+
+
+def test_packed_knowledge_file_round_trip(data_dir):
+    """Test that every table can be batched into a single packed file"""
+    packed_path = data_dir / 'knowledge.json'
+    knowledge_db = KnowledgeDataHandler(data_dir=str(data_dir), packed_path=str(packed_path))
+    knowledge_db.update_systemic_grade('chills', 1, 'Mild')
+    success, _ = knowledge_db.save_all_data()
+    assert success
+    assert packed_path.exists()
+
+    #the packed file is preferred over the csv files on load
+    reloaded = KnowledgeDataHandler(data_dir=str(data_dir), packed_path=str(packed_path))
+    assert reloaded.get_systemic_table().loc['chills', 'grade 1'] == 'Mild'
+    assert reloaded.get_hemoglobin_table(Gender.MALE).equals(knowledge_db.get_hemoglobin_table(Gender.MALE))
+
+
+def test_packed_save_leaves_every_table_clean(data_dir):
+    """Test that tables first loaded by a packed save are clean afterwards, so the next save writes nothing"""
+    packed_path = data_dir / 'knowledge.json'
+    knowledge_db = KnowledgeDataHandler(data_dir=str(data_dir), packed_path=str(packed_path))
+    knowledge_db.update_systemic_grade('chills', 1, 'Mild')
+    assert knowledge_db.save_all_data() == (True, 'Saved 1 changed table(s)')
+
+    assert not any(knowledge_db.is_dirty(*key) for key in knowledge_db._tables)
+    mtime = packed_path.stat().st_mtime_ns
+    assert knowledge_db.save_all_data() == (True, 'No changes to save')
+    assert packed_path.stat().st_mtime_ns == mtime
+
+
+def test_hematological_classifier(knowledge_db):
+    """Test the compiled hematological lookup on the female table"""
+    classifier = knowledge_db.get_hematological_classifier(Gender.FEMALE)
+    states = classifier.classify([3000, 5000, 5000, 12000, 5000, -5], [7.9, 13.9, 14.1, 10, 0, 10])
+    assert list(states) == ['Pancytopenia', 'Normal', 'Polyhemia', 'Suspected Leukemia', 'Anemia', None]
+    #bounds are closed on the left
+    assert classifier.state(4000, 8) == 'Anemia'
+
+
+def test_hematological_display_round_trip(knowledge_db):
+    """Test that the UI table records convert back to the same compact table"""
+    table = knowledge_db.get_hematological_classifier(Gender.MALE)
+    records = [
+        {'WBC Range': 'WBC 0-4000', '0-9': 'Pancytopenia', '9-16': 'Leukopenia', '16+': 'Suspected Polycytemia Vera'},
+        {'WBC Range': 'WBC 4000+', '0-9': 'Anemia', '9-16': 'Normal', '16+': 'Polyhemia'},
+    ]
+    edited = HematologicalTable.from_display_records(records)
+    assert edited.state(5000, 10) == 'Normal'
+    assert edited.state(20000, 20) == 'Polyhemia'
+
+    #the json format keeps boundaries and state codes
+    restored = HematologicalTable.from_json(table.to_json())
+    assert list(restored.wbc_bounds) == list(table.wbc_bounds)
+    assert (restored.codes == table.codes).all()
+    assert restored.states == table.states
+
+
+def test_hematological_table_is_saved(data_dir):
+    """Test that edits of the hematological table are persisted"""
+    knowledge_db = KnowledgeDataHandler(data_dir=str(data_dir))
+    frame = knowledge_db.get_hematological_table(Gender.FEMALE)
+    frame.iloc[1, 3] = 'Healthy'
+    knowledge_db.hematological_tables[Gender.FEMALE] = frame
+    success, _ = knowledge_db.save_all_data()
+    assert success
+
+    reloaded = KnowledgeDataHandler(data_dir=str(data_dir))
+    assert reloaded.get_hematological_classifier(Gender.FEMALE).state(5000, 13) == 'Healthy'
+
+
+def _touch_later(path):
+    """Bump the modification time of a file, as an external writer would"""
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_hot_reload_of_changed_table(data_dir):
+    """Test that an externally updated file reloads only its own table"""
+    knowledge_db = KnowledgeDataHandler(data_dir=str(data_dir))
+    assert knowledge_db.check_for_changes() == []
+
+    snapshot = knowledge_db.snapshot('hemoglobin', Gender.FEMALE)
+    systemic_version = knowledge_db.get_version('systemic')
+
+    table = snapshot.data.copy()
+    table.loc[0, 'high_range'] = 7.5
+    table.to_csv(data_dir / 'hemoglobin_female.csv', index=False)
+    _touch_later(data_dir / 'hemoglobin_female.csv')
+
+    assert knowledge_db.check_for_changes() == [('hemoglobin', Gender.FEMALE)]
+    assert knowledge_db.get_hemoglobin_table(Gender.FEMALE).loc[0, 'high_range'] == 7.5
+    assert knowledge_db.get_version('systemic') == systemic_version
+    #the snapshot taken before the reload is unchanged
+    assert snapshot.data.loc[0, 'high_range'] == 8.0
+
+
+def test_own_saves_are_not_reloaded(data_dir):
+    """Test that files written by save_all_data are not treated as external changes"""
+    knowledge_db = KnowledgeDataHandler(data_dir=str(data_dir))
+    knowledge_db.update_test_validity('fever', 2, 2)
+    knowledge_db.save_all_data()
+    assert knowledge_db.check_for_changes() == []
+
+
+def test_save_keeps_external_changes_of_other_tables(data_dir):
+    """Test that a save does not mark another table's external edit as seen"""
+    knowledge_db = KnowledgeDataHandler(data_dir=str(data_dir))
+    snapshot = knowledge_db.snapshot('hemoglobin', Gender.FEMALE)
+    table = snapshot.data.copy()
+    table.loc[0, 'high_range'] = 7.5
+    table.to_csv(data_dir / 'hemoglobin_female.csv', index=False)
+    _touch_later(data_dir / 'hemoglobin_female.csv')
+
+    knowledge_db.update_test_validity('fever', 2, 2)
+    assert knowledge_db.save_all_data()[0]
+
+    assert knowledge_db.check_for_changes() == [('hemoglobin', Gender.FEMALE)]
+    assert knowledge_db.get_hemoglobin_table(Gender.FEMALE).loc[0, 'high_range'] == 7.5
+
+
+def test_unsaved_edits_survive_external_changes(data_dir):
+    """Test that a table with unsaved local edits is not overwritten by a reload"""
+    knowledge_db = KnowledgeDataHandler(data_dir=str(data_dir))
+    knowledge_db.update_test_validity('fever', 2, 2)
+    _touch_later(data_dir / 'test_validity_table.csv')
+
+    assert knowledge_db.check_for_changes() == []
+    validity = knowledge_db.get_test_validity_table().set_index('test_name')
+    assert validity.loc['fever', 'good-before'] == 2
+
+
+def test_exact_fever_reading_keeps_its_grade(knowledge_db):
+    """Test that John Doe's 40.0 reading is graded 4, as listed in the systemic table"""
+    project_db = pd.read_csv('project_db_with_names.csv')
+    assert calculate_grade(project_db, knowledge_db, 'John Doe', datetime(2025, 5, 19, 16)) == Grade.GRADE_4
@@ -0,0 +1,328 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pandas as pd
+import pytest
+import loinc_name_fetcher
+from db_handler import DBHandler
+from loinc_name_fetcher import (
+    LoincNameCache, TokenBucket, UMLSClient, add_loinc_names_to_csv, resolve_loinc_names,
+    stream_loinc_names_to_csv,
+)
+
+PROJECT_DB = 'project_db_with_names.csv'
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Fixture: empty name cache in a temporary file"""
+    cache = LoincNameCache(str(tmp_path / 'loinc_names.sqlite'))
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """Fixture: fail any attempt to reach the UMLS API"""
+    def no_network(*args, **kwargs):
+        raise AssertionError('UMLS API called')
+    monkeypatch.setattr(loinc_name_fetcher.UMLSClient, 'fetch_names', no_network)
+
+
+def test_cache_persists_and_expires(cache):
+    """Test that names survive reopening the file and expire after the TTL"""
+    cache.put('30313-1', 'Hemoglobin')
+    cache.put_many({'6690-2': 'Leukocytes', '8310-5': None})
+    assert LoincNameCache(cache.path).get_many(['30313-1', '6690-2', '8310-5']) == {
+        '30313-1': 'Hemoglobin', '6690-2': 'Leukocytes'
+    }
+
+    cache.put_many({'6690-2': 'Leukocytes'}, fetched_at=0)
+    assert cache.get('6690-2') is None
+    assert cache.get('30313-1') == 'Hemoglobin'
+
+
+def test_known_codes_enrich_offline(cache, offline, tmp_path):
+    """Test that a file whose codes are all cached is enriched without the API"""
+    assert cache.warm_up(PROJECT_DB) == 6
+
+    input_path = tmp_path / 'input.csv'
+    pd.read_csv(PROJECT_DB).drop(columns=['LOINC-NAME']).to_csv(input_path, index=False)
+    df = add_loinc_names_to_csv(str(input_path), cache=cache)
+
+    expected = pd.read_csv(PROJECT_DB)['LOINC-NAME']
+    assert list(df['LOINC-NAME']) == list(expected)
+
+
+def test_only_missing_codes_are_fetched(cache, tmp_path):
+    """Test that the API is queried once per uncached code and the answer is kept"""
+    fetched = []
+
+    class FakeClient:
+        def fetch_names(self, codes):
+            fetched.extend(codes)
+            return {code: f'name of {code}' for code in codes}
+
+    cache.put('30313-1', 'Hemoglobin')
+
+    input_path = tmp_path / 'input.csv'
+    pd.DataFrame({'LOINC-NUM': ['30313-1', '6690-2', '6690-2']}).to_csv(input_path, index=False)
+    df = add_loinc_names_to_csv(str(input_path), cache=cache, client=FakeClient())
+
+    assert fetched == ['6690-2']
+    assert list(df['LOINC-NAME']) == ['Hemoglobin', 'name of 6690-2', 'name of 6690-2']
+    assert cache.get('6690-2') == 'name of 6690-2'
+
+
+def test_names_are_resolved_once_per_distinct_code(cache):
+    """Test that a large column costs one lookup per distinct code and keeps missing codes empty"""
+    cache.put_many({'30313-1': 'Hemoglobin', '6690-2': 'Leukocytes'})
+    requested = []
+    get_many = cache.get_many
+    cache.get_many = lambda codes: requested.append(list(codes)) or get_many(codes)
+
+    class FakeClient:
+        def fetch_names(self, codes):
+            requested.append(list(codes))
+            return {code: None for code in codes}
+
+    codes = pd.Series(['30313-1', '6690-2', None, '1234-5'] * 50_000, index=range(3, 200_003))
+    names = resolve_loinc_names(codes, cache, FakeClient())
+
+    assert requested == [['30313-1', '6690-2', '1234-5'], ['1234-5']]
+    assert names.index.equals(codes.index)
+    assert list(names[:4]) == ['Hemoglobin', 'Leukocytes', None, None]
+    assert names.value_counts().to_dict() == {'Hemoglobin': 50_000, 'Leukocytes': 50_000}
+
+
+def test_streaming_enrichment_resumes_after_interruption(cache, offline, tmp_path):
+    """Test that an interrupted streaming run resumes from its checkpoint and matches a one-shot run"""
+    cache.warm_up(PROJECT_DB)
+    input_path = tmp_path / 'input.csv'
+    source = pd.read_csv(PROJECT_DB, dtype=str, keep_default_na=False)
+    source.drop(columns=['LOINC-NAME']).to_csv(input_path, index=False)
+    output_path = tmp_path / 'output.csv'
+
+    # Fail while resolving the third chunk
+    chunks = []
+    get_many = cache.get_many
+    def failing_get_many(codes):
+        chunks.append(len(chunks))
+        if len(chunks) == 3:
+            raise RuntimeError('interrupted')
+        return get_many(codes)
+    cache.get_many = failing_get_many
+    with pytest.raises(RuntimeError):
+        stream_loinc_names_to_csv(str(input_path), str(output_path), cache=cache, chunksize=4)
+    checkpoint = tmp_path / 'output.csv.checkpoint'
+    assert checkpoint.exists()
+    # Simulate a chunk half written when the process died
+    with open(output_path, 'a') as f:
+        f.write('Partial,row')
+
+    cache.get_many = get_many
+    rows = stream_loinc_names_to_csv(str(input_path), str(output_path), cache=cache, chunksize=4)
+
+    assert rows == len(source)
+    assert not checkpoint.exists()
+    pd.testing.assert_frame_equal(pd.read_csv(output_path, dtype=str, keep_default_na=False), source)
+
+
+def test_streaming_run_uses_one_client_and_skips_known_failures(cache, monkeypatch, tmp_path):
+    """Test that a streaming run creates one client and fetches an unknown code only once"""
+    clients = []
+
+    class FakeClient:
+        def __init__(self):
+            clients.append(self)
+            self.fetched = []
+            self.closed = False
+
+        def fetch_names(self, codes):
+            self.fetched.extend(codes)
+            return {code: None for code in codes}
+
+        def close(self):
+            self.closed = True
+
+    monkeypatch.setattr(loinc_name_fetcher, 'UMLSClient', FakeClient)
+    input_path = tmp_path / 'input.csv'
+    pd.DataFrame({'LOINC-NUM': ['1234-5'] * 10}).to_csv(input_path, index=False)
+
+    assert stream_loinc_names_to_csv(str(input_path), str(tmp_path / 'out.csv'), cache=cache, chunksize=2) == 10
+    assert len(clients) == 1
+    assert clients[0].fetched == ['1234-5']
+    assert clients[0].closed
+
+
+def test_streaming_enrichment_in_place(cache, offline, tmp_path):
+    """Test that without an output path the input file is replaced once enriched"""
+    cache.put('30313-1', 'Hemoglobin')
+    input_path = tmp_path / 'input.csv'
+    pd.DataFrame({'LOINC-NUM': ['30313-1', '', '30313-1'], 'Value': ['12.0', '7', '']}) \
+        .to_csv(input_path, index=False)
+    cache.put('', 'never looked up')
+
+    assert stream_loinc_names_to_csv(str(input_path), cache=cache, chunksize=2) == 3
+    assert input_path.read_text().splitlines() == [
+        'LOINC-NUM,Value,LOINC-NAME', '30313-1,12.0,Hemoglobin', ',7,', '30313-1,,Hemoglobin'
+    ]
+    assert not (tmp_path / 'input.csv.partial').exists()
+    assert not (tmp_path / 'input.csv.partial.checkpoint').exists()
+
+
+def test_db_handler_fills_names_from_cache(cache, tmp_path):
+    """Test that DBHandler fills missing LOINC-NAME values from the cache"""
+    cache.warm_up(PROJECT_DB)
+    db_path = tmp_path / 'db.csv'
+    pd.read_csv(PROJECT_DB).drop(columns=['LOINC-NAME']).to_csv(db_path, index=False)
+
+    db = DBHandler(str(db_path), loinc_cache=cache)
+    assert db.df['LOINC-NAME'].notna().all()
+
+    feed = tmp_path / 'feed.csv'
+    pd.DataFrame([{
+        'first_name': 'New', 'last_name': 'Patient', 'LOINC-NUM': '6690-2', 'Value': '5000',
+        'measurement_datetime': '2025-06-01 10:00:00', 'update_datetime': '2025-06-01 10:00:00',
+    }]).to_csv(feed, index=False)
+    db.ingest(feed)
+    assert db.df['LOINC-NAME'].iloc[-1] == 'Leukocytes:NCnc:Pt:Bld:Qn:Automated count'
+
+
+def test_imported_table_is_the_primary_resolver(cache, offline, tmp_path):
+    """Test that codes of the imported LOINC table resolve without the API and win over cached names"""
+    loinc_csv = tmp_path / 'Loinc.csv'
+    pd.DataFrame({
+        'LOINC_NUM': ['30313-1', '6690-2', '8310-5'],
+        'COMPONENT': ['Hemoglobin', 'Leukocytes', 'Body temperature'],
+        'PROPERTY': ['MCnc', 'NCnc', 'Temp'],
+        'SYSTEM': ['Bld', 'Bld', '^Patient'],
+        'EXAMPLE_UNITS': ['g/dL', '', 'Cel'],
+        'EXAMPLE_UCUM_UNITS': ['g/dL', '10*3/uL', ''],
+        'LONG_COMMON_NAME': [
+            'Hemoglobin [Mass/volume] in Arterial blood',
+            'Leukocytes [#/volume] in Blood by Automated count',
+            'Body temperature',
+        ],
+    }).to_csv(loinc_csv, index=False)
+    cache.put('30313-1', 'Hemoglobin')
+
+    assert cache.import_table(str(loinc_csv)) == 3
+    assert cache.get_many(['30313-1', '6690-2', '1234-5']) == {
+        '30313-1': 'Hemoglobin [Mass/volume] in Arterial blood',
+        '6690-2': 'Leukocytes [#/volume] in Blood by Automated count',
+    }
+    details = cache.details(['6690-2', '8310-5', '1234-5'])
+    assert list(details.index) == ['6690-2', '8310-5']
+    assert details.loc['6690-2', 'component'] == 'Leukocytes'
+    assert details.loc['6690-2', 'units'] == '10*3/uL'
+    assert details.loc['8310-5', 'units'] == 'Cel'
+
+    input_path = tmp_path / 'input.csv'
+    pd.DataFrame({'LOINC-NUM': ['8310-5', '6690-2']}).to_csv(input_path, index=False)
+    df = add_loinc_names_to_csv(str(input_path), cache=cache)
+    assert list(df['LOINC-NAME']) == ['Body temperature', 'Leukocytes [#/volume] in Blood by Automated count']
+
+
+class StubUMLS(BaseHTTPRequestHandler):
+    """Local stand-in for the UMLS authentication and content endpoints"""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body='', content_type='text/plain'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with server.lock:
+            if self.path == '/auth':
+                server.tgts += 1
+                action = f'http://127.0.0.1:{server.server_port}/tgt/TGT-{server.tgts}'
+                return self._send(201, f'<html><form action="{action}" method="POST"></form></html>')
+            server.tickets += 1
+            if self.path != f'/tgt/TGT-{server.tgts}' or server.expire_tgt:
+                server.expire_tgt = False
+                return self._send(401)
+            return self._send(200, f'ST-{server.tickets}')
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        code = url.path.rsplit('/', 1)[-1]
+        with server.lock:
+            server.lookups.append((code, parse_qs(url.query)['ticket'][0]))
+            if code in server.fail_once:
+                server.fail_once.discard(code)
+                return self._send(503)
+        if code not in server.names:
+            return self._send(404)
+        self._send(200, json.dumps({'result': {'name': server.names[code]}}), 'application/json')
+
+
+@pytest.fixture
+def umls():
+    """Fixture: stub UMLS server running in a background thread"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubUMLS)
+    server.lock = threading.Lock()
+    server.tgts = 0
+    server.tickets = 0
+    server.lookups = []
+    server.expire_tgt = False
+    server.fail_once = set()
+    server.names = {f'{n}-{n % 10}': f'Analyte {n}' for n in range(1, 41)}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def umls_client(server, **kwargs):
+    base = f'http://127.0.0.1:{server.server_port}'
+    options = dict(rate_per_second=1000, max_workers=8, backoff_seconds=0.01)
+    options.update(kwargs)
+    return UMLSClient(api_key='key', auth_endpoint=f'{base}/auth',
+                      lookup_endpoint=f'{base}/lnc/', **options)
+
+
+def test_client_fetches_concurrently_with_one_tgt(umls):
+    """Test that a batch reuses one TGT, uses a fresh service ticket per lookup and survives unknown codes"""
+    client = umls_client(umls)
+    codes = list(umls.names) + ['9999-9']
+    names = client.fetch_names(codes)
+    client.close()
+
+    assert names == {**umls.names, '9999-9': None}
+    assert umls.tgts == 1
+    tickets = [ticket for _, ticket in umls.lookups]
+    assert len(tickets) == len(set(tickets)) == len(codes)
+
+
+def test_client_retries_and_refreshes_tgt(umls):
+    """Test that 5xx answers are retried and a rejected TGT is renewed"""
+    client = umls_client(umls)
+    umls.fail_once = {'1-1'}
+    assert client.long_common_name('1-1') == 'Analyte 1'
+    assert [code for code, _ in umls.lookups] == ['1-1', '1-1']
+
+    umls.expire_tgt = True
+    assert client.long_common_name('2-2') == 'Analyte 2'
+    assert umls.tgts == 2
+    client.close()
+
+
+def test_token_bucket_limits_rate():
+    """Test that the bucket allows its burst and then spaces calls at the configured rate"""
+    bucket = TokenBucket(rate=50, capacity=5)
+    start = loinc_name_fetcher.time.monotonic()
+    for _ in range(15):
+        bucket.acquire()
+    # 5 calls from the burst, the 10 others at 50 per second
+    assert loinc_name_fetcher.time.monotonic() - start >= 0.18
@@ -0,0 +1,121 @@
+import pytest
+from datetime import datetime
+from overview_scheduler import OverviewSnapshotScheduler
+
+
+@pytest.fixture
+def scheduler():
+    """Fixture: scheduler over a two-patient census that records every computation"""
+    calls = []
+
+    def compute_overview(full_name, dt):
+        calls.append((full_name, dt))
+        if full_name == 'Jane Smith':
+            raise ValueError("missing tests")
+        return {'hb_state': 'Normal Hemoglobin', 'hema_state': 'Normal',
+                'grade': None, 'recommendation': None}
+
+    scheduler = OverviewSnapshotScheduler(
+        lambda: [('John Doe', 'male'), ('Jane Smith', 'female')],
+        compute_overview,
+        interval_minutes=5,
+        shift_starts=['07:00'],
+    )
+    scheduler.calls = calls
+    return scheduler
+
+
+def test_refresh_precomputes_now_and_shift_starts(scheduler):
+    """Test that a refresh computes every patient for now and for each shift start"""
+    scheduler.refresh(datetime(2025, 5, 18, 14, 2, 30))
+
+    #two patients for two timestamps
+    assert len(scheduler.calls) == 4
+
+    snapshot = scheduler.lookup(datetime(2025, 5, 18, 7, 0))
+    assert [entry['full_name'] for entry in snapshot] == ['John Doe', 'Jane Smith']
+    #errors are kept per patient instead of failing the whole snapshot
+    assert snapshot[0]['overview']['hb_state'] == 'Normal Hemoglobin'
+    assert isinstance(snapshot[1]['error'], ValueError)
+
+
+def test_lookup_current_time_minute(scheduler):
+    """Test that the "now" snapshot serves the minute it was computed at only"""
+    scheduler.refresh(datetime(2025, 5, 18, 14, 2, 30))
+
+    assert scheduler.lookup(datetime(2025, 5, 18, 14, 2)) is not None
+    assert scheduler.lookup(datetime(2025, 5, 18, 14, 2, 59)) is not None
+    #later minutes may see data edited since, so they are computed on demand
+    assert scheduler.lookup(datetime(2025, 5, 18, 14, 3)) is None
+    assert scheduler.lookup(datetime(2025, 5, 18, 13, 0)) is None
+
+
+def test_invalidate_drops_snapshots(scheduler):
+    """Test that data edits invalidate every precomputed snapshot"""
+    scheduler.refresh(datetime(2025, 5, 18, 14, 0))
+    scheduler.invalidate()
+
+    assert scheduler.lookup(datetime(2025, 5, 18, 14, 0)) is None
+    assert scheduler.lookup(datetime(2025, 5, 18, 7, 0)) is None
+
+
+def test_snapshots_keyed_by_version(scheduler):
+    """Test that snapshots built from an older data version are not served"""
+    version = {'value': 1}
+    scheduler.current_version = lambda: version['value']
+    scheduler.refresh(datetime(2025, 5, 18, 14, 0))
+    assert scheduler.lookup(datetime(2025, 5, 18, 14, 0)) is not None
+
+    version['value'] = 2
+    assert scheduler.lookup(datetime(2025, 5, 18, 14, 0)) is None
+
+
+def test_refresh_spanning_invalidate_is_discarded(scheduler):
+    """Test that snapshots computed while an invalidation happened are not installed"""
+    compute = scheduler.compute_overview
+
+    def compute_and_invalidate(full_name, dt):
+        if full_name == 'John Doe':
+            scheduler.invalidate()
+        return compute(full_name, dt)
+
+    scheduler.compute_overview = compute_and_invalidate
+    assert scheduler.refresh(datetime(2025, 5, 18, 14, 0)) is False
+    assert scheduler.lookup(datetime(2025, 5, 18, 14, 0)) is None
+
+    scheduler.compute_overview = compute
+    assert scheduler.refresh(datetime(2025, 5, 18, 14, 0)) is True
+    assert scheduler.lookup(datetime(2025, 5, 18, 14, 0)) is not None
+
+
+def test_refresh_spanning_version_change_is_discarded():
+    """Test that a data version bump during a refresh discards its snapshots"""
+    version = [1]
+
+    def compute_overview(full_name, dt):
+        version[0] += 1
+        return {}
+
+    scheduler = OverviewSnapshotScheduler(
+        lambda: [('John Doe', 'male')], compute_overview, current_version=lambda: version[0]
+    )
+    assert scheduler.refresh(datetime(2025, 5, 18, 14, 0)) is False
+    assert scheduler.lookup(datetime(2025, 5, 18, 14, 0)) is None
+
+
+def test_first_refresh_loading_knowledge_tables_is_kept():
+    """Test that knowledge tables loaded on first use during a refresh do not discard it"""
+    from knowledge_db_handler import KnowledgeDataHandler, Gender
+
+    knowledge_db = KnowledgeDataHandler()
+
+    def compute_overview(full_name, dt):
+        knowledge_db.get_systemic_table()
+        knowledge_db.get_recommendations(Gender.MALE)
+        return {}
+
+    scheduler = OverviewSnapshotScheduler(
+        lambda: [('John Doe', 'male')], compute_overview, current_version=lambda: knowledge_db.version
+    )
+    assert scheduler.refresh(datetime(2025, 5, 18, 14, 0)) is True
+    assert scheduler.lookup(datetime(2025, 5, 18, 14, 0)) is not None
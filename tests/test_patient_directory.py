@@ -0,0 +1,79 @@
+import pandas as pd
+from db_handler import DBHandler
+from patient_directory import PatientDirectory
+from patient_state_calculator import get_patient_gender
+
+PROJECT_DB = 'project_db_with_names.csv'
+
+
+def records(rows):
+    """Records frame from (first_name, last_name, gender, measurement_datetime) tuples"""
+    df = pd.DataFrame(rows, columns=['first_name', 'last_name', 'Gender', 'measurement_datetime'])
+    df['measurement_datetime'] = pd.to_datetime(df['measurement_datetime'])
+    return df
+
+
+def test_directory_from_frame():
+    """Test ids, genders and measurement spans of a freshly built directory"""
+    directory = PatientDirectory.from_frame(records([
+        ('John', 'Doe', 'Male', '2024-01-02 10:00'),
+        ('Jane', 'Roe', 'female', '2024-01-01 09:00'),
+        ('John', 'Doe', 'male', '2024-01-01 08:00'),
+    ]))
+    assert len(directory) == 2
+    john = directory.get('John Doe')
+    assert (john.patient_id, john.gender) == (0, 'male')
+    assert john.first_measurement == pd.Timestamp('2024-01-01 08:00')
+    assert john.last_measurement == pd.Timestamp('2024-01-02 10:00')
+    assert directory.gender('Jane Roe') == 'female'
+    assert directory.gender('Nobody Here') is None
+    assert directory.options() == [
+        {'label': 'John Doe', 'value': 'John Doe'},
+        {'label': 'Jane Roe', 'value': 'Jane Roe'},
+    ]
+
+
+def test_with_records_is_incremental_and_immutable():
+    """Test that new rows extend a copy of the directory"""
+    directory = PatientDirectory.from_frame(records([('John', 'Doe', 'male', '2024-01-02 10:00')]))
+    updated = directory.with_records(records([
+        ('John', 'Doe', None, '2024-01-05 10:00'),
+        ('Ann', 'Lee', 'female', '2024-01-03 10:00'),
+    ]))
+
+    assert 'Ann Lee' in updated and 'Ann Lee' not in directory
+    assert updated.get('Ann Lee').patient_id == 1
+    #gender is kept when the new rows do not carry one
+    assert updated.get('John Doe').gender == 'male'
+    assert updated.get('John Doe').last_measurement == pd.Timestamp('2024-01-05 10:00')
+    assert directory.get('John Doe').last_measurement == pd.Timestamp('2024-01-02 10:00')
+
+
+def test_db_handler_keeps_directory_current(tmp_path):
+    """Test that ingestion adds new patients to the handler's directory"""
+    db_path = tmp_path / 'db.csv'
+    pd.read_csv(PROJECT_DB).to_csv(db_path, index=False)
+    db = DBHandler(str(db_path))
+    patients = len(db.directory)
+
+    feed = tmp_path / 'feed.csv'
+    pd.DataFrame([{
+        'first_name': 'New', 'last_name': 'Patient', 'LOINC-NUM': '30313-1', 'Value': '12',
+        'Gender': 'female', 'measurement_datetime': '2025-06-01 10:00:00',
+        'update_datetime': '2025-06-01 10:00:00',
+    }]).to_csv(feed, index=False)
+    db.ingest(feed)
+
+    assert len(db.directory) == patients + 1
+    assert db.directory.gender('New Patient') == 'female'
+
+
+def test_patient_gender_lookup():
+    """Test the gender lookup with and without a directory"""
+    project_db = pd.read_csv(PROJECT_DB)
+    directory = PatientDirectory.from_frame(DBHandler(PROJECT_DB).df)
+    for entry in directory:
+        assert get_patient_gender(project_db, entry.full_name) == entry.gender
+        assert get_patient_gender(project_db, entry.full_name, directory) == entry.gender
+    assert get_patient_gender(project_db, 'Emily Taylor') == 'female'
+    assert get_patient_gender(project_db, 'Nobody Here') is None
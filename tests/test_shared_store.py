@@ -0,0 +1,99 @@
+import shutil
+import pytest
+import pandas as pd
+from db_handler import DBHandler
+from knowledge_db_handler import KnowledgeDataHandler
+from shared_store import SharedVersionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Fixture: version store shared by the handlers of one test"""
+    return SharedVersionStore(str(tmp_path / "shared.sqlite"))
+
+
+@pytest.fixture
+def records_path(tmp_path):
+    """Fixture: a small records CSV"""
+    path = tmp_path / "records.csv"
+    pd.DataFrame({
+        'first_name': ['John', 'John'],
+        'last_name': ['Doe', 'Doe'],
+        'LOINC-NUM': ['30313-1', '6690-2'],
+        'Value': ['12.5', '7.1'],
+        'Unit': ['g/dL', '10*3/uL'],
+        'measurement_datetime': ['2024-01-01 10:00:00', '2024-01-01 10:00:00'],
+        'update_datetime': ['2024-01-01 10:00:00', '2024-01-01 10:00:00'],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def test_versions_start_at_zero_and_bump(store):
+    """Test that versions are per resource and persist across store instances"""
+    assert store.get_version('records') == 0
+    assert store.bump('records') == 1
+    assert store.bump('records') == 2
+    assert store.get_version('knowledge') == 0
+    assert SharedVersionStore(store.path).get_version('records') == 2
+
+
+def test_failed_write_rolls_back(store):
+    """Test that a bump made under a failing write lock is not committed"""
+    with pytest.raises(RuntimeError):
+        with store.write_lock():
+            store.bump('records')
+            raise RuntimeError('write failed')
+    assert store.get_version('records') == 0
+
+
+def test_workers_see_each_others_edits(store, records_path):
+    """Test that a handler reloads records edited through another handler"""
+    worker_a = DBHandler(records_path, shared_store=store)
+    worker_b = DBHandler(records_path, shared_store=store)
+
+    success, _, _ = worker_a.update_record(
+        'John', 'Doe', '30313-1', '9.0', '2024-01-02 10:00:00', '2024-01-01 10:00:00'
+    )
+    assert success
+
+    #worker b has not reloaded yet, the next read brings it up to date
+    assert len(worker_b.df) == 2
+    result = worker_b.retrieve_records('John', 'Doe', '30313-1')
+    assert '9.0' in result['Value'].astype(str).values
+    assert not worker_b.sync()
+
+
+def test_edits_apply_to_latest_data(store, records_path):
+    """Test that an edit from a stale handler keeps the other worker's edit"""
+    worker_a = DBHandler(records_path, shared_store=store)
+    worker_b = DBHandler(records_path, shared_store=store)
+
+    worker_a.update_record('John', 'Doe', '30313-1', '9.0', '2024-01-02 10:00:00', '2024-01-01 10:00:00')
+    worker_b.update_record('John', 'Doe', '6690-2', '3.2', '2024-01-02 10:00:00', '2024-01-01 10:00:00')
+
+    saved = pd.read_csv(records_path, dtype={'Value': str})
+    assert len(saved) == 4
+    assert {'9.0', '3.2'} <= set(saved['Value'])
+
+
+def test_knowledge_saves_reach_other_workers(store, tmp_path):
+    """Test that a knowledge handler reloads tables saved by another process"""
+    data_dir = tmp_path / 'knowledge'
+    data_dir.mkdir()
+    for name in ['systemic_table.csv', 'test_validity_table.csv', 'hemoglobin_female.csv',
+                 'hemoglobin_male.csv', 'recommendations_female.csv', 'recommendations_male.csv',
+                 'hematological_female.json', 'hematological_male.json']:
+        shutil.copy(name, data_dir / name)
+
+    worker_a = KnowledgeDataHandler(data_dir=str(data_dir), shared_store=store)
+    worker_b = KnowledgeDataHandler(data_dir=str(data_dir), shared_store=store)
+    before = worker_b.get_test_validity_table()
+
+    worker_a.update_test_validity('hemoglobin', 99, 98)
+    assert worker_a.save_all_data()[0]
+
+    assert worker_b.sync() == [('test_validity', None)]
+    row = worker_b.get_test_validity_table().set_index('test_name').loc['hemoglobin']
+    assert row['good-before'] == 99
+    assert not before.equals(worker_b.get_test_validity_table())
+    assert worker_b.sync() == []